@@ -0,0 +1,196 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+# usage:
+#   python -m benchmark.benchmarkSuite --pages 100 1000 10000 --output bench_new.json
+#   python -m benchmark.benchmarkSuite --compare bench_old.json bench_new.json
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import time
+from qmlReader import qmlReader, instrumentation
+from benchmark import qmlGenerator
+
+DEFAULT_PAGE_COUNTS = (100, 1000, 10000)
+# graphviz' dot layout grows much faster than linear; larger questionnaires are skipped for 'flowchart_layout'
+DEFAULT_LAYOUT_MAX_PAGES = 1000
+
+
+def time_function(func, repeat=3, setup=None) -> list:
+    """
+    :param func: callable without arguments
+    :param repeat: number of runs
+    :param setup: optional callable that is run (untimed) before each run
+    :return: list of the wall times of all runs in seconds
+    """
+    tmp_list_of_seconds = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        tmp_start = time.perf_counter()
+        func()
+        tmp_list_of_seconds.append(time.perf_counter() - tmp_start)
+    return tmp_list_of_seconds
+
+
+def return_result_dict(benchmark, page_count, list_of_seconds) -> dict:
+    return {'benchmark': benchmark, 'page_count': page_count, 'repeat': len(list_of_seconds),
+            'seconds_min': min(list_of_seconds), 'seconds_median': statistics.median(list_of_seconds),
+            'seconds': list_of_seconds}
+
+
+def run_benchmarks_for_file(file, page_count, repeat=3, layout=True) -> list:
+    """
+    :param file: path of a QML file
+    :param page_count: number of pages of the file (only used as label)
+    :param repeat: number of runs of each benchmark
+    :param layout: if True, the flowchart layout (graphviz dot) is timed as well
+    :return: list of result dicts
+    """
+    tmp_list_of_results = []
+    tmp_holder = {}
+
+    def read():
+        tmp_holder['questionnaire'] = qmlReader.QmlReader(file).questionnaire
+
+    tmp_list_of_results.append(return_result_dict('QmlReader', page_count, time_function(read, repeat)))
+    q = tmp_holder['questionnaire']
+
+    def reset_graph():
+        # the routing graphs are cached; time the build as well
+        q.clear_routing_graphs()
+
+    tmp_list_of_results.append(return_result_dict('transitions_to_nodes_edges', page_count,
+                                                  time_function(q.transitions_to_nodes_edges, repeat,
+                                                                setup=reset_graph)))
+
+    tmp_list_of_results.append(return_result_dict('return_topologically_sorted_list_of_pages', page_count,
+                                                  time_function(q.return_topologically_sorted_list_of_pages, repeat,
+                                                                setup=reset_graph)))
+    tmp_list_of_results.append(return_result_dict('find_unused_variables', page_count,
+                                                  time_function(q.find_unused_variables, repeat)))
+
+    if layout:
+        q.transitions_to_nodes_edges()
+        try:
+            tmp_list_of_results.append(return_result_dict('flowchart_layout', page_count,
+                                                          time_function(q.init_pgv_graph, repeat)))
+        except (OSError, ValueError, ImportError) as exc:
+            # e.g. graphviz' dot is not installed
+            tmp_list_of_results.append({'benchmark': 'flowchart_layout', 'page_count': page_count,
+                                        'error': str(exc)})
+    return tmp_list_of_results
+
+
+def run_benchmarks(page_counts=DEFAULT_PAGE_COUNTS, repeat=3, layout_max_pages=DEFAULT_LAYOUT_MAX_PAGES,
+                   output_file=None, work_dir=None, quiet=True, **generator_kwargs) -> dict:
+    """
+    Generates one synthetic questionnaire per page count and times the pipeline on it.
+    :param page_counts: iterable of page counts
+    :param repeat: number of runs of each benchmark (min and median are reported)
+    :param layout_max_pages: the flowchart layout is only timed up to this page count
+    :param output_file: optional path of a json file for the results
+    :param work_dir: directory for the generated QML files; default: a temporary directory
+    :param quiet: if True, the 'debug' logger is set to WARNING during the runs, so that the timings are not
+        dominated by the per-element log messages
+    :param generator_kwargs: keyword arguments of benchmark.qmlGenerator.QmlGenerator (without page_count)
+    :return: dict {'meta': {...}, 'results': [...]}
+    """
+    logger = logging.getLogger('debug')
+    tmp_old_level = logger.level
+    if quiet:
+        logger.setLevel(logging.WARNING)
+    tmp_instrumentation_was_enabled = instrumentation.DEFAULT_INSTRUMENTATION.enabled
+
+    tmp_results = {'meta': {'timestamp': time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime()),
+                            'python': platform.python_version(), 'platform': platform.platform(),
+                            'qmlReader_version': qmlReader.__version__, 'repeat': repeat,
+                            'generator': qmlGenerator.QmlGenerator(**generator_kwargs).return_dict_of_parameters()},
+                   'results': [], 'phases': {}}
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if work_dir is None:
+                work_dir = tmp_dir
+            for page_count in page_counts:
+                tmp_file = os.path.join(work_dir, 'synthetic_' + str(page_count) + '.xml')
+                qmlGenerator.QmlGenerator(page_count=page_count, **generator_kwargs).write(tmp_file)
+
+                instrumentation.enable()
+                instrumentation.reset()
+                tmp_results['results'] += run_benchmarks_for_file(tmp_file, page_count, repeat=repeat,
+                                                                  layout=page_count <= layout_max_pages)
+                tmp_results['phases'][str(page_count)] = instrumentation.return_dict_of_results()
+    finally:
+        if not tmp_instrumentation_was_enabled:
+            instrumentation.disable()
+        logger.setLevel(tmp_old_level)
+
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(tmp_results, f, indent=2)
+    return tmp_results
+
+
+def compare_results(old_results, new_results) -> list:
+    """
+    :param old_results: dict from run_benchmarks() or path of its json file
+    :param new_results: dict from run_benchmarks() or path of its json file
+    :return: list of tuples (benchmark, page_count, old seconds_min, new seconds_min, new / old)
+    """
+    tmp_list_of_dicts = []
+    for results in [old_results, new_results]:
+        if isinstance(results, str):
+            with open(results) as f:
+                results = json.load(f)
+        tmp_list_of_dicts.append({(entry['benchmark'], entry['page_count']): entry['seconds_min'] for entry in
+                                  results['results'] if 'seconds_min' in entry})
+    tmp_old, tmp_new = tmp_list_of_dicts
+    return [(benchmark, page_count, tmp_old[(benchmark, page_count)], seconds,
+             seconds / tmp_old[(benchmark, page_count)] if tmp_old[(benchmark, page_count)] > 0 else float('inf'))
+            for (benchmark, page_count), seconds in tmp_new.items() if (benchmark, page_count) in tmp_old]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks of the QmlReader pipeline on synthetic questionnaires')
+    parser.add_argument('--pages', type=int, nargs='+', default=list(DEFAULT_PAGE_COUNTS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--branching-factor', type=int, default=2)
+    parser.add_argument('--condition-complexity', type=int, default=1)
+    parser.add_argument('--variables-per-page', type=int, default=3)
+    parser.add_argument('--back-jump-rate', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layout-max-pages', type=int, default=DEFAULT_LAYOUT_MAX_PAGES)
+    parser.add_argument('--output', default=None, help='json file for the results')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), default=None,
+                        help='compare two json result files instead of running the benchmarks')
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        for benchmark, page_count, old_seconds, new_seconds, ratio in compare_results(*args.compare):
+            print('{0:45s} {1:>7d} pages  {2:10.4f} s -> {3:10.4f} s  ({4:.2f}x)'.format(
+                benchmark, page_count, old_seconds, new_seconds, ratio))
+        return
+
+    tmp_results = run_benchmarks(page_counts=args.pages, repeat=args.repeat, layout_max_pages=args.layout_max_pages,
+                                 output_file=args.output, branching_factor=args.branching_factor,
+                                 condition_complexity=args.condition_complexity,
+                                 variables_per_page=args.variables_per_page, back_jump_rate=args.back_jump_rate,
+                                 seed=args.seed)
+    for entry in tmp_results['results']:
+        if 'seconds_min' in entry:
+            print('{0:45s} {1:>7d} pages  {2:10.4f} s'.format(entry['benchmark'], entry['page_count'],
+                                                              entry['seconds_min']))
+        else:
+            print('{0:45s} {1:>7d} pages  error: {2}'.format(entry['benchmark'], entry['page_count'], entry['error']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+# usage:
+#   python -m benchmark.memoryBenchmark --variables 100000 --transitions 50000 --output memory.json
+
+import argparse
+import gc
+import json
+import tracemalloc
+from qmlReader import questionnaire
+
+
+class LegacyVariable:
+    """
+    layout of questionnaire.Variable before __slots__ (instance __dict__, validation lists per instance), kept for
+    comparison only
+    """
+
+    def __init__(self, varname, vartype, varplace=None):
+        self.__allowed_vartypes = ['boolean', 'singleChoiceAnswerOption', 'string', 'number']
+        self.__allowed_varplaces = ['body', 'triggers', 'shown', None]
+        self.varname = varname
+        self.vartype = vartype
+        self.varplace = varplace
+
+
+class LegacyTransition:
+    """
+    layout of questionnaire.Transition before __slots__, kept for comparison only
+    """
+
+    def __init__(self, index, target, condition, source, distance):
+        self.index = index
+        self.target = target
+        self.source = source
+        self.distance = distance
+        self.condition = condition
+        self.condition_python = None
+        self.condition_new = None
+
+
+class LegacyPageHeaderObject:
+    """
+    layout of questionnaire.PageHeaderObject before __slots__, kept for comparison only
+    """
+
+    def __init__(self, uid, text, tag, index, visible_conditions=None):
+        self.uid = uid
+        self.text = text
+        self.index = index
+        self.tag = tag
+        self.allowed_tags_list = ['instruction', 'introduction', 'text', 'title']
+        self.visible_conditions = visible_conditions
+
+
+class LegacyAnswerOption:
+    """
+    layout of questionnaire.AnswerOption before __slots__, kept for comparison only
+    """
+
+    def __init__(self, uid, value, labeltext=None, missing=False):
+        self.uid = uid
+        self.labeltext = labeltext
+        self.value = value
+        self.missing = missing
+
+
+def copy_str(string) -> str:
+    """
+    :return: a new str object with the same content - strings read from the xml are separate objects as well
+    """
+    return (string + '.')[:-1]
+
+
+def measure_bytes(factory, count) -> int:
+    """
+    :param factory: callable(i) that returns the object number i
+    :param count: number of objects
+    :return: bytes allocated by creating count objects (including the strings created by factory)
+    """
+    gc.collect()
+    tracemalloc.start()
+    tmp_start = tracemalloc.get_traced_memory()[0]
+    tmp_list = [factory(i) for i in range(count)]
+    tmp_bytes = tracemalloc.get_traced_memory()[0] - tmp_start
+    tracemalloc.stop()
+    # the list itself is not part of the object model
+    tmp_bytes -= tmp_list.__sizeof__()
+    del tmp_list
+    return tmp_bytes
+
+
+def return_dict_of_factories(page_count) -> dict:
+    """
+    :param page_count: number of distinct page uids the transitions refer to
+    :return: {name: (legacy factory, compact factory)}
+    """
+    tmp_list_of_uids = ['P' + str(i).zfill(6) for i in range(page_count)]
+    # registries for the variables of 'registered Variable': a plain dict (the former Variables.variables) and
+    #  Variables with its indexes; their growth is part of the measurement
+    tmp_dict_of_legacy_variables = {}
+    tmp_variables = questionnaire.Variables()
+
+    def return_registered_legacy_variable(i):
+        tmp_variable = LegacyVariable(copy_str('r' + str(i).zfill(6)), copy_str('string'))
+        tmp_dict_of_legacy_variables[tmp_variable.varname] = tmp_variable
+        return tmp_variable
+
+    def return_registered_variable(i):
+        tmp_variable = questionnaire.Variable(copy_str('r' + str(i).zfill(6)), copy_str('string'))
+        tmp_variables.add_variable(tmp_variable)
+        return tmp_variable
+
+    return {
+        'Variable': (lambda i: LegacyVariable(copy_str('v' + str(i).zfill(6)), copy_str('string')),
+                     lambda i: questionnaire.Variable(copy_str('v' + str(i).zfill(6)), copy_str('string'))),
+        'registered Variable': (return_registered_legacy_variable, return_registered_variable),
+        'Transition': (lambda i: LegacyTransition(i % 4, copy_str(tmp_list_of_uids[(i + 1) % page_count]), None,
+                                                  copy_str(tmp_list_of_uids[i % page_count]), 1),
+                       lambda i: questionnaire.Transition(i % 4, copy_str(tmp_list_of_uids[(i + 1) % page_count]),
+                                                          None, copy_str(tmp_list_of_uids[i % page_count]), 1)),
+        'PageHeaderObject': (lambda i: LegacyPageHeaderObject(copy_str('t' + str(i % 4)), 'text', copy_str('title'),
+                                                              i % 4),
+                             lambda i: questionnaire.PageHeaderObject(copy_str('t' + str(i % 4)), 'text',
+                                                                      copy_str('title'), i % 4)),
+        'AnswerOption': (lambda i: LegacyAnswerOption(copy_str('ao' + str(i % 5)), copy_str(str(i % 5))),
+                         lambda i: questionnaire.AnswerOption(copy_str('ao' + str(i % 5)), copy_str(str(i % 5))))}
+
+
+def run_memory_benchmark(variable_count=100000, transition_count=50000, output_file=None) -> dict:
+    """
+    Compares the memory of the slotted model classes with their former dict-based layout.
+    :param variable_count: number of Variable objects, also of Variable objects added to a Variables registry (compared
+        with a dict of the legacy layout), of PageHeaderObject and of AnswerOption
+    :param transition_count: number of Transition objects
+    :param output_file: optional path of a json file for the results
+    :return: {class name: {'count', 'legacy_bytes_per_object', 'compact_bytes_per_object', 'saving'}}
+    """
+    tmp_counts = {'Variable': variable_count, 'registered Variable': variable_count, 'Transition': transition_count,
+                  'PageHeaderObject': variable_count, 'AnswerOption': variable_count}
+    tmp_results = {}
+    for name, (legacy_factory, compact_factory) in return_dict_of_factories(
+            page_count=max(1, transition_count // 2)).items():
+        tmp_count = tmp_counts[name]
+        tmp_legacy = measure_bytes(legacy_factory, tmp_count) / tmp_count
+        tmp_compact = measure_bytes(compact_factory, tmp_count) / tmp_count
+        tmp_results[name] = {'count': tmp_count, 'legacy_bytes_per_object': tmp_legacy,
+                             'compact_bytes_per_object': tmp_compact,
+                             'saving': 1 - tmp_compact / tmp_legacy if tmp_legacy > 0 else 0.0}
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(tmp_results, f, indent=2)
+    return tmp_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='memory of the questionnaire object model, legacy vs. slotted')
+    parser.add_argument('--variables', type=int, default=100000)
+    parser.add_argument('--transitions', type=int, default=50000)
+    parser.add_argument('--output', default=None, help='json file for the results')
+    args = parser.parse_args()
+    for name, result in run_memory_benchmark(variable_count=args.variables, transition_count=args.transitions,
+                                             output_file=args.output).items():
+        print('{0:20s} {1:>7d} objects  {2:8.1f} -> {3:8.1f} bytes/object  ({4:.0%} less)'.format(
+            name, result['count'], result['legacy_bytes_per_object'], result['compact_bytes_per_object'],
+            result['saving']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+import random
+from xml.sax.saxutils import escape, quoteattr
+
+ZOFAR_NAMESPACE = 'http://www.his.de/zofar/xml/questionnaire'
+
+
+class QmlGenerator:
+    """
+    Deterministic generator of synthetic Zofar QML files for benchmarks: the same parameters (including seed) always
+    produce the same bytes.
+
+    Every page gets variables_per_page questions (alternating questionOpen / questionSingleChoice), a header with a
+    shown variable reference, a trigger on every fifth page and branching_factor transitions: branching_factor - 1
+    conditional ones (forward jumps, or back jumps with probability back_jump_rate) and a final unconditional one to
+    the next page. The last page has no transitions.
+    """
+
+    def __init__(self, page_count=1000, branching_factor=2, condition_complexity=1, variables_per_page=3,
+                 back_jump_rate=0.05, max_jump_distance=10, seed=0):
+        """
+        :param page_count: number of pages (e.g. 100 to 100000)
+        :param branching_factor: number of transitions per page
+        :param condition_complexity: number of clauses per transition condition
+        :param variables_per_page: number of declared variables (questions) per page
+        :param back_jump_rate: probability that a conditional transition jumps backwards
+        :param max_jump_distance: maximum distance of a conditional transition
+        :param seed: seed of the random number generator
+        """
+        assert isinstance(page_count, int) and page_count > 0
+        assert isinstance(branching_factor, int) and branching_factor > 0
+        assert isinstance(condition_complexity, int) and condition_complexity > 0
+        assert isinstance(variables_per_page, int) and variables_per_page > 0
+        assert 0.0 <= back_jump_rate <= 1.0
+        assert isinstance(max_jump_distance, int) and max_jump_distance > 0
+        self.page_count = page_count
+        self.branching_factor = branching_factor
+        self.condition_complexity = condition_complexity
+        self.variables_per_page = variables_per_page
+        self.back_jump_rate = back_jump_rate
+        self.max_jump_distance = max_jump_distance
+        self.seed = seed
+
+    def return_dict_of_parameters(self) -> dict:
+        return {'page_count': self.page_count, 'branching_factor': self.branching_factor,
+                'condition_complexity': self.condition_complexity, 'variables_per_page': self.variables_per_page,
+                'back_jump_rate': self.back_jump_rate, 'max_jump_distance': self.max_jump_distance,
+                'seed': self.seed}
+
+    @staticmethod
+    def return_page_uid(page_index) -> str:
+        return 'P' + str(page_index).zfill(6)
+
+    @staticmethod
+    def return_varname(page_index, variable_index) -> str:
+        return 'v' + str(page_index).zfill(6) + '_' + str(variable_index)
+
+    @staticmethod
+    def return_vartype(variable_index) -> str:
+        return 'string' if variable_index % 2 == 0 else 'singleChoiceAnswerOption'
+
+    def return_condition(self, rand, page_index) -> str:
+        tmp_list_of_clauses = []
+        for i in range(self.condition_complexity):
+            tmp_page_index = rand.randint(max(0, page_index - self.max_jump_distance), page_index)
+            tmp_variable_index = rand.randrange(self.variables_per_page)
+            tmp_varname = self.return_varname(tmp_page_index, tmp_variable_index)
+            if self.return_vartype(tmp_variable_index) == 'string':
+                tmp_clause = rand.choice(['zofar.isMissing(' + tmp_varname + ')',
+                                          '!zofar.isMissing(' + tmp_varname + ')'])
+            else:
+                tmp_clause = 'zofar.asNumber(' + tmp_varname + ') == ' + str(rand.randint(1, 5))
+            tmp_list_of_clauses.append(tmp_clause)
+        tmp_condition = tmp_list_of_clauses[0]
+        for tmp_clause in tmp_list_of_clauses[1:]:
+            tmp_condition += rand.choice([' and ', ' or ']) + tmp_clause
+        return tmp_condition
+
+    def return_list_of_transition_strings(self, rand, page_index) -> list:
+        if page_index == self.page_count - 1:
+            return []
+        tmp_list = []
+        for i in range(self.branching_factor - 1):
+            if page_index > 0 and rand.random() < self.back_jump_rate:
+                tmp_target_index = rand.randint(max(0, page_index - self.max_jump_distance), page_index - 1)
+            else:
+                tmp_target_index = rand.randint(page_index + 1,
+                                                min(self.page_count - 1, page_index + self.max_jump_distance))
+            tmp_list.append('<zofar:transition target=' + quoteattr(self.return_page_uid(tmp_target_index)) +
+                            ' condition=' + quoteattr(self.return_condition(rand, page_index)) + '/>')
+        tmp_list.append('<zofar:transition target=' + quoteattr(self.return_page_uid(page_index + 1)) + '/>')
+        return tmp_list
+
+    def return_page_string(self, rand, page_index) -> str:
+        tmp_uid = self.return_page_uid(page_index)
+        tmp_list = ['<zofar:page uid=' + quoteattr(tmp_uid) + '>',
+                    '<zofar:header><zofar:title uid="t">' + escape('Page ' + tmp_uid) + '</zofar:title>']
+        if page_index > 0:
+            tmp_list.append('<zofar:text uid="t2">' + escape(
+                'You answered #{' + self.return_varname(page_index - 1, 0) + '.value} on the last page.') +
+                            '</zofar:text>')
+        tmp_list.append('</zofar:header>')
+
+        tmp_list.append('<zofar:body uid="b">')
+        for variable_index in range(self.variables_per_page):
+            tmp_varname = self.return_varname(page_index, variable_index)
+            tmp_question_uid = quoteattr('q' + str(variable_index))
+            tmp_question_header = ('<zofar:header><zofar:question uid="q">' + escape(
+                'Question ' + str(variable_index) + ' of page ' + tmp_uid) + '</zofar:question></zofar:header>')
+            if self.return_vartype(variable_index) == 'string':
+                tmp_list.append('<zofar:questionOpen uid=' + tmp_question_uid + ' variable=' + quoteattr(
+                    tmp_varname) + '>' + tmp_question_header + '</zofar:questionOpen>')
+            else:
+                tmp_list.append('<zofar:questionSingleChoice uid=' + tmp_question_uid + '>' + tmp_question_header +
+                                '<zofar:responseDomain variable=' + quoteattr(tmp_varname) + ' uid="rd">')
+                for answer_option in range(1, 6):
+                    tmp_list.append('<zofar:answerOption uid=' + quoteattr('ao' + str(answer_option)) +
+                                    ' value=' + quoteattr(str(answer_option)) + ' label=' +
+                                    quoteattr('answer ' + str(answer_option)) + '/>')
+                tmp_list.append('</zofar:responseDomain></zofar:questionSingleChoice>')
+        tmp_list.append('</zofar:body>')
+
+        if page_index % 5 == 0:
+            tmp_list.append('<zofar:triggers><zofar:variable variable=' + quoteattr(
+                self.return_varname(page_index, 0)) + ' value="\'\'" onExit="false"/></zofar:triggers>')
+
+        tmp_list_of_transitions = self.return_list_of_transition_strings(rand, page_index)
+        if tmp_list_of_transitions:
+            tmp_list.append('<zofar:transitions>' + ''.join(tmp_list_of_transitions) + '</zofar:transitions>')
+        tmp_list.append('</zofar:page>')
+        return ''.join(tmp_list)
+
+    def return_qml_string(self) -> str:
+        rand = random.Random(self.seed)
+        tmp_list = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+                    '<zofar:questionnaire xmlns:zofar="' + ZOFAR_NAMESPACE + '" language="de">\n',
+                    '<zofar:name>' + escape('Synthetic questionnaire, ' + str(self.page_count) + ' pages') +
+                    '</zofar:name>\n',
+                    '<zofar:variables>\n']
+        for page_index in range(self.page_count):
+            for variable_index in range(self.variables_per_page):
+                tmp_list.append('<zofar:variable name=' + quoteattr(self.return_varname(page_index, variable_index)) +
+                                ' type=' + quoteattr(self.return_vartype(variable_index)) + '/>\n')
+        tmp_list.append('</zofar:variables>\n')
+        for page_index in range(self.page_count):
+            tmp_list.append(self.return_page_string(rand, page_index) + '\n')
+        tmp_list.append('</zofar:questionnaire>\n')
+        return ''.join(tmp_list)
+
+    def return_qml_bytes(self) -> bytes:
+        return self.return_qml_string().encode('utf-8')
+
+    def write(self, output_file):
+        with open(output_file, 'wb') as f:
+            f.write(self.return_qml_bytes())
@@ -5,7 +5,7 @@ __version__ = "0.3.4"
 __status__ = "Prototype"
 __name__ = "QmlReader_GUI"
 
-from qmlReader import qmlReader, questionnaire
+from qmlReader import qmlReader, questionnaire, parseCache, instrumentation, questionnaireMerge
 import tkinter
 from tkinter import filedialog, scrolledtext, IntVar, messagebox
 from os import listdir
@@ -29,6 +29,8 @@ class Window(tkinter.Frame):
         # self.questionnaire = Questionnaire.Questionnaire()
         self.master = master
         self.dict_of_qmls = {}
+        # QML files that have been read before are loaded from the on-disk cache instead of being parsed again
+        self.parse_cache = parseCache.ParseCache()
         self.questionnaire_combined = questionnaire.Questionnaire()
         self.listOfFiles = []
         self.listOfFilesFull = []
@@ -255,11 +257,14 @@ class Window(tkinter.Frame):
     def run_qml_reader(self):
         print("run_qml_reader")
         self.dict_of_qmls = {}
-        if self.listOfFilesFull is []:
+        if not self.listOfFilesFull:
             return
-        for entry in self.listOfFilesFull:
-            print(entry)
-            self.dict_of_qmls[os.path.split(entry)[1]] = qmlReader.QmlReader(entry)
+        # the files are read in parallel worker processes, at most one per file (a single file in this process)
+        tmp_jobs = min(len(self.listOfFilesFull), os.cpu_count() or 1)
+        for result in qmlReader.load_many(self.listOfFilesFull, jobs=tmp_jobs, cache=self.parse_cache):
+            print(result.file + ': ' + '{0:.3f}'.format(result.seconds) + ' s')
+            self.dict_of_qmls[os.path.split(result.file)[1]] = qmlReader.QmlReader.from_questionnaire(
+                result.questionnaire)
 
         for key in self.dict_of_qmls:
             self.read_into_questionnaire_objects(key=key)
@@ -352,6 +357,19 @@ class Window(tkinter.Frame):
                                                            text='Flowchart(s)\nw/o var & cond', state=tkinter.NORMAL,
                                                            command=self.action_delay_flowchart_creation_omit_var_omit_cond_no_biderectional)
 
+            # chains of pages without branches are collapsed into one node - much faster layout for long questionnaires
+            self.window_selection.compress_chains = IntVar()
+            self.window_selection.checkbox_compress_chains = tkinter.Checkbutton(
+                self.window_selection.canvas2, text='compress chains of pages',
+                variable=self.window_selection.compress_chains, onvalue=1, offvalue=0)
+            self.window_selection.checkbox_compress_chains.grid(row=4, column=2, padx=0, sticky='NE')
+
+            self.window_selection.per_section = IntVar()
+            self.window_selection.checkbox_per_section = tkinter.Checkbutton(
+                self.window_selection.canvas2, text='one flowchart per section',
+                variable=self.window_selection.per_section, onvalue=1, offvalue=0)
+            self.window_selection.checkbox_per_section.grid(row=5, column=2, padx=0, sticky='NE')
+
         if action == 'combine':
             self.window_selection.button1 = tkinter.Button(self.window_selection.canvas2, width=10, height=1,
                                                            text='Combine QMLs', state=tkinter.NORMAL,
@@ -377,6 +395,14 @@ class Window(tkinter.Frame):
     def do_nothing():
         pass
 
+    @staticmethod
+    def return_list_of_cancel_pages(questionnaire_object):
+        """
+        :return: list of the uids of the cancel pages ('cancel1', 'cancel2', ...) - exits that every page may lead to
+        """
+        return [pagename for pagename in questionnaire_object.pages.list_of_all_pagenames() if
+                pagename.startswith('cancel')]
+
     def action_delay_flowchart_creation_show_var_show_cond_create_biderectional(self):
         self.action_flowchart_create(show_conditions=True, show_varnames=True, create_biderectional_edges=False)
 
@@ -391,14 +417,16 @@ class Window(tkinter.Frame):
         self.logger.info('list of filenames from selection: ' + str(self.list_of_filenames_from_selection()))
         temp_list = [os.path.split(path)[1] for path in self.list_of_selected_files]
 
-        first = True
-        for key in temp_list:
-            if first is True:
-                self.questionnaire_combined.file = self.dict_of_qmls[key].file
-                first = False
-        for key in self.dict_of_qmls.keys():
-            self.questionnaire_combined.append_other_questionnaire(self.dict_of_qmls[key].questionnaire)
-        tkinter.messagebox.showinfo('Success: questionnaires have been combined.')
+        # only the selected questionnaires, in the order of the selection
+        merge_result = questionnaireMerge.merge_questionnaires(
+            [self.dict_of_qmls[key].questionnaire for key in temp_list])
+        self.questionnaire_combined = merge_result.questionnaire
+        self.logger.info('combine: ' + str(merge_result.conflicts))
+        if merge_result.conflicts.has_conflicts():
+            tkinter.messagebox.showwarning('Questionnaires have been combined with conflicts',
+                                           str(merge_result.conflicts))
+        else:
+            tkinter.messagebox.showinfo('Success', 'Questionnaires have been combined.')
         self.window_selection.destroy()
 
         # ToDo: fix this dirty, dirty workaround...
@@ -421,8 +449,13 @@ class Window(tkinter.Frame):
             [self.__flowcharts_omit_conditions(key) for key in temp_list]
         if create_biderectional_edges:
             [self.__flowcharts_create_bidirectional_edges(key) for key in temp_list]
+        compress_chains = self.window_selection.compress_chains.get() == 1
+        [self.__flowcharts_compress_chains(key, compress_chains) for key in temp_list]
 
-        [self.prepare_flowcharts(key=key, output_dir=output_dir) for key in temp_list]
+        if self.window_selection.per_section.get() == 1:
+            [self.prepare_section_flowcharts(key=key, output_dir=output_dir) for key in temp_list]
+        else:
+            [self.prepare_flowcharts(key=key, output_dir=output_dir) for key in temp_list]
         count = len(self.list_of_selected_files)
         if count == 1:
             tkinter.messagebox.showinfo('Success', str(count) + ' flowchart has been created.')
@@ -435,6 +468,11 @@ class Window(tkinter.Frame):
         self.dict_of_questionnaires[key].transitions_to_nodes_edges(truncate=False)
         self.dict_of_questionnaires[key].flowchart_create_graph(output_dir=output_dir)
 
+    def prepare_section_flowcharts(self, key, output_dir=None):
+        tmp_questionnaire = self.dict_of_questionnaires[key]
+        tmp_questionnaire.flowchart_create_section_graphs(
+            output_dir=output_dir, excluded_pages=self.return_list_of_cancel_pages(tmp_questionnaire))
+
     def __flowcharts_omit_varnames(self, key):
         self.dict_of_questionnaires[key].flowchart_set_show_variablenames(False)
 
@@ -444,6 +482,9 @@ class Window(tkinter.Frame):
     def __flowcharts_create_bidirectional_edges(self, key):
         self.dict_of_questionnaires[key].flowchart_set_bidirectional(True)
 
+    def __flowcharts_compress_chains(self, key, compress_chains):
+        self.dict_of_questionnaires[key].flowchart_set_compress_chains(compress_chains)
+
     def list_of_filenames_from_selection(self):
         local_list = [self.window_selection.dict_of_vars[i][0] for i in self.window_selection.dict_of_vars if
                       self.window_selection.dict_of_vars[i][1].get() == 1]
@@ -507,10 +548,46 @@ class Window(tkinter.Frame):
 
         details_string += '\n### topologically sorted list of pages:\n'
         tmp_list_of_topologically_sorted_pages = qml_reader_object.questionnaire.return_topologically_sorted_list_of_pages()
-        if tmp_list_of_topologically_sorted_pages:
-            details_string += str(tmp_list_of_topologically_sorted_pages)
-        else:
-            details_string += '!! Graph contains cycles and can therefore not be topologically sorted. !!'
+        details_string += str(tmp_list_of_topologically_sorted_pages)
+        tmp_list_of_loops = qml_reader_object.questionnaire.return_list_of_loops()
+        if tmp_list_of_loops:
+            details_string += '\n(pages within loops are in declaration order; loops: ' + str(tmp_list_of_loops) + ')'
+
+        details_string += '\n\n'
+
+        details_string += '\n### pages every respondent passes (from "index" to "end"):\n'
+        tmp_bottleneck_pages = qml_reader_object.questionnaire.return_bottleneck_pages()
+        details_string += str(list(tmp_bottleneck_pages.dominators))
+        details_string += '\n### articulation points of the routing graph:\n'
+        details_string += str(list(tmp_bottleneck_pages.articulation_points))
+        details_string += '\n### number of routes from "index" to "end" (loops counted once):\n'
+        details_string += str(qml_reader_object.questionnaire.return_number_of_paths())
+
+        tmp_reachability_index = qml_reader_object.questionnaire.return_reachability_index()
+        details_string += '\n### pages that cannot be reached from "index":\n'
+        details_string += str(tmp_reachability_index.return_list_of_unreachable_pages('index'))
+        details_string += '\n### pages from which "end" cannot be reached:\n'
+        details_string += str(tmp_reachability_index.return_list_of_pages_not_reaching('end'))
+        details_string += '\n### dead-end pages (no transitions, except "end"):\n'
+        details_string += str(tmp_reachability_index.return_list_of_dead_end_pages('end'))
+
+        tmp_path_metrics = qml_reader_object.questionnaire.return_path_metrics()
+        details_string += '\n### interview length from "index" to "end" (longest: loops counted once):\n'
+        details_string += 'pages: ' + str(tmp_path_metrics.min_pages) + ' - ' + str(
+            tmp_path_metrics.max_pages) + ', variables: ' + str(tmp_path_metrics.min_variables) + ' - ' + str(
+            tmp_path_metrics.max_variables)
+        tmp_expected_length = qml_reader_object.questionnaire.return_expected_length()
+        details_string += '\nexpected (equal probabilities for all transitions): ' + str(
+            round(tmp_expected_length.pages, 2)) + ' pages, ' + str(round(tmp_expected_length.variables, 2)) + \
+            ' variables\n'
+
+        tmp_list_of_cancel_pages = Window.return_list_of_cancel_pages(qml_reader_object.questionnaire)
+        details_string += '\n### sections (cut at the pages every route passes; cancel pages excluded):\n'
+        for statistics in qml_reader_object.questionnaire.return_list_of_section_statistics(
+                excluded_pages=tmp_list_of_cancel_pages):
+            details_string += str(statistics['entry']) + ' -> ' + str(statistics['exit']) + ': ' + str(
+                statistics['pages']) + ' pages, ' + str(statistics['variables']) + ' variables, ' + str(
+                statistics['transitions']) + ' transitions, ' + str(statistics['routes']) + ' routes\n'
 
         details_string += '\n\n'
 
@@ -610,10 +687,4 @@ class Window(tkinter.Frame):
         """
         CRITICAL: 50, ERROR: 40, WARNING: 30, INFO: 20, DEBUG: 10, NOTSET: 0
         """
-        logging.basicConfig(level=log_level)
-        fh = logging.FileHandler("{0}.log".format('log_' + __name__))
-        fh.setLevel(log_level)
-        fh_format = logging.Formatter('%(name)s\t%(module)s\t%(funcName)s\t%(asctime)s\t%(lineno)d\t'
-                                      '%(levelname)-8s\t%(message)s')
-        fh.setFormatter(fh_format)
-        self.logger.addHandler(fh)
+        instrumentation.setup_debug_logger("{0}.log".format('log_' + __name__), log_level=log_level)
@@ -3,14 +3,15 @@ __maintainer__ = "Christian Friedrich"
 __license__ = "MIT"
 __version__ = "1.0.14"
 __status__ = "Prototype"
-__name__ = "QmlReader_GUI"
 # last edited 2020-04-01
 
 from gui import mainInterface
 from tkinter import Tk
 
-root = Tk()
-app = mainInterface.Window(root)
-root.wm_title("QML Reader " + str(__version__))
-root.geometry('800x600')
-root.mainloop()
+# the guard keeps worker processes of qmlReader.load_many (spawn/forkserver start methods) from opening the GUI
+if __name__ == '__main__':
+    root = Tk()
+    app = mainInterface.Window(root)
+    root.wm_title("QML Reader " + str(__version__))
+    root.geometry('800x600')
+    root.mainloop()
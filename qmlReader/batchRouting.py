@@ -0,0 +1,377 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+# Vectorized evaluation of the transition conditions for the answer data of many respondents (one column per
+#  variable, one row per respondent).
+#
+# Every column is factorized once into integer codes and the list of its distinct values; a condition is evaluated on
+#  the distinct values with the scalar helpers of conditionCompiler (so the results equal the compiled conditions) and
+#  mapped back to all rows by indexing with the codes.
+#
+# usage:
+#   columns = batchRouting.read_columns_from_csv('export.csv', varnames=q.variables.variables.keys())
+#   router = batchRouting.BatchRouter(q, columns)
+#   first_matches = router.return_dict_of_first_matching_transitions()
+#   routed_paths = router.return_routed_paths()
+#   edge_frequencies = batchRouting.return_dict_of_transition_frequencies(routed_paths)  # e.g. for expected lengths
+
+import csv
+import functools
+import logging
+import numpy as np
+from qmlReader import conditionCompiler, instrumentation
+
+# no transition of the page matched
+NO_MATCH = -1
+
+# reasons why the routed path of a respondent ended
+END_NO_TRANSITIONS = 0
+END_NO_MATCH = 1
+END_STEP_LIMIT = 2
+
+
+class FactorizedColumn:
+    """
+    self.codes: numpy int64 array, one code per row; self.uniques: list of the distinct values, row i has the value
+    self.uniques[self.codes[i]]. A missing value is None.
+    """
+    __slots__ = ('codes', 'uniques')
+
+    def __init__(self, codes, uniques):
+        self.codes = codes
+        self.uniques = uniques
+
+    def __len__(self):
+        return len(self.codes)
+
+    def map(self, function):
+        """
+        :param function: callable(value) -> value
+        :return: FactorizedColumn with function applied to every value
+        """
+        return FactorizedColumn(self.codes, [function(value) for value in self.uniques])
+
+    def combine(self, other, function):
+        """
+        :param other: FactorizedColumn of the same length
+        :param function: callable(value of self, value of other) -> value
+        :return: FactorizedColumn with function applied to every pair of values
+        """
+        if len(other.uniques) == 1:
+            tmp_value = other.uniques[0]
+            return self.map(lambda value: function(value, tmp_value))
+        if len(self.uniques) == 1:
+            tmp_value = self.uniques[0]
+            return other.map(lambda value: function(tmp_value, value))
+        tmp_other_count = len(other.uniques)
+        tmp_pairs, tmp_codes = np.unique(self.codes * tmp_other_count + other.codes, return_inverse=True)
+        return FactorizedColumn(tmp_codes.reshape(-1), [function(self.uniques[pair // tmp_other_count],
+                                                                 other.uniques[pair % tmp_other_count])
+                                                        for pair in tmp_pairs.tolist()])
+
+    def return_boolean_array(self) -> np.ndarray:
+        return np.array([conditionCompiler.to_boolean(value) for value in self.uniques], dtype=bool)[self.codes]
+
+    def return_list_of_values(self) -> list:
+        return [self.uniques[code] for code in self.codes.tolist()]
+
+
+def return_constant_column(value, row_count) -> FactorizedColumn:
+    return FactorizedColumn(np.zeros(row_count, dtype=np.int64), [value])
+
+
+def is_missing(value) -> bool:
+    """
+    :return: True for None, empty strings and float nan (e.g. from a parquet file)
+    """
+    return value is None or (isinstance(value, str) and value == '') or \
+        (isinstance(value, (float, np.floating)) and value != value)
+
+
+def factorize(values) -> FactorizedColumn:
+    """
+    :param values: iterable of the values of one variable; None, float nan and empty strings are missing
+    :return: FactorizedColumn, uniques[0] is None (all missing values), the other values in order of appearance
+    """
+    tmp_dict_of_codes = {None: 0}
+    # nan != nan: every missing value is mapped to code 0 before the lookup
+    tmp_codes = np.fromiter((0 if is_missing(value) else tmp_dict_of_codes.setdefault(value, len(tmp_dict_of_codes))
+                             for value in values), dtype=np.int64,
+                            count=len(values) if hasattr(values, '__len__') else -1)
+    return FactorizedColumn(tmp_codes, list(tmp_dict_of_codes))
+
+
+def read_columns_from_csv(file, varnames=None, delimiter=',', encoding='utf-8') -> dict:
+    """
+    :param file: path of a csv file with a header row (one column per variable)
+    :param varnames: iterable of column names to read; None: all columns
+    :return: {varname: list of str}; empty cells are None
+    """
+    with open(file, 'r', newline='', encoding=encoding) as f:
+        tmp_reader = csv.reader(f, delimiter=delimiter)
+        tmp_header = next(tmp_reader)
+        tmp_varnames = set(tmp_header) if varnames is None else set(varnames)
+        tmp_list_of_positions = [(position, name) for position, name in enumerate(tmp_header) if name in tmp_varnames]
+        tmp_dict_of_columns = {name: [] for position, name in tmp_list_of_positions}
+        for row in tmp_reader:
+            for position, name in tmp_list_of_positions:
+                tmp_value = row[position] if position < len(row) else ''
+                tmp_dict_of_columns[name].append(tmp_value if tmp_value != '' else None)
+    return tmp_dict_of_columns
+
+
+def read_columns_from_parquet(file, varnames=None) -> dict:
+    """
+    needs pandas and a parquet engine (pyarrow or fastparquet)
+    :param file: path of a parquet file (one column per variable)
+    :param varnames: iterable of column names to read; None: all columns
+    :return: {varname: list of values}; nulls are None
+    """
+    import pandas
+    tmp_data_frame = pandas.read_parquet(file)
+    tmp_varnames = set(tmp_data_frame.columns) if varnames is None else set(varnames)
+    return {name: [None if pandas.isna(value) else value for value in tmp_data_frame[name].tolist()]
+            for name in tmp_data_frame.columns if name in tmp_varnames}
+
+
+def return_dict_of_transition_frequencies(routed_paths) -> dict:
+    """
+    :param routed_paths: result of BatchRouter.return_routed_paths
+    :return: {(source, target): number of rows whose path contains this step}, e.g. as observed frequencies for
+        routingGraph.return_expected_length
+    """
+    tmp_path_counts = np.bincount(routed_paths['path_ids'], minlength=len(routed_paths['paths']))
+    tmp_dict_of_frequencies = {}
+    for path, count in zip(routed_paths['paths'], tmp_path_counts.tolist()):
+        if count == 0:
+            continue
+        for edge in zip(path[:-1], path[1:]):
+            tmp_dict_of_frequencies[edge] = tmp_dict_of_frequencies.get(edge, 0) + count
+    return tmp_dict_of_frequencies
+
+
+class BatchRouter:
+    """
+    Evaluates the routing of a questionnaire for the answer data of many respondents at once.
+    """
+
+    def __init__(self, questionnaire_object, columns):
+        """
+        :param questionnaire_object: questionnaire.Questionnaire
+        :param columns: {varname: iterable of values} (all of the same length) or {varname: FactorizedColumn}
+        """
+        self.logger = logging.getLogger('debug')
+        self.questionnaire = questionnaire_object
+        self.row_count = None
+        self.columns = {}
+        for varname, values in columns.items():
+            if not hasattr(values, '__len__'):
+                values = list(values)
+            if self.row_count is None:
+                self.row_count = len(values)
+            elif len(values) != self.row_count:
+                raise ValueError('column "' + str(varname) + '" has ' + str(len(values)) + ' rows, expected ' +
+                                 str(self.row_count))
+            # factorized on first use
+            self.columns[varname] = values
+        if self.row_count is None:
+            self.row_count = 0
+        # {normalized condition: boolean array over all rows}
+        self.condition_results = {}
+        self.__set_of_missing_varnames = set()
+
+    def return_column(self, varname) -> FactorizedColumn:
+        """
+        :return: FactorizedColumn of the variable (factorized on first use); all values missing if there is no column
+        """
+        if varname not in self.columns:
+            if varname not in self.__set_of_missing_varnames:
+                self.__set_of_missing_varnames.add(varname)
+                self.logger.info('no data for variable "' + str(varname) + '", all values are missing')
+            return return_constant_column(None, self.row_count)
+        if not isinstance(self.columns[varname], FactorizedColumn):
+            self.columns[varname] = factorize(self.columns[varname])
+        return self.columns[varname]
+
+    def evaluate_node(self, node):
+        """
+        :param node: conditionCompiler.ConditionNode
+        :return: numpy boolean array for logical nodes, FactorizedColumn otherwise
+        """
+        if node.kind in ['or', 'and']:
+            tmp_result = None
+            for child in node.children:
+                tmp_child = self.return_boolean_array(self.evaluate_node(child))
+                if tmp_result is None:
+                    tmp_result = tmp_child.copy()
+                elif node.kind == 'or':
+                    tmp_result |= tmp_child
+                else:
+                    tmp_result &= tmp_child
+            return tmp_result
+        if node.kind == 'not':
+            return ~self.return_boolean_array(self.evaluate_node(node.children[0]))
+        if node.kind == 'compare':
+            tmp_left, tmp_right = [self.return_factorized_column(self.evaluate_node(child)) for child in node.children]
+            if node.value == 'eq':
+                tmp_function = conditionCompiler.compare_equal
+            elif node.value == 'ne':
+                tmp_function = lambda left, right: not conditionCompiler.compare_equal(left, right)
+            else:
+                tmp_function = functools.partial(conditionCompiler.compare_order, operator=node.value)
+            return tmp_left.combine(tmp_right, tmp_function).return_boolean_array()
+        if node.kind == 'call':
+            if len(node.children) != 1:
+                raise ValueError('zofar.' + node.value + ' expects one argument, got ' + str(len(node.children)))
+            return self.return_factorized_column(self.evaluate_node(node.children[0])).map(
+                conditionCompiler.FUNCTIONS[node.value][0])
+        if node.kind == 'variable':
+            return self.return_column(node.value)
+        if node.kind == 'constant':
+            return return_constant_column(node.value, self.row_count)
+        raise ValueError('unknown node: ' + str(node))
+
+    @staticmethod
+    def return_boolean_array(result) -> np.ndarray:
+        if isinstance(result, FactorizedColumn):
+            return result.return_boolean_array()
+        return result
+
+    @staticmethod
+    def return_factorized_column(result) -> FactorizedColumn:
+        if isinstance(result, FactorizedColumn):
+            return result
+        return FactorizedColumn(result.astype(np.int64), [False, True])
+
+    def evaluate_condition(self, condition_string) -> np.ndarray:
+        """
+        :param condition_string: condition in Zofar syntax, or None (always True)
+        :return: numpy boolean array, one value per row; computed once per distinct condition
+        """
+        if condition_string is None:
+            return np.ones(self.row_count, dtype=bool)
+        tmp_compiled_condition = conditionCompiler.compile_condition(condition_string)
+        if tmp_compiled_condition.condition not in self.condition_results:
+            instrumentation.count('evaluated conditions')
+            self.condition_results[tmp_compiled_condition.condition] = self.return_boolean_array(
+                self.evaluate_node(tmp_compiled_condition.tree))
+        return self.condition_results[tmp_compiled_condition.condition]
+
+    def return_first_matching_transitions(self, page_uid, rows=None) -> np.ndarray:
+        """
+        :param page_uid: uid of a QmlPage
+        :param rows: numpy array of row numbers; None: all rows
+        :return: numpy int64 array, per row the position (within the page transitions) of the first transition whose
+            condition is True, NO_MATCH if none is
+        """
+        tmp_row_count = self.row_count if rows is None else len(rows)
+        tmp_result = np.full(tmp_row_count, NO_MATCH, dtype=np.int64)
+        tmp_undecided = np.ones(tmp_row_count, dtype=bool)
+        for position, transition in enumerate(self.questionnaire.pages.pages[page_uid].transitions.transitions.values()):
+            tmp_matches = self.evaluate_condition(transition.condition)
+            if rows is not None:
+                tmp_matches = tmp_matches[rows]
+            tmp_result[tmp_undecided & tmp_matches] = position
+            tmp_undecided &= ~tmp_matches
+            if not tmp_undecided.any():
+                break
+        return tmp_result
+
+    @instrumentation.timed('batch routing')
+    def return_dict_of_first_matching_transitions(self) -> dict:
+        """
+        :return: {page uid: numpy array of the first matching transition per row}, see
+            self.return_first_matching_transitions
+        """
+        return {page_uid: self.return_first_matching_transitions(page_uid)
+                for page_uid in self.questionnaire.pages.pages}
+
+    @instrumentation.timed('batch routing')
+    def return_routed_paths(self, start_page=None, max_steps=None) -> dict:
+        """
+        Follows the first matching transition of every page, starting at start_page, for all rows at once.
+        :param start_page: uid of the first page; None: the first page of the questionnaire
+        :param max_steps: maximum number of transitions per path; None: number of pages (a longer path contains a loop)
+        :return: {'paths': list of distinct paths (tuples of page uids), 'path_ids': numpy array, per row the
+            position of its path in 'paths', 'end_reasons': numpy array, per row END_NO_TRANSITIONS, END_NO_MATCH
+            or END_STEP_LIMIT}; a questionnaire without pages has the empty path () only (END_NO_TRANSITIONS)
+        """
+        tmp_list_of_page_uids = list(self.questionnaire.pages.pages)
+        if not tmp_list_of_page_uids:
+            return {'paths': [()], 'path_ids': np.zeros(self.row_count, dtype=np.int64),
+                    'end_reasons': np.full(self.row_count, END_NO_TRANSITIONS, dtype=np.int64)}
+        tmp_page_ordinals = self.questionnaire.pages.page_ordinals
+        if start_page is None:
+            start_page = tmp_list_of_page_uids[0]
+        if max_steps is None:
+            max_steps = len(tmp_list_of_page_uids)
+        # targets of the transitions as ordinals: {page ordinal: numpy array of target ordinals}
+        tmp_dict_of_targets = {tmp_page_ordinals[page_uid]: np.array(
+            [tmp_page_ordinals[transition.target] for transition in page.transitions.transitions.values()],
+            dtype=np.int64) for page_uid, page in self.questionnaire.pages.pages.items()}
+
+        # every path is a node of a prefix tree: (parent node, page ordinal); the nodes of every step are stored as
+        #  one numpy array each
+        tmp_page_count = len(tmp_list_of_page_uids)
+        tmp_list_of_prefix_parents = [np.array([-1], dtype=np.int64)]
+        tmp_list_of_prefix_pages = [np.array([tmp_page_ordinals[start_page]], dtype=np.int64)]
+        tmp_prefix_count = 1
+        tmp_path_ids = np.zeros(self.row_count, dtype=np.int64)
+        tmp_current_pages = np.full(self.row_count, tmp_page_ordinals[start_page], dtype=np.int64)
+        tmp_end_reasons = np.full(self.row_count, END_STEP_LIMIT, dtype=np.int64)
+        tmp_active_rows = np.arange(self.row_count)
+        for step in range(max_steps + 1):
+            # group the active rows by their current page
+            tmp_order = np.argsort(tmp_current_pages[tmp_active_rows], kind='stable')
+            tmp_active_rows = tmp_active_rows[tmp_order]
+            tmp_pages_of_rows = tmp_current_pages[tmp_active_rows]
+            tmp_group_pages, tmp_group_starts = np.unique(tmp_pages_of_rows, return_index=True)
+            tmp_group_ends = np.append(tmp_group_starts[1:], len(tmp_active_rows))
+            tmp_next_pages = np.full(len(tmp_active_rows), NO_MATCH, dtype=np.int64)
+            for page_ordinal, start, end in zip(tmp_group_pages.tolist(), tmp_group_starts.tolist(),
+                                                tmp_group_ends.tolist()):
+                tmp_rows = tmp_active_rows[start:end]
+                tmp_targets = tmp_dict_of_targets[page_ordinal]
+                if len(tmp_targets) == 0:
+                    tmp_end_reasons[tmp_rows] = END_NO_TRANSITIONS
+                    continue
+                tmp_choices = self.return_first_matching_transitions(tmp_list_of_page_uids[page_ordinal],
+                                                                     rows=tmp_rows)
+                tmp_matched = tmp_choices != NO_MATCH
+                tmp_end_reasons[tmp_rows[~tmp_matched]] = END_NO_MATCH
+                tmp_next_pages[start:end][tmp_matched] = tmp_targets[tmp_choices[tmp_matched]]
+            if step == max_steps:
+                # rows that are still active keep END_STEP_LIMIT
+                break
+            tmp_continuing = tmp_next_pages != NO_MATCH
+            tmp_active_rows = tmp_active_rows[tmp_continuing]
+            tmp_next_pages = tmp_next_pages[tmp_continuing]
+            if len(tmp_active_rows) == 0:
+                break
+            # one new prefix tree node per distinct (path, next page)
+            tmp_keys, tmp_inverse = np.unique(tmp_path_ids[tmp_active_rows] * tmp_page_count + tmp_next_pages,
+                                              return_inverse=True)
+            tmp_list_of_prefix_parents.append(tmp_keys // tmp_page_count)
+            tmp_list_of_prefix_pages.append(tmp_keys % tmp_page_count)
+            tmp_path_ids[tmp_active_rows] = tmp_prefix_count + tmp_inverse.reshape(-1)
+            tmp_prefix_count += len(tmp_keys)
+            tmp_current_pages[tmp_active_rows] = tmp_next_pages
+
+        # walk up the prefix tree for all distinct paths at once
+        tmp_prefix_parents = np.concatenate(tmp_list_of_prefix_parents)
+        tmp_prefix_pages = np.concatenate(tmp_list_of_prefix_pages)
+        tmp_final_ids, tmp_path_positions = np.unique(tmp_path_ids, return_inverse=True)
+        tmp_list_of_columns = []
+        tmp_ids = tmp_final_ids
+        while (tmp_ids != -1).any():
+            tmp_list_of_columns.append(np.where(tmp_ids != -1, tmp_prefix_pages[tmp_ids], -1))
+            tmp_ids = np.where(tmp_ids != -1, tmp_prefix_parents[tmp_ids], -1)
+        tmp_page_uids = np.array(tmp_list_of_page_uids, dtype=object)
+        tmp_list_of_paths = []
+        for row in np.column_stack(tmp_list_of_columns[::-1]) if tmp_list_of_columns else []:
+            tmp_list_of_paths.append(tuple(tmp_page_uids[row[row != -1]].tolist()))
+        return {'paths': tmp_list_of_paths, 'path_ids': tmp_path_positions.reshape(-1),
+                'end_reasons': tmp_end_reasons}
@@ -0,0 +1,361 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.1"
+__status__ = "Prototype"
+
+# Parser and compiler for the subset of the Zofar expression language that is used in transition conditions, e.g.
+#   "!zofar.isMissing(var02) and (zofar.asNumber(var02) == 3 or var01.value)"
+#
+# grammar:
+#   expression := and_expression (('or' | '||') and_expression)*
+#   and_expression := comparison (('and' | '&&') comparison)*
+#   comparison := not_expression (('==' | '!=' | 'eq' | 'ne' | 'lt' | 'gt' | 'le' | 'ge' | '<' | '>' | '<=' | '>=')
+#                 not_expression)?
+#   not_expression := ('!' | 'not') not_expression | operand
+#   operand := '(' expression ')' | number | string | 'true' | 'false' | 'null'
+#              | 'zofar' '.' function '(' [expression (',' expression)*] ')' | varname ['.' 'value']
+#
+# As in the Java EL, '!' binds tighter than the comparisons: "!var01.value == true" is "(!var01.value) == true";
+#  a negated comparison needs parentheses: "!(zofar.asNumber(var02) == 3)".
+#
+# Each distinct condition is compiled once into a python function of a dict {varname: value}; the compiled
+#  conditions are cached by their normalized string (tokens joined by single spaces).
+
+import re
+from collections import namedtuple
+
+TOKEN_PATTERN = re.compile(r'''\s*(?:
+    (?P<number>-?[0-9]+(?:\.[0-9]+)?)
+    |(?P<string>'[^']*'|"[^"]*")
+    |(?P<op>==|!=|<=|>=|&&|\|\||[()!,<>.])
+    |(?P<name>[A-Za-z_][A-Za-z0-9_\-]*)
+    )''', re.VERBOSE)
+
+OR_OPERATORS = ['or', '||']
+AND_OPERATORS = ['and', '&&']
+NOT_OPERATORS = ['!', 'not']
+# {operator token: name of the comparison}
+COMPARISON_OPERATORS = {'==': 'eq', 'eq': 'eq', '!=': 'ne', 'ne': 'ne', 'lt': 'lt', '<': 'lt', 'gt': 'gt', '>': 'gt',
+                        'le': 'le', '<=': 'le', 'ge': 'ge', '>=': 'ge'}
+CONSTANTS = {'true': True, 'false': False, 'null': None}
+
+# node of the syntax tree
+#   kind: 'or', 'and' (children: operands), 'not' (children: (operand,)), 'compare' (value: name of the comparison,
+#   children: (left, right)), 'call' (value: function name, children: arguments), 'variable' (value: varname),
+#   'constant' (value: python value)
+ConditionNode = namedtuple('ConditionNode', ['kind', 'value', 'children'])
+
+
+class ConditionSyntaxError(ValueError):
+    pass
+
+
+def tokenize(condition_string) -> list:
+    """
+    :param condition_string: condition in Zofar syntax
+    :return: list of tuples (token type, token string); token type: 'number', 'string', 'op', 'name'
+    """
+    assert isinstance(condition_string, str)
+    tmp_list_of_tokens = []
+    tmp_position = 0
+    tmp_length = len(condition_string.rstrip())
+    while tmp_position < tmp_length:
+        tmp_match = TOKEN_PATTERN.match(condition_string, tmp_position)
+        if tmp_match is None or tmp_match.end() == tmp_position:
+            raise ConditionSyntaxError('unexpected character at position ' + str(tmp_position) + ' in condition: "' +
+                                       condition_string + '"')
+        tmp_list_of_tokens.append((tmp_match.lastgroup, tmp_match.group(tmp_match.lastgroup)))
+        tmp_position = tmp_match.end()
+    return tmp_list_of_tokens
+
+
+def normalize_condition(condition_string) -> str:
+    """
+    :return: the tokens of the condition joined by single spaces - conditions that differ only in whitespace have
+        the same normalized string
+    """
+    return ' '.join(token for token_type, token in tokenize(condition_string))
+
+
+class ConditionParser:
+    """
+    recursive descent parser; see the grammar at the top of this module
+    """
+
+    def __init__(self, condition_string):
+        self.condition_string = condition_string
+        self.tokens = tokenize(condition_string)
+        self.position = 0
+
+    def error(self, message):
+        raise ConditionSyntaxError(message + ' (token ' + str(self.position) + ') in condition: "' +
+                                   str(self.condition_string) + '"')
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][1]
+        return None
+
+    def next_token(self):
+        if self.position >= len(self.tokens):
+            self.error('unexpected end')
+        tmp_token = self.tokens[self.position]
+        self.position += 1
+        return tmp_token
+
+    def expect(self, token_string):
+        if self.next_token()[1] != token_string:
+            self.position -= 1
+            self.error('expected "' + token_string + '"')
+
+    def parse(self) -> ConditionNode:
+        if not self.tokens:
+            self.error('empty condition')
+        tmp_node = self.parse_expression()
+        if self.position != len(self.tokens):
+            self.error('unexpected "' + str(self.peek()) + '"')
+        return tmp_node
+
+    def parse_expression(self) -> ConditionNode:
+        tmp_list_of_operands = [self.parse_and_expression()]
+        while self.peek() in OR_OPERATORS:
+            self.next_token()
+            tmp_list_of_operands.append(self.parse_and_expression())
+        if len(tmp_list_of_operands) == 1:
+            return tmp_list_of_operands[0]
+        return ConditionNode('or', None, tuple(tmp_list_of_operands))
+
+    def parse_and_expression(self) -> ConditionNode:
+        tmp_list_of_operands = [self.parse_comparison()]
+        while self.peek() in AND_OPERATORS:
+            self.next_token()
+            tmp_list_of_operands.append(self.parse_comparison())
+        if len(tmp_list_of_operands) == 1:
+            return tmp_list_of_operands[0]
+        return ConditionNode('and', None, tuple(tmp_list_of_operands))
+
+    def parse_comparison(self) -> ConditionNode:
+        tmp_left = self.parse_not_expression()
+        if self.peek() in COMPARISON_OPERATORS:
+            tmp_operator = COMPARISON_OPERATORS[self.next_token()[1]]
+            return ConditionNode('compare', tmp_operator, (tmp_left, self.parse_not_expression()))
+        return tmp_left
+
+    def parse_not_expression(self) -> ConditionNode:
+        if self.peek() in NOT_OPERATORS:
+            self.next_token()
+            return ConditionNode('not', None, (self.parse_not_expression(),))
+        return self.parse_operand()
+
+    def parse_operand(self) -> ConditionNode:
+        tmp_token_type, tmp_token = self.next_token()
+        if tmp_token == '(':
+            tmp_node = self.parse_expression()
+            self.expect(')')
+            return tmp_node
+        if tmp_token_type == 'number':
+            return ConditionNode('constant', float(tmp_token) if '.' in tmp_token else int(tmp_token), ())
+        if tmp_token_type == 'string':
+            return ConditionNode('constant', tmp_token[1:-1], ())
+        if tmp_token_type != 'name':
+            self.position -= 1
+            self.error('unexpected "' + tmp_token + '"')
+        if tmp_token in CONSTANTS:
+            return ConditionNode('constant', CONSTANTS[tmp_token], ())
+        if tmp_token == 'zofar':
+            self.expect('.')
+            tmp_function_type, tmp_function = self.next_token()
+            if tmp_function not in FUNCTIONS:
+                self.position -= 1
+                self.error('unsupported function "zofar.' + tmp_function + '"')
+            self.expect('(')
+            tmp_list_of_arguments = []
+            if self.peek() != ')':
+                tmp_list_of_arguments.append(self.parse_expression())
+                while self.peek() == ',':
+                    self.next_token()
+                    tmp_list_of_arguments.append(self.parse_expression())
+            self.expect(')')
+            return ConditionNode('call', tmp_function, tuple(tmp_list_of_arguments))
+        if tmp_token in OR_OPERATORS + AND_OPERATORS + NOT_OPERATORS or tmp_token in COMPARISON_OPERATORS:
+            self.position -= 1
+            self.error('unexpected operator "' + tmp_token + '"')
+        if self.peek() == '.':
+            self.next_token()
+            tmp_attribute = self.next_token()[1]
+            if tmp_attribute != 'value':
+                self.position -= 1
+                self.error('unsupported attribute "' + tmp_token + '.' + tmp_attribute + '"')
+        return ConditionNode('variable', tmp_token, ())
+
+
+def parse_condition(condition_string) -> ConditionNode:
+    """
+    :param condition_string: condition in Zofar syntax
+    :return: root ConditionNode of the syntax tree
+    """
+    return ConditionParser(condition_string).parse()
+
+
+# runtime helpers of the compiled conditions
+
+def to_boolean(value) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+def to_number(value):
+    """
+    :return: int or float, or None if the value is missing or not numeric
+    """
+    if value is None or isinstance(value, bool):
+        return None if value is None else int(value)
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        tmp_number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(tmp_number) if tmp_number.is_integer() else tmp_number
+
+
+def is_missing(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() == '')
+
+
+def compare_equal(left, right) -> bool:
+    if left is None or right is None:
+        return left is right
+    if isinstance(left, bool) or isinstance(right, bool):
+        return to_boolean(left) == to_boolean(right)
+    if isinstance(left, (int, float)) or isinstance(right, (int, float)):
+        return to_number(left) == to_number(right)
+    return left == right
+
+
+def compare_order(left, right, operator) -> bool:
+    """
+    :param operator: 'lt', 'gt', 'le' or 'ge'
+    :return: result of the numeric comparison; False if an operand is missing or not numeric
+    """
+    left = to_number(left)
+    right = to_number(right)
+    if left is None or right is None:
+        return False
+    if operator == 'lt':
+        return left < right
+    if operator == 'gt':
+        return left > right
+    if operator == 'le':
+        return left <= right
+    return left >= right
+
+
+# supported zofar.* functions: {name: (python function, name of the function within the generated source)}
+FUNCTIONS = {'asNumber': (to_number, '_to_number'),
+             'isMissing': (is_missing, '_is_missing')}
+
+_GLOBALS_OF_COMPILED_CONDITIONS = {'__builtins__': {},
+                                   '_to_boolean': to_boolean, '_to_number': to_number, '_is_missing': is_missing,
+                                   '_compare_equal': compare_equal, '_compare_order': compare_order}
+
+
+def return_boolean_python_source(node) -> str:
+    """
+    :return: python expression of the node that evaluates to a bool
+    """
+    if node.kind in ['or', 'and', 'not', 'compare'] or (node.kind == 'call' and node.value == 'isMissing') or \
+            (node.kind == 'constant' and isinstance(node.value, bool)):
+        return return_python_source(node)
+    return '_to_boolean(' + return_python_source(node) + ')'
+
+
+def return_python_source(node) -> str:
+    """
+    :param node: ConditionNode
+    :return: python expression of the node; the values of the variables are read from the dict "_values"
+    """
+    if node.kind == 'or':
+        return '(' + ' or '.join(return_boolean_python_source(child) for child in node.children) + ')'
+    if node.kind == 'and':
+        return '(' + ' and '.join(return_boolean_python_source(child) for child in node.children) + ')'
+    if node.kind == 'not':
+        return '(not ' + return_boolean_python_source(node.children[0]) + ')'
+    if node.kind == 'compare':
+        tmp_left, tmp_right = [return_python_source(child) for child in node.children]
+        if node.value == 'eq':
+            return '_compare_equal(' + tmp_left + ', ' + tmp_right + ')'
+        if node.value == 'ne':
+            return '(not _compare_equal(' + tmp_left + ', ' + tmp_right + '))'
+        return '_compare_order(' + tmp_left + ', ' + tmp_right + ', ' + repr(node.value) + ')'
+    if node.kind == 'call':
+        return FUNCTIONS[node.value][1] + '(' + ', '.join(return_python_source(child) for child in node.children) + ')'
+    if node.kind == 'variable':
+        return '_values.get(' + repr(node.value) + ')'
+    if node.kind == 'constant':
+        return repr(node.value)
+    raise ValueError('unknown node: ' + str(node))
+
+
+def return_set_of_varnames(node) -> set:
+    if node.kind == 'variable':
+        return {node.value}
+    tmp_set = set()
+    for child in node.children:
+        tmp_set |= return_set_of_varnames(child)
+    return tmp_set
+
+
+class CompiledCondition:
+    """
+    callable: compiled_condition({varname: value}) -> bool
+    """
+    __slots__ = ('condition', 'tree', 'varnames', 'python_source', 'function')
+
+    def __init__(self, condition_string):
+        self.condition = normalize_condition(condition_string)
+        self.tree = parse_condition(self.condition)
+        self.varnames = frozenset(return_set_of_varnames(self.tree))
+        self.python_source = return_boolean_python_source(self.tree)
+        # the source only consists of helper calls, repr() literals and dict lookups
+        self.function = eval('lambda _values: ' + self.python_source, dict(_GLOBALS_OF_COMPILED_CONDITIONS))
+
+    def __call__(self, values) -> bool:
+        return self.function(values)
+
+    def __reduce__(self):
+        # the function is compiled again after unpickling
+        return compile_condition, (self.condition,)
+
+    def __str__(self):
+        return self.condition
+
+
+# {normalized condition string: CompiledCondition}
+_compiled_conditions = {}
+# {condition string as found in the QML: CompiledCondition}; saves the tokenization for repeated lookups
+_compiled_conditions_by_raw_string = {}
+
+
+def compile_condition(condition_string) -> CompiledCondition:
+    """
+    :param condition_string: condition in Zofar syntax
+    :return: CompiledCondition, compiled only once per normalized condition
+    :raises ConditionSyntaxError: if the condition cannot be parsed
+    """
+    if condition_string in _compiled_conditions_by_raw_string:
+        return _compiled_conditions_by_raw_string[condition_string]
+    tmp_normalized = normalize_condition(condition_string)
+    if tmp_normalized not in _compiled_conditions:
+        _compiled_conditions[tmp_normalized] = CompiledCondition(tmp_normalized)
+    _compiled_conditions_by_raw_string[condition_string] = _compiled_conditions[tmp_normalized]
+    return _compiled_conditions[tmp_normalized]
+
+
+def clear_cache():
+    _compiled_conditions.clear()
+    _compiled_conditions_by_raw_string.clear()
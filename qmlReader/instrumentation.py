@@ -0,0 +1,229 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# setting this environment variable to a non-empty value enables the default instrumentation at import time
+INSTRUMENTATION_ENVIRONMENT_VARIABLE = 'QMLREADER_INSTRUMENTATION'
+LOG_FORMAT = '%(name)s\t%(module)s\t%(funcName)s\t%(asctime)s\t%(lineno)d\t%(levelname)-8s\t%(message)s'
+
+# log files that already have a handler attached: {(logger name, absolute path of log file): handler}
+_dict_of_log_file_handlers = {}
+_log_file_handlers_lock = threading.Lock()
+
+
+def setup_debug_logger(log_file, log_level=logging.DEBUG, logger_name='debug'):
+    """
+    Attaches a FileHandler for log_file to the logger - only once per process, however often it is called (the
+    startup_logger methods of QmlReader, Questionnaire and the GUI used to add a new handler on every call).
+    CRITICAL: 50, ERROR: 40, WARNING: 30, INFO: 20, DEBUG: 10, NOTSET: 0
+    :param log_file: path of the log file
+    :param log_level: level of the file handler
+    :param logger_name: name of the logger
+    :return: logging.Logger
+    """
+    logging.basicConfig(level=log_level)
+    logger = logging.getLogger(logger_name)
+    tmp_key = (logger_name, os.path.abspath(log_file))
+    with _log_file_handlers_lock:
+        if tmp_key not in _dict_of_log_file_handlers:
+            fh = logging.FileHandler(log_file)
+            fh.setLevel(log_level)
+            fh.setFormatter(logging.Formatter(LOG_FORMAT))
+            logger.addHandler(fh)
+            _dict_of_log_file_handlers[tmp_key] = fh
+    return logger
+
+
+class _NullPhase:
+    """
+    context manager that is returned by Instrumentation.phase() while the instrumentation is disabled
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrumentation.add_phase_time(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Instrumentation:
+    """
+    Per-phase timers and counters for the pipeline (parse, extract transitions, extract variables, build graph,
+    layout, draw, write outputs). While disabled, phase() returns a shared no-op context manager and count() returns
+    immediately.
+
+    Phase times are cumulative per name (a phase that runs once per page is summed up). Nested phases are measured
+    independently, so the time of an inner phase is also contained in its outer phase.
+    """
+
+    def __init__(self, enabled=False, trace=False):
+        """
+        :param enabled: if False, nothing is measured
+        :param trace: if True (and enabled), every single phase run is kept for write_trace_events()
+        """
+        self.enabled = enabled
+        self.trace = trace
+        self.phases = {}
+        self.counters = {}
+        self.trace_events = []
+        self.start_time = None
+        self.reset()
+
+    def reset(self):
+        # {phase name: [total seconds, number of calls]}
+        self.phases = {}
+        # {counter name: value}
+        self.counters = {}
+        # list of tuples (phase name, start, end, thread id)
+        self.trace_events = []
+        self.start_time = time.perf_counter()
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.trace = trace
+
+    def disable(self):
+        self.enabled = False
+
+    def phase(self, name):
+        """
+        usage: with instrumentation.phase('parse'): ...
+        :param name: name of the phase
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_phase_time(self, name, start, end):
+        if name in self.phases:
+            self.phases[name][0] += end - start
+            self.phases[name][1] += 1
+        else:
+            self.phases[name] = [end - start, 1]
+        if self.trace:
+            self.trace_events.append((name, start, end, threading.get_ident()))
+
+    def return_dict_of_results(self) -> dict:
+        """
+        :return: {'phases': {name: {'seconds': float, 'calls': int}}, 'counters': {name: value}}
+        """
+        return {'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in
+                           self.phases.items()},
+                'counters': dict(self.counters)}
+
+    def write_json(self, output_file):
+        with open(output_file, 'w') as f:
+            json.dump(self.return_dict_of_results(), f, indent=2)
+
+    def write_trace_events(self, output_file):
+        """
+        Writes the recorded phases in the trace event format (chrome://tracing, Perfetto). Without trace=True, every
+        phase is written as one event of its cumulative duration.
+        :param output_file: path of the json file
+        :return: None
+        """
+        tmp_pid = os.getpid()
+        tmp_list_of_events = []
+        if self.trace:
+            for name, start, end, thread_id in self.trace_events:
+                tmp_list_of_events.append({'name': name, 'ph': 'X', 'pid': tmp_pid, 'tid': thread_id,
+                                           'ts': (start - self.start_time) * 1e6, 'dur': (end - start) * 1e6})
+        else:
+            tmp_timestamp = 0.0
+            for name, (seconds, calls) in self.phases.items():
+                tmp_list_of_events.append({'name': name, 'ph': 'X', 'pid': tmp_pid, 'tid': 0, 'ts': tmp_timestamp,
+                                           'dur': seconds * 1e6, 'args': {'calls': calls}})
+                tmp_timestamp += seconds * 1e6
+        for name, value in self.counters.items():
+            tmp_list_of_events.append({'name': name, 'ph': 'C', 'pid': tmp_pid, 'tid': 0,
+                                       'ts': (time.perf_counter() - self.start_time) * 1e6, 'args': {name: value}})
+        with open(output_file, 'w') as f:
+            json.dump({'traceEvents': tmp_list_of_events, 'displayTimeUnit': 'ms'}, f)
+
+
+# default instrumentation of the whole pipeline
+DEFAULT_INSTRUMENTATION = Instrumentation(enabled=bool(os.environ.get(INSTRUMENTATION_ENVIRONMENT_VARIABLE)))
+
+
+def phase(name):
+    return DEFAULT_INSTRUMENTATION.phase(name)
+
+
+def count(name, value=1):
+    DEFAULT_INSTRUMENTATION.count(name, value)
+
+
+def timed(name):
+    """
+    decorator that adds the time of every call of the decorated function to the phase name of the default
+    instrumentation (for functions that are phases as a whole, e.g. Questionnaire.draw_pgv_graph)
+    :param name: name of the phase
+    :return: decorator
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with DEFAULT_INSTRUMENTATION.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable(trace=False):
+    DEFAULT_INSTRUMENTATION.enable(trace=trace)
+
+
+def disable():
+    DEFAULT_INSTRUMENTATION.disable()
+
+
+def reset():
+    DEFAULT_INSTRUMENTATION.reset()
+
+
+def return_dict_of_results() -> dict:
+    return DEFAULT_INSTRUMENTATION.return_dict_of_results()
+
+
+def write_json(output_file):
+    DEFAULT_INSTRUMENTATION.write_json(output_file)
+
+
+def write_trace_events(output_file):
+    DEFAULT_INSTRUMENTATION.write_trace_events(output_file)
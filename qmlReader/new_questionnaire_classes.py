@@ -1,3 +1,6 @@
+from qmlReader import conditionCompiler
+
+
 class UniqueObject:
     def __init__(self, uid_value):
         self.uid = uid_value
@@ -46,12 +49,13 @@ class ConditionObject:
         self.python_condition = None
         self.condition = condition_string
 
-    def evaluate(self):
+    def evaluate(self, values=None):
+        """
+        :param values: {varname: value} of the variables the condition refers to; missing variables are None
+        :return: bool
+        """
         if self.python_condition is not None:
-            pass
-            # Todo: evaluate expression!
-            return True
-            return False
+            return self.python_condition({} if values is None else values)
         else:
             raise NotImplementedError(
                 'Condition: "' + str(self.condition) + '" has not yet been translated into python logic!')
@@ -64,9 +68,21 @@ class ConditionObject:
     def condition(self, condition_string):
         assert isinstance(condition_string, str) or isinstance(condition_string, bool) or condition_string is None
         self._condition = condition_string
+        # has to be translated again
+        self.python_condition = None
 
     def translate_condition_to_python_logic(self):
-        pass
+        """
+        sets self.python_condition to a callable({varname: value}) -> bool; conditions that are no string (True,
+        False) evaluate to their truth value, None evaluates to True
+        """
+        if isinstance(self.condition, str):
+            self.python_condition = conditionCompiler.compile_condition(self.condition)
+        elif self.condition is None:
+            self.python_condition = lambda values: True
+        else:
+            tmp_value = bool(self.condition)
+            self.python_condition = lambda values: tmp_value
 
 
 class CanHaveCondition(OnPageObjectWithUid):
@@ -115,13 +131,15 @@ class VariableObject:
 
     @var_value.setter
     def var_value(self, value):
-        assert isinstance(value, str) or isinstance(value, int) or value is None
+        assert isinstance(value, str) or isinstance(value, int) or isinstance(value, float) or value is None
         self.__var_value = value
 
 
 class VariableSimulation:
     def __init__(self):
         self.dict_of_variables = {}
+        # {var_name: distribution}; a distribution has a method draw(rng, size), see routingSimulation
+        self.dict_of_distributions = {}
 
     def add_variable(self, variable_object):
         assert isinstance(variable_object, VariableObject)
@@ -140,7 +158,30 @@ class VariableSimulation:
     def set_variable_by_name(self, var_name, value):
         assert isinstance(var_name, str)
         if var_name in self.dict_of_variables.keys():
-            self.dict_of_variables[var_name].set_value(value)
+            self.dict_of_variables[var_name].var_value = value
+
+    def set_distribution_by_name(self, var_name, distribution):
+        assert isinstance(var_name, str)
+        if var_name not in self.dict_of_variables.keys():
+            raise KeyError('Variable name: "' + var_name + '" not found.')
+        self.dict_of_distributions[var_name] = distribution
+
+    def draw_values(self, rng, size) -> dict:
+        """
+        :param rng: numpy.random.Generator
+        :param size: number of simulated respondents
+        :return: {var_name: drawn values (see the draw method of the distributions)}; the variables are drawn in the
+            order they have been added, so that a seeded rng gives the same values every time
+        """
+        return {var_name: self.dict_of_distributions[var_name].draw(rng, size)
+                for var_name in self.dict_of_variables.keys() if var_name in self.dict_of_distributions}
+
+    def set_values_from_dict(self, dict_of_values):
+        """
+        :param dict_of_values: {var_name: value}, e.g. one simulated respondent
+        """
+        for var_name, value in dict_of_values.items():
+            self.set_variable_by_name(var_name, value)
 
 
 class PageObject(UniqueObject):
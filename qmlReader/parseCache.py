@@ -0,0 +1,146 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from qmlReader import questionnaire
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'QmlReaderTools')
+# the cache directory can be changed via this environment variable
+CACHE_DIR_ENVIRONMENT_VARIABLE = 'QMLREADER_CACHE_DIR'
+DEFAULT_MAX_SIZE_BYTES = 512 * 1024 * 1024
+CACHE_FILE_EXTENSION = '.pickle'
+
+
+class ParseCache:
+    """
+    Persistent, content-addressed cache of extracted Questionnaire objects.
+
+    Entries are keyed by a hash of the QML file bytes, the reader version and the reader options, so an edited file or
+    a new reader version never hits a stale entry. Questionnaire objects are stored as pickles (QmlPage replaces its
+    lxml element by the serialized bytes, see QmlPage.__getstate__). When the total size of all entries exceeds
+    max_size_bytes, the least recently used entries are deleted.
+    """
+
+    def __init__(self, cache_dir=None, max_size_bytes=DEFAULT_MAX_SIZE_BYTES):
+        """
+        :param cache_dir: directory of the cache files; default: $QMLREADER_CACHE_DIR or ~/.cache/QmlReaderTools
+        :param max_size_bytes: upper bound of the total size of all cache files
+        """
+        self.logger = logging.getLogger('debug')
+        if cache_dir is None:
+            cache_dir = os.environ.get(CACHE_DIR_ENVIRONMENT_VARIABLE, DEFAULT_CACHE_DIR)
+        assert isinstance(max_size_bytes, int) and max_size_bytes > 0
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def return_key(file_bytes, reader_version, options=None) -> str:
+        """
+        :param file_bytes: content of the QML file
+        :param reader_version: version string of the reader; a new version invalidates all entries
+        :param options: optional dict of reader options that change the extracted Questionnaire
+        :return: hex digest that identifies the cache entry
+        """
+        assert isinstance(file_bytes, bytes)
+        tmp_hash = hashlib.sha256()
+        tmp_hash.update(str(reader_version).encode('utf-8'))
+        tmp_hash.update(str(questionnaire.__version__).encode('utf-8'))
+        if options is not None:
+            tmp_hash.update(str(sorted(options.items())).encode('utf-8'))
+        tmp_hash.update(b'\0')
+        tmp_hash.update(file_bytes)
+        return tmp_hash.hexdigest()
+
+    def return_path(self, key) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXTENSION)
+
+    def load(self, key):
+        """
+        :param key: see return_key()
+        :return: Questionnaire object or None, if there is no (readable) entry
+        """
+        tmp_path = self.return_path(key)
+        try:
+            with open(tmp_path, 'rb') as f:
+                tmp_questionnaire = pickle.load(f)
+        except FileNotFoundError:
+            self.logger.info('parse cache miss: ' + str(key))
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as exc:
+            self.logger.info('parse cache entry could not be read and will be removed: ' + str(key) + ', ' + str(exc))
+            self.remove(key)
+            return None
+        if not isinstance(tmp_questionnaire, questionnaire.Questionnaire):
+            self.remove(key)
+            return None
+        # refresh the access time for the least-recently-used eviction
+        os.utime(tmp_path)
+        self.logger.info('parse cache hit: ' + str(key))
+        return tmp_questionnaire
+
+    def store(self, key, questionnaire_object):
+        """
+        Writes the entry atomically and evicts old entries afterwards.
+        :param key: see return_key()
+        :param questionnaire_object: Questionnaire object
+        :return: None
+        """
+        assert isinstance(questionnaire_object, questionnaire.Questionnaire)
+        tmp_file_descriptor, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(tmp_file_descriptor, 'wb') as f:
+                pickle.dump(questionnaire_object, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.return_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.logger.info('parse cache entry stored: ' + str(key))
+        self.evict()
+
+    def remove(self, key):
+        tmp_path = self.return_path(key)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def return_list_of_entries(self) -> list:
+        """
+        :return: list of tuples (last access time, size in bytes, path) of all cache files, least recently used first
+        """
+        tmp_list = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_FILE_EXTENSION):
+                tmp_stat = entry.stat()
+                tmp_list.append((tmp_stat.st_mtime, tmp_stat.st_size, entry.path))
+        tmp_list.sort()
+        return tmp_list
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the total size is within self.max_size_bytes.
+        :return: None
+        """
+        tmp_list_of_entries = self.return_list_of_entries()
+        tmp_total_size = sum(size for mtime, size, path in tmp_list_of_entries)
+        for mtime, size, path in tmp_list_of_entries:
+            if tmp_total_size <= self.max_size_bytes:
+                break
+            self.logger.info('parse cache entry evicted: ' + str(path))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # already removed by another process
+                pass
+            tmp_total_size -= size
+
+    def clear(self):
+        for mtime, size, path in self.return_list_of_entries():
+            os.remove(path)
@@ -1,56 +1,496 @@
 __author__ = "Christian Friedrich"
 __maintainer__ = "Christian Friedrich"
 __license__ = "MIT"
-__version__ = "0.2.6"
+__version__ = "0.2.7"
 __status__ = "Prototype"
-__name__ = "QmlReader"
+# __name__ is not overridden in this module: load_many() sends load_questionnaire() to worker processes, which
+#  requires an importable module path (qmlReader.qmlReader)
 
 # last edited: 2020-04-16
 
-import html
 import lxml
 from lxml import objectify, etree
 import logging
-from qmlReader import questionnaire
+import os
+import time
+import hashlib
+from collections import namedtuple, Counter
+from concurrent.futures import ProcessPoolExecutor
+from qmlReader import questionnaire, instrumentation
 import re
 
+ZOFAR_NAMESPACE = 'http://www.his.de/zofar/xml/questionnaire'
+PAGE_PARTS = ['page', 'header', 'body', 'triggers', 'transitions']
+# {'{namespace}tag': part} for all parts that are child elements of a zofar:page
+PAGE_PART_TAGS = {'{' + ZOFAR_NAMESPACE + '}' + part: part for part in PAGE_PARTS if part != 'page'}
+
+# references of shown variables in page texts, e.g. "#{var01.value}"
+SHOWN_VARIABLE_PATTERN = re.compile(r'\{([a-zA-Z0-9_-]+)\.value\}')
+
+# result of load_questionnaire / load_many: source file, extracted Questionnaire, wall time in seconds
+LoadResult = namedtuple('LoadResult', ['file', 'questionnaire', 'seconds'])
+
+
+def load_questionnaire(file, **reader_kwargs) -> LoadResult:
+    """
+    :param file: path of the QML file
+    :param reader_kwargs: keyword arguments of QmlReader (streaming, keep_page_sources, cache)
+    :return: LoadResult
+    """
+    tmp_start = time.perf_counter()
+    tmp_questionnaire = QmlReader(file, **reader_kwargs).questionnaire
+    return LoadResult(file=file, questionnaire=tmp_questionnaire, seconds=time.perf_counter() - tmp_start)
+
+
+class QmlLoadError(Exception):
+    """
+    raised by load_many if a file cannot be read; unlike the lxml exceptions it can be sent back from a worker process
+    """
+
+    def __init__(self, file, message):
+        super().__init__(file, message)
+        self.file = file
+        self.message = message
+
+    def __str__(self):
+        return str(self.file) + ': ' + str(self.message)
+
+
+def _load_questionnaire_in_worker(file, reader_kwargs) -> LoadResult:
+    try:
+        return load_questionnaire(file, **reader_kwargs)
+    except Exception as exc:
+        raise QmlLoadError(file, type(exc).__name__ + ': ' + str(exc)) from exc
+
+
+def load_many(paths, jobs=None, **reader_kwargs) -> list:
+    """
+    Reads several QML files in a pool of worker processes. The Questionnaire objects are sent back pickled, i.e.
+    without their lxml elements (see QmlPage.__getstate__); QmlPage.xml_source is reconnected lazily on access.
+    :param paths: list of paths of QML files
+    :param jobs: number of worker processes, at most one per file; None: os.cpu_count(); 1 (or a single file): read
+        sequentially in this process
+    :param reader_kwargs: keyword arguments of QmlReader (streaming, keep_page_sources, cache)
+    :return: list of LoadResult, in the order of paths
+    :raises QmlLoadError: for the first file (in the order of paths) that cannot be read
+    """
+    logger = logging.getLogger('debug')
+    paths = list(paths)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    assert isinstance(jobs, int) and jobs > 0
+    jobs = min(jobs, len(paths))
+
+    tmp_start = time.perf_counter()
+    if jobs <= 1:
+        tmp_list_of_results = [_load_questionnaire_in_worker(file, reader_kwargs) for file in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            tmp_list_of_futures = [executor.submit(_load_questionnaire_in_worker, file, reader_kwargs) for file in
+                                   paths]
+            tmp_list_of_results = [future.result() for future in tmp_list_of_futures]
+
+    for result in tmp_list_of_results:
+        logger.info('load_many: ' + str(result.file) + ' read in ' + '{0:.3f}'.format(result.seconds) + ' s')
+    logger.info('load_many: ' + str(len(paths)) + ' files read in ' + '{0:.3f}'.format(
+        time.perf_counter() - tmp_start) + ' s with ' + str(jobs) + ' job(s)')
+    return tmp_list_of_results
+
 
 class QmlReader:
     """
     Class for Reading and extracting elements from QML-Files.
     """
 
-    def __init__(self, file):
+    def __init__(self, file, streaming=False, keep_page_sources=True, cache=None, incremental=False):
+        """
+        :param file: path of the QML file
+        :param streaming: if True, the file is parsed page by page via lxml.etree.iterparse instead of building the
+            whole objectified tree; every page element is cleared after extraction, so QmlPage.xml_source is None
+            (QmlPage.xml_source_str is still available).
+        :param keep_page_sources: if False, the QmlPage objects keep neither the xml element nor the xml string of
+            their page (for batch jobs that never show page sources)
+        :param cache: optional qmlReader.parseCache.ParseCache; if the file content has been read before by the same
+            reader version, the Questionnaire is loaded from the cache and the file is not parsed (self.root and
+            self.data are None then)
+        :param incremental: if True, a hash of every page and the variable references of every page are kept, so that
+            reparse_changed_pages() can update self.questionnaire after the file has been edited
+        """
+        self.init_attributes(file, streaming=streaming, keep_page_sources=keep_page_sources, incremental=incremental)
+        self.logger.info('starting up QmlReader')
+
+        tmp_cache_key = None
+        if cache is not None:
+            with instrumentation.phase('read file'), open(file, 'rb') as f:
+                self.logger.info('reading file: ' + str(file))
+                self.data = f.read()
+            tmp_cache_key = cache.return_key(self.data, reader_version=__version__,
+                                             options={'keep_page_sources': self.keep_page_sources})
+            tmp_questionnaire = cache.load(tmp_cache_key)
+            if tmp_questionnaire is not None:
+                instrumentation.count('parse cache hits')
+                # the same content may have been read from another path
+                tmp_questionnaire.file = self.file
+                self.questionnaire = tmp_questionnaire
+                self.title = tmp_questionnaire.title
+                self.data = None
+                self.logger.info("QmlReader object is done (loaded from cache).")
+                return
+
+        if self.streaming:
+            self.data = None
+            self.read_file_streaming()
+        else:
+            if self.data is None:
+                with instrumentation.phase('read file'), open(file, 'rb') as f:
+                    self.logger.info('reading file: ' + str(file))
+                    self.data = f.read()
+            self.read_file_objectified()
+
+        if cache is not None:
+            with instrumentation.phase('write outputs'):
+                cache.store(tmp_cache_key, self.questionnaire)
+        self.logger.info("QmlReader object is done.")
+
+    def init_attributes(self, file, streaming=False, keep_page_sources=True, incremental=False):
         self.file = file
         self.tmp = []
         self.logger = logging.getLogger('debug')
         self.startup_logger(log_level=logging.DEBUG)
-        self.logger.info('starting up QmlReader')
         # self.DiGraph = nx.DiGraph()
 
-        with open(file, 'rb') as f:
-            self.logger.info('reading file: ' + str(file))
-            self.data = f.read()
+        self.streaming = streaming
+        self.keep_page_sources = keep_page_sources
+        self.data = None
+        self.root = None
+        self.title = None
+        self.questionnaire = None
+        self.tmp_dict_of_pages = {}
+        self.tmp_list_of_transition_attribs = []
+        # uids of the pages that are currently reparsed, see self.reparse_changed_pages()
+        self.tmp_set_of_reparsed_pages = set()
+
+        self.incremental = incremental
+        # hash of the title and the declared variables
+        self.declarations_hash = None
+        # {page uid: hash of the zofar:page element}, in document order
+        self.page_hashes = {}
+        # {page uid: {'body': set of varnames, 'triggers': set of varnames}}
+        self.page_variable_references = {}
+        # {'body': Counter, 'triggers': Counter} - number of pages that reference each declared variable
+        self.variable_reference_counters = {'body': Counter(), 'triggers': Counter()}
+
+        # list of tuples (part, extractor, phase); see self.register_page_extractor()
+        self.page_extractors = []
+        # list of tuples (finisher, phase); the finishers are run once after the last page has been visited
+        self.page_visit_finishers = []
+        self.register_default_page_extractors()
+
+    @classmethod
+    def from_questionnaire(cls, questionnaire_object):
+        """
+        :param questionnaire_object: already extracted Questionnaire object, e.g. from load_many()
+        :return: QmlReader object for this Questionnaire, without parsing the file again
+        """
+        assert isinstance(questionnaire_object, questionnaire.Questionnaire)
+        tmp_qml_reader = cls.__new__(cls)
+        tmp_qml_reader.init_attributes(questionnaire_object.file)
+        tmp_qml_reader.questionnaire = questionnaire_object
+        tmp_qml_reader.title = questionnaire_object.title
+        return tmp_qml_reader
 
-        self.root = objectify.fromstring(self.data)
+    def read_file_objectified(self):
+        with instrumentation.phase('parse'):
+            self.root = objectify.fromstring(self.data)
 
-        self.title = None
         self.set_title()
         self.questionnaire = questionnaire.Questionnaire(file=self.file, title=self.title)
 
         self.extract_declared_variables()
+        if self.incremental:
+            self.declarations_hash = self.return_declarations_hash(self.title, self.root.variables)
 
-        self.tmp_dict_of_pages = {}
         # self.pgv_graph = None
         # self.extract_pages_into_tmp_dict()
-        self.extract_pages_to_self()
-        self.extract_transitions_to_self()
+        self.visit_pages(self.root.iterchildren(tag='{' + ZOFAR_NAMESPACE + '}page'))
+
+    def register_default_page_extractors(self):
+        # the order of registration is the order in which the extractors are called for each page
+        self.register_page_extractor('page', self.extract_page_object_from_qml_page_source,
+                                     phase='extract pages')
+        self.register_page_extractor('transitions', self.collect_transition_attribs_from_qml_transitions_source,
+                                     finisher=self.extract_transitions_from_collected_attribs,
+                                     phase='extract transitions')
+        self.register_page_extractor('body', self.extract_variables_from_qml_body_source,
+                                     phase='extract variables')
+        self.register_page_extractor('page', self.extract_shown_variables_from_qml_page_source,
+                                     phase='extract variables')
+        self.register_page_extractor('triggers', self.extract_variables_from_qml_triggers_source,
+                                     phase='extract variables')
+        self.register_page_extractor('header', self.extract_page_headers_from_qml_header_source,
+                                     phase='extract headers')
+        self.register_page_extractor('body', self.extract_question_objects_from_qml_body_source,
+                                     phase='extract questions')
+        if self.incremental:
+            self.register_page_extractor('page', self.record_page_hash_from_qml_page_source,
+                                         phase='record page hashes')
+            self.register_page_extractor('body', self.record_variable_references_from_qml_body_source,
+                                         phase='extract variables')
+            self.register_page_extractor('triggers', self.record_variable_references_from_qml_triggers_source,
+                                         phase='extract variables')
+
+    def register_page_extractor(self, part, extractor, finisher=None, phase='extract other'):
+        """
+        Registers an extractor that is called for every visited page, without another pass over all pages.
+        :param part: 'page' (the zofar:page element itself) or one of 'header', 'body', 'triggers', 'transitions'
+            (the first child element of the page with this tag; pages without it are skipped)
+        :param extractor: callable(part_source, page_uid)
+        :param finisher: optional callable without arguments; run once after the last page has been visited
+        :param phase: name of the instrumentation phase that the time of extractor and finisher is added to
+        :return: None
+        """
+        assert part in PAGE_PARTS
+        assert callable(extractor)
+        assert isinstance(phase, str)
+        self.page_extractors.append((part, extractor, phase))
+        if finisher is not None:
+            assert callable(finisher)
+            self.page_visit_finishers.append((finisher, phase))
+
+    def visit_pages(self, iterable_of_qml_page_sources):
+        """
+        Visits each page exactly once and sends its parts to the registered extractors.
+        :param iterable_of_qml_page_sources: iterable of objectified zofar:page elements
+        :return: None
+        """
+        self.logger.info("visit_pages")
+        for qml_page_source in iterable_of_qml_page_sources:
+            self.visit_page(qml_page_source)
+        self.finish_page_visits()
+
+    def visit_page(self, qml_page_source):
+        tmp_page_uid = qml_page_source.attrib['uid']
+        self.logger.info("visit_page: " + str(tmp_page_uid))
+        tmp_parts_dict = {'page': qml_page_source}
+        # one scan over the children of the page instead of one objectify lookup per part and extractor
+        for child in qml_page_source.iterchildren():
+            if child.tag in PAGE_PART_TAGS:
+                tmp_parts_dict.setdefault(PAGE_PART_TAGS[child.tag], child)
+        instrumentation.count('pages visited')
+        for part, extractor, phase in self.page_extractors:
+            if part in tmp_parts_dict:
+                with instrumentation.phase(phase):
+                    extractor(tmp_parts_dict[part], tmp_page_uid)
+
+    def finish_page_visits(self):
+        for finisher, phase in self.page_visit_finishers:
+            with instrumentation.phase(phase):
+                finisher()
+
+    def read_file_streaming(self):
+        """
+        Parses self.file with lxml.etree.iterparse. Each zofar:page is extracted as soon as its end event fires and is
+        cleared afterwards, so peak memory depends on the largest page rather than on the whole document. Transitions
+        are resolved after the last page, because their distances depend on the final order of all pages.
+        """
+        self.logger.info('reading file (streaming): ' + str(self.file))
+        tmp_tags = tuple('{' + ZOFAR_NAMESPACE + '}' + tag for tag in ['name', 'variables', 'page'])
+        # same settings as the default objectify parser, so that the results equal those of objectify.fromstring
+        context = etree.iterparse(self.file, events=('end',), tag=tmp_tags, remove_blank_text=True)
+        context.set_element_class_lookup(objectify.ObjectifyElementClassLookup())
+
+        tmp_iterator = iter(context)
+        while True:
+            # only the time spent in the parser is added to 'parse', the extraction is measured by the extractors
+            with instrumentation.phase('parse'):
+                tmp_event_and_element = next(tmp_iterator, None)
+            if tmp_event_and_element is None:
+                break
+            event, element = tmp_event_and_element
+            parent = element.getparent()
+            # only direct children of the questionnaire root are handled here
+            if parent is None or parent.getparent() is not None:
+                continue
+            tmp_tag = element.tag[element.tag.rfind('}') + 1:]
+            if tmp_tag == 'name':
+                self.title = element.text
+                self.questionnaire = questionnaire.Questionnaire(file=self.file, title=self.title)
+            elif tmp_tag == 'variables':
+                with instrumentation.phase('extract variables'):
+                    self.extract_declared_variables_from_qml_source(element)
+                if self.incremental:
+                    self.declarations_hash = self.return_declarations_hash(self.title, element)
+            elif tmp_tag == 'page':
+                self.visit_page(element)
+
+            # free the memory of the handled element and of all its preceding siblings
+            element.clear()
+            while element.getprevious() is not None:
+                parent.remove(element.getprevious())
+        del tmp_iterator
+        del context
+
+        self.finish_page_visits()
 
-        self.extract_variables_from_pages_body()
-        self.extract_variables_from_pages_triggers()
+    @staticmethod
+    def return_page_hash(qml_source_page) -> str:
+        return hashlib.sha1(etree.tostring(qml_source_page)).hexdigest()
 
-        self.extract_headers_and_questions_from_pages()
-        self.logger.info("QmlReader object is done.")
+    @staticmethod
+    def return_declarations_hash(title, qml_source_variables) -> str:
+        tmp_hash = hashlib.sha1(str(title).encode('utf-8'))
+        tmp_hash.update(etree.tostring(qml_source_variables))
+        return tmp_hash.hexdigest()
+
+    def record_page_hash_from_qml_page_source(self, qml_source_page, page_uid):
+        self.page_hashes[page_uid] = self.return_page_hash(qml_source_page)
+
+    def record_variable_references_from_qml_body_source(self, qml_source_body, page_uid):
+        # same selection as self.extract_variables_from_qml_body_source
+        self.record_variable_references(page_uid, 'body', [element.attrib['variable'] for element in
+                                                           qml_source_body.iterdescendants() if
+                                                           'variable' in element.attrib])
+
+    def record_variable_references_from_qml_triggers_source(self, qml_source_triggers, page_uid):
+        # same selection as self.extract_variables_from_qml_triggers_source
+        self.record_variable_references(page_uid, 'triggers', [element.attrib['variable'] for element in
+                                                               qml_source_triggers.iterdescendants() if
+                                                               'variable' in element.attrib])
+
+    def record_variable_references(self, page_uid, varplace, list_of_varnames):
+        tmp_set_of_varnames = {varname for varname in list_of_varnames if
+                               varname in self.questionnaire.variables.variables}
+        self.page_variable_references.setdefault(page_uid, {'body': set(), 'triggers': set()})[varplace].update(
+            tmp_set_of_varnames)
+        self.variable_reference_counters[varplace].update(tmp_set_of_varnames)
+
+    def drop_variable_references(self, page_uid) -> set:
+        """
+        :param page_uid: page uid
+        :return: set of the varnames that were referenced on the page
+        """
+        tmp_references = self.page_variable_references.pop(page_uid, {'body': set(), 'triggers': set()})
+        for varplace, tmp_set_of_varnames in tmp_references.items():
+            self.variable_reference_counters[varplace].subtract(tmp_set_of_varnames)
+        return tmp_references['body'] | tmp_references['triggers']
+
+    def update_varplaces(self, varnames):
+        """
+        Sets the varplace of each variable from the reference counters - the same result as extracting all pages:
+        'triggers' if it is used in any triggers, else 'body' if it is used in any body, else None.
+        :param varnames: iterable of names of declared variables
+        :return: None
+        """
+        for varname in varnames:
+            if self.variable_reference_counters['triggers'][varname] > 0:
+                tmp_varplace = 'triggers'
+            elif self.variable_reference_counters['body'][varname] > 0:
+                tmp_varplace = 'body'
+            else:
+                tmp_varplace = None
+            self.questionnaire.variables.variables[varname].set_varplace(varplace=tmp_varplace, varname=varname)
+
+    def reset_incremental_state(self):
+        self.declarations_hash = None
+        self.page_hashes = {}
+        self.page_variable_references = {}
+        self.variable_reference_counters = {'body': Counter(), 'triggers': Counter()}
+
+    def reparse_changed_pages(self) -> list:
+        """
+        Reads self.file again and extracts only the pages whose hash has changed; self.questionnaire is patched in
+        place (pages, transitions, sources, page variables, duplicate variables, varplaces). The file is still parsed
+        and hashed as a whole, but the extraction only runs for the changed pages.
+        Everything is extracted again (and self.questionnaire is replaced) if the title, the declared variables or the
+        sequence of page uids have changed, or if an old or new transition of a changed page refers to an undeclared
+        page (undeclared pages are appended in the order of their first reference, which the patch cannot keep).
+        :return: list of the uids of all reparsed pages
+        """
+        assert self.incremental, 'reparse_changed_pages() requires QmlReader(..., incremental=True)'
+        self.logger.info('reparse_changed_pages: ' + str(self.file))
+        with instrumentation.phase('read file'), open(self.file, 'rb') as f:
+            tmp_data = f.read()
+        with instrumentation.phase('parse'):
+            tmp_root = objectify.fromstring(tmp_data)
+        tmp_dict_of_page_sources = {}
+        tmp_page_hashes = {}
+        with instrumentation.phase('record page hashes'):
+            for qml_source_page in tmp_root.iterchildren(tag='{' + ZOFAR_NAMESPACE + '}page'):
+                tmp_dict_of_page_sources[qml_source_page.attrib['uid']] = qml_source_page
+                tmp_page_hashes[qml_source_page.attrib['uid']] = self.return_page_hash(qml_source_page)
+        tmp_list_of_changed_pages = [uid for uid, page_hash in tmp_page_hashes.items() if
+                                     self.page_hashes.get(uid) != page_hash]
+
+        if self.return_declarations_hash(tmp_root.name.text, tmp_root.variables) != self.declarations_hash or \
+                list(tmp_page_hashes) != list(self.page_hashes) or \
+                self.check_if_changed_pages_refer_to_undeclared_pages(tmp_list_of_changed_pages,
+                                                                      tmp_dict_of_page_sources):
+            self.logger.info('reparse_changed_pages: full reparse')
+            self.reset_incremental_state()
+            self.data = tmp_data
+            self.read_file_objectified()
+            return [page_uid for page_uid, page in self.questionnaire.pages.pages.items() if page.declared]
+
+        self.logger.info('reparse_changed_pages: changed pages: ' + str(tmp_list_of_changed_pages))
+        tmp_pages = self.questionnaire.pages.pages
+        tmp_set_of_affected_targets = set()
+        tmp_set_of_affected_varnames = set()
+        for page_uid in tmp_list_of_changed_pages:
+            # remove the old transitions of the page from the sources of their targets
+            for transition in tmp_pages[page_uid].transitions.transitions.values():
+                tmp_pages[transition.target].sources.sources.pop(page_uid, None)
+                tmp_set_of_affected_targets.add(transition.target)
+            tmp_set_of_affected_varnames |= self.drop_variable_references(page_uid)
+
+        self.tmp_set_of_reparsed_pages = set(tmp_list_of_changed_pages)
+        try:
+            self.visit_pages(tmp_dict_of_page_sources[page_uid] for page_uid in tmp_list_of_changed_pages)
+        finally:
+            self.tmp_set_of_reparsed_pages = set()
+
+        for page_uid in tmp_list_of_changed_pages:
+            tmp_set_of_affected_targets.update(
+                transition.target for transition in tmp_pages[page_uid].transitions.transitions.values())
+            if page_uid in self.page_variable_references:
+                tmp_set_of_affected_varnames |= self.page_variable_references[page_uid]['body']
+                tmp_set_of_affected_varnames |= self.page_variable_references[page_uid]['triggers']
+        # a full extraction adds the sources of each page in the order of the source pages
+        for target_uid in tmp_set_of_affected_targets:
+            tmp_sources = tmp_pages[target_uid].sources.sources
+            tmp_pages[target_uid].sources.sources = {
+                source_uid: tmp_sources[source_uid] for source_uid in
+                sorted(tmp_sources, key=self.questionnaire.pages.return_page_ordinal)}
+        self.update_varplaces(tmp_set_of_affected_varnames)
+
+        if self.keep_page_sources and not self.streaming:
+            # let the unchanged pages refer to the new tree as well, so that the old one can be freed
+            tmp_set_of_changed_pages = set(tmp_list_of_changed_pages)
+            for page_uid, qml_source_page in tmp_dict_of_page_sources.items():
+                if page_uid not in tmp_set_of_changed_pages:
+                    tmp_pages[page_uid].set_xml_source(qml_source_page)
+        self.root = tmp_root
+        self.data = tmp_data
+        self.page_hashes = tmp_page_hashes
+        return tmp_list_of_changed_pages
+
+    def check_if_changed_pages_refer_to_undeclared_pages(self, list_of_changed_pages, dict_of_page_sources) -> bool:
+        """
+        :param list_of_changed_pages: list of page uids
+        :param dict_of_page_sources: {page uid: new objectified zofar:page element}
+        :return: True, if any old or new transition of the changed pages has an undeclared (or unknown) target
+        """
+        tmp_pages = self.questionnaire.pages.pages
+        for page_uid in list_of_changed_pages:
+            tmp_list_of_targets = [transition.target for transition in
+                                   tmp_pages[page_uid].transitions.transitions.values()]
+            if hasattr(dict_of_page_sources[page_uid], 'transitions'):
+                tmp_list_of_targets += [transition_attribs['target'] for transition_attribs in
+                                        self.return_list_of_transition_attribs(
+                                            dict_of_page_sources[page_uid].transitions)]
+            for target_uid in tmp_list_of_targets:
+                if target_uid not in tmp_pages or not tmp_pages[target_uid].declared:
+                    return True
+        return False
 
     def list_of_variables_from_pages(self):
         pass
@@ -62,13 +502,8 @@ class QmlReader:
         """
         CRITICAL: 50, ERROR: 40, WARNING: 30, INFO: 20, DEBUG: 10, NOTSET: 0
         """
-        logging.basicConfig(level=log_level)
-        fh = logging.FileHandler("{0}.log".format('log_' + __name__))
-        fh.setLevel(log_level)
-        fh_format = logging.Formatter('%(name)s\t%(module)s\t%(funcName)s\t%(asctime)s\t%(lineno)d\t'
-                                      '%(levelname)-8s\t%(message)s')
-        fh.setFormatter(fh_format)
-        self.logger.addHandler(fh)
+        # the file handler is attached only once per process, not once per QmlReader object
+        instrumentation.setup_debug_logger("{0}.log".format('log_' + 'QmlReader'), log_level=log_level)
 
     def set_title(self):
         self.logger.info("set_title")
@@ -78,319 +513,321 @@ class QmlReader:
         self.logger.info("extract_title")
         return self.root.name.text
 
-    def extract_variables_from_pages_body(self):
-        self.logger.info("extract_variables_from_pages_body")
-        for pagenr in range(0, len(self.root.page)):
-            tmp_pagename = self.root.page[pagenr].attrib['uid']
-            if hasattr(self.root.page[pagenr], 'body'):
-                for element in self.root.page[pagenr].body.iterdescendants():
-                    if 'variable' in element.attrib:  # ToDo: if condition added just for debugging - remove later!
-                        tmp_varname = element.attrib['variable']
-                        if tmp_varname in self.questionnaire.variables.variables.keys():
-                            tmp_var_object = self.questionnaire.variables.variables[tmp_varname].set_varplace(
-                                varplace='body', varname=tmp_varname)
-                            if tmp_varname not in self.questionnaire.pages.pages[
-                                tmp_pagename].variables.list_all_vars() and tmp_varname not in \
-                                    self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.list_all_vars():
-                                self.questionnaire.pages.pages[tmp_pagename].variables.add_variable(tmp_var_object)
-                            else:
-                                self.logger.info(
-                                    'Variable "' + str(tmp_varname) + '" already in self.variables of page "' + str(
-                                        tmp_pagename) + '". Possible duplicate.')
-                                self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.add_variable(
-                                    tmp_var_object, replace=True)
-
-            shown_var_list = self.return_list_of_shown_variables_in_objectified_element_descendants(
-                self.root.page[pagenr])
-            for shown_variable in shown_var_list:
-                if shown_variable not in self.questionnaire.pages.pages[tmp_pagename].variables.list_all_shown_vars():
-                    self.questionnaire.pages.pages[tmp_pagename].variables.add_variable(
-                        questionnaire.Variable(varname=shown_variable, vartype='string', varplace='shown'))
-
-                # print(f'## shown: {shown_variable}')
+    def extract_variables_from_qml_body_source(self, qml_source_body, tmp_pagename):
+        for element in qml_source_body.iterdescendants():
+            if 'variable' in element.attrib:  # ToDo: if condition added just for debugging - remove later!
+                tmp_varname = element.attrib['variable']
+                if tmp_varname in self.questionnaire.variables.variables:
+                    tmp_var_object = self.questionnaire.variables.variables[tmp_varname]
+                    # a variable that is used in any triggers keeps varplace 'triggers', regardless of the order
+                    #  in which the pages are processed
+                    if tmp_var_object.varplace != 'triggers':
+                        tmp_var_object.set_varplace(varplace='body', varname=tmp_varname)
+                    if not self.questionnaire.pages.pages[tmp_pagename].variables.check_if_var(tmp_varname) and \
+                            not self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.check_if_var(
+                                tmp_varname):
+                        self.questionnaire.pages.pages[tmp_pagename].variables.add_variable(tmp_var_object)
+                    else:
+                        self.logger.info(
+                            'Variable "' + str(tmp_varname) + '" already in self.variables of page "' + str(
+                                tmp_pagename) + '". Possible duplicate.')
+                        self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.add_variable(
+                            tmp_var_object, replace=True)
+
+    def extract_shown_variables_from_qml_page_source(self, qml_source_page, tmp_pagename):
+        self.extract_shown_variables_from_list(
+            self.return_list_of_shown_variables_in_objectified_element_descendants(qml_source_page), tmp_pagename)
+
+    def extract_shown_variables_from_list(self, shown_var_list, tmp_pagename):
+        tmp_variables = self.questionnaire.pages.pages[tmp_pagename].variables
+        for shown_variable in shown_var_list:
+            if not tmp_variables.check_if_shown_var(shown_variable):
+                tmp_variables.add_variable(
+                    questionnaire.Variable(varname=shown_variable, vartype='string', varplace='shown'))
 
     @staticmethod
     def return_list_of_shown_variables_in_objectified_element_descendants(
             objectified_element: lxml.objectify.ObjectifiedElement) -> list:
-        tmp_list_text = [element for element in objectified_element.iterdescendants() if
-                         hasattr(element, 'text')]
-        tmp_list_with_actual_text = [element for element in tmp_list_text if
-                                     element.text is not None]
-        tmp_list_with_shown_variables = [element for element in tmp_list_with_actual_text if '.value}' in element.text]
-
-        results_list = []
-
-        for entry in tmp_list_with_shown_variables:
-            if isinstance(entry.text, str):
-                [results_list.append(found_string) for found_string in
-                 re.findall('\{([a-zA-Z0-9_-]+)\.value\}', entry.text) if found_string not in results_list]
-        return results_list
-
-    def extract_variables_from_pages_triggers(self):
-        self.logger.info("extract_variables_from_pages_triggers")
-        for pagenr in range(0, len(self.root.page)):
-            tmp_pagename = self.root.page[pagenr].attrib['uid']
-            if hasattr(self.root.page[pagenr], 'triggers'):
-                for i in self.root.page[pagenr].triggers.iterdescendants():
-                    try:
-                        tmp_varname = i.attrib['variable']
-                        tmp_var_object = self.questionnaire.variables.variables[tmp_varname].set_varplace(
-                            varplace='triggers', varname=tmp_varname)
-                        if tmp_varname not in self.questionnaire.pages.pages[
-                            tmp_pagename].variables.list_all_vars() and tmp_varname not in \
-                                self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.list_all_vars():
-                            self.questionnaire.pages.pages[tmp_pagename].variables.add_variable(tmp_var_object)
-                        else:
-                            self.logger.info(
-                                'Variable "' + str(tmp_varname) + '" already in self.variables of page "' + str(
-                                    tmp_pagename) + '". Possible duplicate.')
-                            self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.add_variable(
-                                tmp_var_object, replace=True)
-                    except KeyError:
-                        pass
+        """
+        :param objectified_element: e.g. a zofar:page element
+        :return: list of the names of all variables that are referenced as "{varname.value}" in the texts of the
+            descendants of objectified_element, without duplicates, in order of their first occurrence
+        """
+        # dict keys keep the insertion order and make the duplicate check O(1)
+        tmp_dict_of_shown_variables = {}
+        for element in objectified_element.iterdescendants():
+            tmp_text = element.text
+            # cheap substring test first; most texts do not reference any variable
+            if isinstance(tmp_text, str) and '.value}' in tmp_text:
+                for found_string in SHOWN_VARIABLE_PATTERN.findall(tmp_text):
+                    tmp_dict_of_shown_variables[found_string] = None
+        return list(tmp_dict_of_shown_variables)
+
+    def extract_variables_from_qml_triggers_source(self, qml_source_triggers, tmp_pagename):
+        for i in qml_source_triggers.iterdescendants():
+            try:
+                tmp_varname = i.attrib['variable']
+                tmp_var_object = self.questionnaire.variables.variables[tmp_varname].set_varplace(
+                    varplace='triggers', varname=tmp_varname)
+                if not self.questionnaire.pages.pages[tmp_pagename].variables.check_if_var(tmp_varname) and \
+                        not self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.check_if_var(
+                            tmp_varname):
+                    self.questionnaire.pages.pages[tmp_pagename].variables.add_variable(tmp_var_object)
+                else:
+                    self.logger.info(
+                        'Variable "' + str(tmp_varname) + '" already in self.variables of page "' + str(
+                            tmp_pagename) + '". Possible duplicate.')
+                    self.questionnaire.pages.pages[tmp_pagename].duplicate_variables.add_variable(
+                        tmp_var_object, replace=True)
+            except KeyError:
+                pass
 
     def extract_declared_variables(self):
         self.logger.info("extract_declared_variables")
-        for i in range(0, len(self.root.variables.variable)):
+        with instrumentation.phase('extract variables'):
+            self.extract_declared_variables_from_qml_source(self.root.variables)
+
+    def extract_declared_variables_from_qml_source(self, qml_source_variables):
+        for variable in qml_source_variables.variable:
             # print(self.questionnaire.filename)
-            # print(self.root.variables.variable[i].attrib['name'])
+            # print(variable.attrib['name'])
             self.questionnaire.variables.add_variable(
-                questionnaire.Variable(self.root.variables.variable[i].attrib["name"],
-                                       self.root.variables.variable[i].attrib["type"]))
+                questionnaire.Variable(variable.attrib["name"], variable.attrib["type"]))
+            instrumentation.count('declared variables')
 
     # def extract_pages_into_tmp_dict(self):
     #     self.logger.info("extract_pages_into_tmp_dict")
     #     for i in range(0, len(self.root.page)):
     #         self.tmp_dict_of_pages[self.root.page[i].attrib['uid']] = self.root.page[i]
 
-    def extract_pages_to_self(self):
-        self.logger.info("extract_pages_to_self")
-        for i in range(0, len(self.root.page)):
-            # get the objectified xml object of the xml page
-            tmp_qml_page_source = self.root.page[i]
-
-            tmp_page_uid = tmp_qml_page_source.attrib['uid']
-            tmp_qml_page_object = questionnaire.QmlPage(tmp_page_uid, declared=True)
-
-            if tmp_qml_page_source is not None:
-                # get the objectified xml, represented as bytes
-                tmp_xml_source_bytes = etree.tostring(tmp_qml_page_source)
-
-                # encode bytes to a string
-                tmp_xml_source_str_escaped = tmp_xml_source_bytes.decode('utf-8')
-                # unescape the html/xml escaped characters
-                tmp_xml_source_str = html.unescape(tmp_xml_source_str_escaped)
-                # clean the string (of namespace declarations)
-                search_string = ' xmlns:zofar="http://www.his.de/zofar/xml/questionnaire" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:display="http://www.dzhw.eu/zofar/xml/display"'
-                tmp_xml_source_str = tmp_xml_source_str.replace(search_string, '')
-                # add newlines
-                tmp_tags_with_newlines_before_list = ['<zofar:transition',
-                                                      '<zofar:transitions>',
-                                                      '<zofar:body>',
-                                                      '<zofar:header>',
-                                                      '<zofar:trigger',
-                                                      '<zofar:triggers>']
-                for entry in tmp_tags_with_newlines_before_list:
-                    tmp_xml_source_str = tmp_xml_source_str.replace(entry, '\n\t\t' + entry)
-
-                # save the objectified xml within the QmlPage object
-                tmp_qml_page_object.set_xml_source(tmp_qml_page_source)
-                # save the unescaped xml string of the page within the QmlPage object
-                tmp_qml_page_object.set_xml_source_str(tmp_xml_source_str)
-            self.questionnaire.pages.add_page(tmp_qml_page_object)
+    def extract_page_object_from_qml_page_source(self, qml_source_page, page_uid):
+        self.logger.info("extract_page_object_from_qml_page_source; uid: " + str(page_uid))
+        tmp_qml_page_object = questionnaire.QmlPage(page_uid, declared=True)
 
-    def extract_transitions_to_self(self):
-        self.logger.info("extract_transitions_to_self")
-        for i in range(0, len(self.root.page)):
-            tmp_qml_page_source = self.root.page[i]
-            tmp_page_uid = tmp_qml_page_source.attrib['uid']
-            # self.questionnaire.pages.add_page(questionnaire.QmlPage(tmp_page_uid, declared=True))
-            self.extract_transitions_from_qml_page_source(tmp_qml_page_source, tmp_page_uid)
+        if self.keep_page_sources:
+            if self.streaming:
+                # the page element is cleared right after the visit, so only its serialization can be kept
+                tmp_qml_page_object.set_xml_source_bytes(etree.tostring(qml_source_page))
+            else:
+                # save the objectified xml within the QmlPage object; the unescaped xml string is only rendered on
+                #  first access of QmlPage.xml_source_str
+                tmp_qml_page_object.set_xml_source(qml_source_page)
+        if page_uid in self.tmp_set_of_reparsed_pages:
+            # the reparsed page keeps its position and the sources of the transitions from all other pages
+            tmp_qml_page_object.sources = self.questionnaire.pages.pages[page_uid].sources
+            self.questionnaire.pages.add_page(tmp_qml_page_object, replace=True)
+        else:
+            self.questionnaire.pages.add_page(tmp_qml_page_object)
 
     def extract_transitions_from_qml_page_source(self, qml_source_page, uid):
         self.logger.info("extract_transitions_from_qml_page_source from page: " + str(uid))
         assert isinstance(qml_source_page, lxml.objectify.ObjectifiedElement)
         assert isinstance(uid, str)
         if hasattr(qml_source_page, 'transitions'):
-            if hasattr(qml_source_page.transitions, 'transition'):
-                i = -1
-                for transition in qml_source_page.transitions.transition:
-                    i += 1
-                    tmp_index = i
-                    tmp_transition_dict = transition.attrib
-                    tmp_target = tmp_transition_dict['target']
-
-                    source_page_index = self.list_of_pages().index(uid)
-                    if tmp_target not in self.list_of_pages():
-                        self.questionnaire.pages.add_page(qmlpage=questionnaire.QmlPage(uid=tmp_target, declared=False))
-                    target_page_index = self.list_of_pages().index(tmp_target)
-                    tmp_distance = target_page_index - source_page_index
-                    if 'condition' in tmp_transition_dict:
-                        tmp_condition = tmp_transition_dict['condition']
-                    else:
-                        tmp_condition = None
+            self.extract_transitions_from_attribs(
+                self.return_list_of_transition_attribs(qml_source_page.transitions), uid)
 
-                    tmp_transition_object = questionnaire.Transition(index=tmp_index,
-                                                                     target=tmp_target,
-                                                                     condition=tmp_condition,
-                                                                     source=uid,
-                                                                     distance=tmp_distance)
-                    self.questionnaire.pages.pages[uid].transitions.add_transitions(tmp_transition_object)
+    def collect_transition_attribs_from_qml_transitions_source(self, qml_source_transitions, uid):
+        # the distances of the transitions depend on the final order of all pages, so they are resolved after the
+        #  last page has been visited (see self.extract_transitions_from_collected_attribs)
+        self.tmp_list_of_transition_attribs.append((uid, self.return_list_of_transition_attribs(qml_source_transitions)))
 
-                    # add transition to sources for each page
-                    self.questionnaire.pages.pages[tmp_target].sources.add_source(tmp_transition_object)
+    def extract_transitions_from_collected_attribs(self):
+        self.logger.info("extract_transitions_from_collected_attribs")
+        for tmp_page_uid, tmp_transition_attribs in self.tmp_list_of_transition_attribs:
+            self.extract_transitions_from_attribs(tmp_transition_attribs, tmp_page_uid)
+        self.tmp_list_of_transition_attribs = []
+
+    @staticmethod
+    def return_list_of_transition_attribs(qml_source_transitions) -> list:
+        """
+        :param qml_source_transitions: objectified zofar:transitions element
+        :return: list of dicts (copies of the attributes of all zofar:transition elements), so that they stay available
+            after the element has been cleared
+        """
+        if hasattr(qml_source_transitions, 'transition'):
+            return [dict(transition.attrib) for transition in qml_source_transitions.transition]
+        return []
+
+    def extract_transitions_from_attribs(self, list_of_transition_attribs, uid):
+        assert isinstance(uid, str)
+        i = -1
+        for tmp_transition_dict in list_of_transition_attribs:
+            i += 1
+            tmp_index = i
+            tmp_target = tmp_transition_dict['target']
+
+            if tmp_target not in self.questionnaire.pages.pages:
+                self.questionnaire.pages.add_page(qmlpage=questionnaire.QmlPage(uid=tmp_target, declared=False))
+            tmp_distance = self.questionnaire.pages.return_distance(uid, tmp_target)
+            if 'condition' in tmp_transition_dict:
+                tmp_condition = tmp_transition_dict['condition']
+            else:
+                tmp_condition = None
+
+            tmp_transition_object = questionnaire.Transition(index=tmp_index,
+                                                             target=tmp_target,
+                                                             condition=tmp_condition,
+                                                             source=uid,
+                                                             distance=tmp_distance)
+            self.questionnaire.pages.pages[uid].transitions.add_transitions(tmp_transition_object)
+
+            # add transition to sources for each page
+            self.questionnaire.pages.pages[tmp_target].sources.add_source(tmp_transition_object)
+            instrumentation.count('transitions')
 
     def extract_questions_from_pages(self):
         self.logger.info("extract_questions_from_pages")
         pass
 
-    def extract_headers_and_questions_from_pages(self):
-        self.logger.info("extract_headers_from_pages")
-        for i in range(0, len(self.root.page)):
-            tmp_qml_page_source = self.root.page[i]
-            tmp_page_uid = tmp_qml_page_source.attrib['uid']
-            self.extract_page_headers_from_qml_page_source(tmp_qml_page_source, tmp_page_uid)
-            self.extract_question_objects_from_qml_page_source(tmp_qml_page_source, tmp_page_uid)
-
     def extract_page_headers_from_qml_page_source(self, qml_source_page, page_uid):
         self.logger.info("extract_page_headers_from_page_sources; uid: " + str(page_uid))
         assert isinstance(qml_source_page, lxml.objectify.ObjectifiedElement)
         assert isinstance(page_uid, str)
         if hasattr(qml_source_page, 'header'):
-            self.logger.info("  found page header")
-            i = -1
-            if len([i for i in qml_source_page.header.iterchildren()]) > 0:
-                self.logger.info("  page header has length > 0")
-                for header in qml_source_page.header.iterchildren():
-                    tmp_object = None
-                    i += 1
-                    tmp_index = i
-                    self.logger.info("  page header object - index: " + str(i))
-                    if 'uid' not in header.attrib:
-                        if hasattr(header, 'tag'):
-                            if header.tag == 'comment':
-                                self.logger.info("  found page header object: xml comment, ignored")
-                        else:
-                            self.logger.error(
-                                '   found object in page header of ' + str(page_uid) + ' that could not be read.')
-                        continue
-                    tmp_uid = header.attrib['uid']
-                    self.logger.info("  page header object - uid: " + str(tmp_uid))
-                    if header.text is not None:
-                        tmp_text = header.text
-                    else:
-                        tmp_text = ''
-                    self.logger.info("  page header object - text: '" + str(tmp_text) + "'")
+            self.extract_page_headers_from_qml_header_source(qml_source_page.header, page_uid)
+        else:
+            self.logger.info("  no page header found")
 
-                    if 'visible' in header.attrib:
-                        tmp_visible_conditions = header.attrib['visible']
-                        self.logger.info("  found visible condition: " + str(tmp_visible_conditions))
+    def extract_page_headers_from_qml_header_source(self, qml_source_header, page_uid):
+        assert isinstance(qml_source_header, lxml.objectify.ObjectifiedElement)
+        assert isinstance(page_uid, str)
+        self.logger.info("  found page header")
+        i = -1
+        if len([i for i in qml_source_header.iterchildren()]) > 0:
+            self.logger.info("  page header has length > 0")
+            for header in qml_source_header.iterchildren():
+                tmp_object = None
+                i += 1
+                tmp_index = i
+                self.logger.info("  page header object - index: " + str(i))
+                if 'uid' not in header.attrib:
+                    if hasattr(header, 'tag'):
+                        if header.tag == 'comment':
+                            self.logger.info("  found page header object: xml comment, ignored")
                     else:
-                        tmp_visible_conditions = None
-                        self.logger.info("  found visible condition: None")
+                        self.logger.error(
+                            '   found object in page header of ' + str(page_uid) + ' that could not be read.')
+                    continue
+                tmp_uid = header.attrib['uid']
+                self.logger.info("  page header object - uid: " + str(tmp_uid))
+                if header.text is not None:
+                    tmp_text = header.text
+                else:
+                    tmp_text = ''
+                self.logger.info("  page header object - text: '" + str(tmp_text) + "'")
 
-                    tmp_tag = header.tag[header.tag.rfind('}') + 1:]
-                    self.logger.info("  found tag: '" + str(tmp_tag) + "'")
-                    tmp_object = questionnaire.PageHeaderObject(uid=tmp_uid, tag=tmp_tag, text=tmp_text,
-                                                                index=tmp_index,
-                                                                visible_conditions=tmp_visible_conditions)
+                if 'visible' in header.attrib:
+                    tmp_visible_conditions = header.attrib['visible']
+                    self.logger.info("  found visible condition: " + str(tmp_visible_conditions))
+                else:
+                    tmp_visible_conditions = None
+                    self.logger.info("  found visible condition: None")
 
-                    self.logger.info(
-                        "  adding PageHeaderObject: '" + str(tmp_object.tag) + "' to page: " + str(page_uid))
-                    self.questionnaire.pages.pages[page_uid].header.add_header_object(tmp_object)
+                tmp_tag = header.tag[header.tag.rfind('}') + 1:]
+                self.logger.info("  found tag: '" + str(tmp_tag) + "'")
+                tmp_object = questionnaire.PageHeaderObject(uid=tmp_uid, tag=tmp_tag, text=tmp_text,
+                                                            index=tmp_index,
+                                                            visible_conditions=tmp_visible_conditions)
 
-            else:
-                self.logger.info("  page header has length == 0 and will be ignored")
+                self.logger.info(
+                    "  adding PageHeaderObject: '" + str(tmp_object.tag) + "' to page: " + str(page_uid))
+                self.questionnaire.pages.pages[page_uid].header.add_header_object(tmp_object)
 
         else:
-            self.logger.info("  no page header found")
+            self.logger.info("  page header has length == 0 and will be ignored")
 
     def extract_question_objects_from_qml_page_source(self, qml_source_page, page_uid):
         self.logger.info("extract_question_objects_from_qml_page_source; uid: " + str(page_uid))
         assert isinstance(qml_source_page, lxml.objectify.ObjectifiedElement)
         assert isinstance(page_uid, str)
         if hasattr(qml_source_page, 'body'):
-            i = 0
-            self.logger.info('  body found on page "' + str(page_uid) + '".')
-            if 'uid' in qml_source_page.body.attrib:
-                tmp_body_uid = qml_source_page.body.attrib['uid']
-            else:
-                # ToDo: check if this can be set to None instead of str
-                tmp_body_uid = 'None'
-            for element in qml_source_page.body.iterchildren():
-                tmp_tag = element.tag[element.tag.rfind('}') + 1:]
-
-                if tmp_tag in ['calendar', 'comparison', 'display', 'matrixDouble', 'matrixQuestionMixed',
-                               'matrixQuestionOpen', 'matrixQuestionSingleChoice', 'multipleChoice', 'questionOpen',
-                               'questionPretest', 'questionSingleChoice']:
-                    tmp_index = i
-                    i += 1
-
-                if tmp_tag == 'calendar':
-                    tmp_question_header_object = self.extract_question_header_from_qml_element_source(element, page_uid)
-
-                elif tmp_tag == 'comparison':
-                    pass
-
-                elif tmp_tag == 'display':
-                    pass
-
-                elif tmp_tag == 'matrixDouble':
-                    pass
-
-                elif tmp_tag == 'matrixMultipleChoice':
-                    pass
-
-                elif tmp_tag == 'matrixQuestionMixed':
-                    pass
-
-                elif tmp_tag == 'matrixQuestionOpen':
-                    pass
-
-                elif tmp_tag == 'matrixQuestionSingleChoice':
-                    list_of_items_aos = []
-                    list_of_elements = []
-                    for entry in element.iterdescendants():
-                        if entry.tag[entry.tag.rfind('}') + 1:] == 'item':
-                            list_of_elements.append(entry)
-
-                    for item in list_of_elements:
-                        list_of_answeroptions = []
-                        for item_element in item.iterdescendants():
-                            print('444')
-                            if item_element.tag[item_element.tag.rfind('}') + 1:] == 'answerOption':
-                                tmp_value = None
-                                if 'label' in item_element.attrib:
-                                    tmp_value = item_element.attrib['label']
-                                list_of_answeroptions.append(tmp_value)
-                        list_of_items_aos.append(tuple(list_of_answeroptions))
-
-                    if list_of_items_aos:
-                        if len(set(list_of_items_aos)) != 1:
-                            print(page_uid)
-                    print(list_of_items_aos)
-
-
-                elif tmp_tag == 'multipleChoice':
-                    pass
-
-                elif tmp_tag == 'questionOpen':
-                    pass
-
-                elif tmp_tag == 'questionPretest':
-                    pass
-
-                elif tmp_tag == 'questionSingleChoice':
-                    pass
-
-                    # a = self.find_tag_in_descendants(element, 'responseDomain')
-                    # b = self.find_attribute_in_descendants(element, 'responseDomain', 'type', 'dropDown')
-                    # # ToDo
-                    # ## self.questionnaire.pages.pages[page_uid].questions.add_question_object()
-                    #
-                    # (self.extract_question_header_from_qml_element_source(element, page_uid))
-                if tmp_tag == 'section':
-                    pass
+            self.extract_question_objects_from_qml_body_source(qml_source_page.body, page_uid)
+
+    def extract_question_objects_from_qml_body_source(self, qml_source_body, page_uid):
+        assert isinstance(qml_source_body, lxml.objectify.ObjectifiedElement)
+        assert isinstance(page_uid, str)
+        i = 0
+        self.logger.info('  body found on page "' + str(page_uid) + '".')
+        if 'uid' in qml_source_body.attrib:
+            tmp_body_uid = qml_source_body.attrib['uid']
+        else:
+            # ToDo: check if this can be set to None instead of str
+            tmp_body_uid = 'None'
+        for element in qml_source_body.iterchildren():
+            tmp_tag = element.tag[element.tag.rfind('}') + 1:]
+
+            if tmp_tag in ['calendar', 'comparison', 'display', 'matrixDouble', 'matrixQuestionMixed',
+                           'matrixQuestionOpen', 'matrixQuestionSingleChoice', 'multipleChoice', 'questionOpen',
+                           'questionPretest', 'questionSingleChoice']:
+                tmp_index = i
+                i += 1
+
+            if tmp_tag == 'calendar':
+                tmp_question_header_object = self.extract_question_header_from_qml_element_source(element, page_uid)
+
+            elif tmp_tag == 'comparison':
+                pass
+
+            elif tmp_tag == 'display':
+                pass
+
+            elif tmp_tag == 'matrixDouble':
+                pass
+
+            elif tmp_tag == 'matrixMultipleChoice':
+                pass
+
+            elif tmp_tag == 'matrixQuestionMixed':
+                pass
+
+            elif tmp_tag == 'matrixQuestionOpen':
+                pass
+
+            elif tmp_tag == 'matrixQuestionSingleChoice':
+                list_of_items_aos = []
+                list_of_elements = []
+                for entry in element.iterdescendants():
+                    if entry.tag[entry.tag.rfind('}') + 1:] == 'item':
+                        list_of_elements.append(entry)
+
+                for item in list_of_elements:
+                    list_of_answeroptions = []
+                    for item_element in item.iterdescendants():
+                        print('444')
+                        if item_element.tag[item_element.tag.rfind('}') + 1:] == 'answerOption':
+                            tmp_value = None
+                            if 'label' in item_element.attrib:
+                                tmp_value = item_element.attrib['label']
+                            list_of_answeroptions.append(tmp_value)
+                    list_of_items_aos.append(tuple(list_of_answeroptions))
+
+                if list_of_items_aos:
+                    if len(set(list_of_items_aos)) != 1:
+                        print(page_uid)
+                print(list_of_items_aos)
+
+
+            elif tmp_tag == 'multipleChoice':
+                pass
+
+            elif tmp_tag == 'questionOpen':
+                pass
+
+            elif tmp_tag == 'questionPretest':
+                pass
+
+            elif tmp_tag == 'questionSingleChoice':
+                pass
+
+                # a = self.find_tag_in_descendants(element, 'responseDomain')
+                # b = self.find_attribute_in_descendants(element, 'responseDomain', 'type', 'dropDown')
+                # # ToDo
+                # ## self.questionnaire.pages.pages[page_uid].questions.add_question_object()
+                #
+                # (self.extract_question_header_from_qml_element_source(element, page_uid))
+            if tmp_tag == 'section':
+                pass
 
         pass
 
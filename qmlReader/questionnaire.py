@@ -1,21 +1,47 @@
 __author__ = "Christian Friedrich"
 __maintainer__ = "Christian Friedrich"
 __license__ = "GPL v3"
-__version__ = "0.3.5"
+__version__ = "0.4.3"
 __status__ = "Prototype"
-__name__ = "Questionnaire"
+# __name__ is not overridden in this module: its classes have to keep their importable module path
+#  (qmlReader.questionnaire), otherwise Questionnaire objects cannot be pickled (see qmlReader.parseCache)
 
 # last edited: 2020-07-03
 
 import re
+import sys
 import networkx as nx
 import logging
 import time
+import html
+import functools
+import heapq
+import weakref
 from os import path, mkdir
 import errno
 ## noinspection PyUnresolvedReferences
 import pygraphviz
-from lxml import objectify
+from lxml import objectify, etree
+from qmlReader import instrumentation, transitionTable, conditionCompiler, routingGraph
+
+# maximum number of rendered page sources (QmlPage.xml_source_str) that are kept in memory
+XML_SOURCE_STR_CACHE_SIZE = 256
+
+
+class StructureVersion:
+    """
+    Counter of the changes of the pages, transitions and variables of one questionnaire. The Questionnaire shares it
+    with its QmlPages, Variables and the Transitions and Variables of its pages; data derived from them (e.g. the
+    transition table or the routing graphs) is rebuilt when the version has changed since it was built. Changes to
+    one questionnaire do not invalidate the derived data of another one.
+    """
+    __slots__ = ('version',)
+
+    def __init__(self):
+        self.version = 0
+
+    def increment(self):
+        self.version += 1
 
 
 class Title:
@@ -24,16 +50,25 @@ class Title:
 
 
 class UniqueObject(object):
+    # the many small model objects (headers, answer options, ...) are slotted; subclasses without __slots__ (e.g.
+    #  QmlPage) still get a __dict__
+    __slots__ = ('uid',)
+
     def __init__(self, uid):
         self.uid = None
         self.change_uid(uid)
 
     def change_uid(self, uid):
         assert isinstance(uid, str)
-        self.uid = uid
+        # uids repeat a lot (e.g. "t", "q1", "ao1") - interned, all objects share one string per uid
+        self.uid = sys.intern(uid)
 
 
 class HeaderObject(UniqueObject):
+    __slots__ = ('text', 'index', 'tag', 'visible_conditions')
+    # shared by all instances of a class; overridden by the subclasses
+    allowed_tags_list = ()
+
     def __init__(self, uid):
         super().__init__(uid)
         self.set_uid(uid)
@@ -41,20 +76,19 @@ class HeaderObject(UniqueObject):
         self.text = None
         self.index = None
         self.tag = None
-        self.allowed_tags_list = None
         self.visible_conditions = None
 
     def set_tag(self, tag_str):
         assert isinstance(tag_str, str)
         if tag_str in self.allowed_tags_list:
-            self.tag = tag_str
+            self.tag = sys.intern(tag_str)
         else:
             raise KeyError(
                 'tag "' + str(tag_str) + '" not found in self.allowed_tags_list: ' + str(self.allowed_tags_list))
 
     def set_uid(self, uid):
         assert isinstance(uid, str)
-        self.uid = uid
+        self.uid = sys.intern(uid)
 
     def set_text(self, text):
         assert isinstance(text, str) or text is None
@@ -75,10 +109,12 @@ class HeaderObject(UniqueObject):
 
 
 class PageHeaderObject(HeaderObject):
+    __slots__ = ()
+    allowed_tags_list = ('instruction', 'introduction', 'text', 'title')
+
     def __init__(self, uid, text, tag, index, visible_conditions=None):
         super().__init__(uid)
 
-        self.allowed_tags_list = ['instruction', 'introduction', 'text', 'title']
         self.set_tag(tag)
 
         self.set_text(text)
@@ -87,10 +123,12 @@ class PageHeaderObject(HeaderObject):
 
 
 class QuestionHeaderObject(HeaderObject):
+    __slots__ = ()
+    allowed_tags_list = ('instruction', 'introduction', 'question', 'text', 'title')
+
     def __init__(self, uid, text, tag, index, visible_conditions=None):
         super().__init__(uid)
 
-        self.allowed_tags_list = ['instruction', 'introduction', 'question', 'text', 'title']
         self.set_tag(tag)
 
         self.set_text(text)
@@ -215,6 +253,8 @@ class Item(UniqueObject):
 
 
 class AnswerOption(UniqueObject):
+    __slots__ = ('labeltext', 'value', 'missing')
+
     def __init__(self, uid, value, labeltext=None, missing=False):
         super().__init__(uid)
         self.labeltext = None
@@ -444,6 +484,8 @@ class Triggers:
 
 
 class Transition:
+    __slots__ = ('index', 'target', 'source', 'distance', 'condition', 'condition_python', 'condition_new')
+
     def __init__(self, index, target, condition, source, distance):
         assert isinstance(index, int)
         assert isinstance(target, str)
@@ -452,8 +494,9 @@ class Transition:
         assert isinstance(condition, str) or condition is None
 
         self.index = index
-        self.target = target
-        self.source = source
+        # page uids are shared with the QmlPage objects and the keys of QmlPages.pages
+        self.target = sys.intern(target)
+        self.source = sys.intern(source)
         self.distance = distance
         self.condition = condition
         self.condition_python = None
@@ -462,6 +505,26 @@ class Transition:
     def __str__(self):
         return f'{self.source}\t{self.target}\t{self.distance}\t{self.index}'
 
+    @property
+    def compiled_condition(self):
+        """
+        :return: conditionCompiler.CompiledCondition of self.condition (compiled once per distinct condition), or None
+            for an unconditional transition
+        :raises conditionCompiler.ConditionSyntaxError: if the condition cannot be parsed
+        """
+        if self.condition is None:
+            return None
+        return conditionCompiler.compile_condition(self.condition)
+
+    def evaluate_condition(self, values) -> bool:
+        """
+        :param values: {varname: value}; missing variables are None
+        :return: True if the transition is taken for the given values
+        """
+        if self.condition is None:
+            return True
+        return conditionCompiler.compile_condition(self.condition)(values)
+
 
 class TransitionLabels:
     def __init__(self):
@@ -481,14 +544,20 @@ class TransitionLabels:
 
 
 class Transitions:
-    def __init__(self):
+    def __init__(self, structure_version=None):
+        """
+        :param structure_version: StructureVersion of the questionnaire, see QmlPage.set_structure_version
+        """
         self.transitions = {}
         self.transition_labels = TransitionLabels()
+        self.structure_version = structure_version
 
     def add_transitions(self, transition):
         assert isinstance(transition, Transition)
         if transition.index not in self.transitions:
             self.transitions[transition.index] = transition
+            if self.structure_version is not None:
+                self.structure_version.increment()
         else:
             raise ValueError('Index "' + '" already present in self.transitions!')
 
@@ -507,13 +576,18 @@ class Sources:
 
 
 class Variable:
+    __slots__ = ('varname', 'vartype', 'varplace')
+    # validation tables, shared by all instances
+    __allowed_vartypes = frozenset(['boolean', 'singleChoiceAnswerOption', 'string', 'number'])
+    __allowed_varplaces = frozenset(['body', 'triggers', 'shown', None])
+
     def __init__(self, varname, vartype, varplace=None):
-        self.__allowed_vartypes = ['boolean', 'singleChoiceAnswerOption', 'string', 'number']
-        self.__allowed_varplaces = ['body', 'triggers', 'shown', None]
+        self.varplace = None
         if isinstance(varname, str) and isinstance(vartype, str):
-            self.varname = varname
+            # a varname is used as key in several Variables objects and in the page variables
+            self.varname = sys.intern(varname)
             if vartype in self.__allowed_vartypes:
-                self.vartype = vartype
+                self.vartype = sys.intern(vartype)
             else:
                 raise ValueError('Vartype unknown/not allowed: ' + str(varname) + ', ' + str(vartype))
         else:
@@ -521,11 +595,21 @@ class Variable:
 
         self.set_varplace(varplace=varplace, varname=varname)
 
+    def __getstate__(self):
+        return {'varname': self.varname, 'vartype': self.vartype, 'varplace': self.varplace}
+
+    def __setstate__(self, state):
+        self.varname = sys.intern(state['varname'])
+        self.vartype = sys.intern(state['vartype'])
+        self.varplace = state['varplace']
+
     def set_varplace(self, varplace, varname):
         if isinstance(varplace, str) or varplace is None:
-            self.varplace = varplace
             if varplace in self.__allowed_varplaces:
+                tmp_old_varplace = self.varplace
                 self.varplace = varplace
+                if tmp_old_varplace != varplace:
+                    Variables.notify_varplace_change(self, tmp_old_varplace)
             else:
                 raise ValueError('Varplace unknown/not allowed: ' + str(varname) + ', ' + str(varplace))
         else:
@@ -537,8 +621,64 @@ class Variable:
 
 
 class Variables:
-    def __init__(self):
+    """
+    Registry of Variable objects, keyed by varname, with secondary indexes by vartype and by varplace. Membership
+    tests are O(1) and the list_all_... methods only touch the variables they return. All lists keep the order in
+    which the variables have been added.
+    """
+
+    # {varname: tuple of weak references to the Variables objects that contain a variable of this name}; they are
+    #  notified by Variable.set_varplace, so that their varplace index stays valid (kept here instead of in every
+    #  Variable; a weak reference without callback is shared by all entries of the same Variables object)
+    __registries_of_varnames = {}
+
+    def __init__(self, structure_version=None):
+        """
+        :param structure_version: StructureVersion of the questionnaire, see QmlPage.set_structure_version
+        """
         self.variables = {}
+        self.structure_version = structure_version
+        # {vartype: {varname: None}} and {varplace: {varname: None}}
+        self.vartype_index = {}
+        self.varplace_index = {}
+        # {varname: insertion number}; used to keep the indexes in the order of self.variables
+        self.__positions = {}
+        self.__next_position = 0
+        # varplaces whose index is out of order, because a variable has been moved into it
+        self.__unsorted_varplaces = set()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for varname in self.variables:
+            self.__register(varname)
+
+    def __register(self, varname):
+        # O(number of Variables objects that contain varname); references to collected registries are dropped
+        self.__registries_of_varnames[varname] = tuple(
+            registry for registry in self.__registries_of_varnames.get(varname, ()) if registry() is not None) + (
+            weakref.ref(self),)
+
+    def __unregister(self, varname):
+        tmp_registries = tuple(registry for registry in self.__registries_of_varnames.get(varname, ()) if
+                               registry() is not None and registry() is not self)
+        if tmp_registries:
+            self.__registries_of_varnames[varname] = tmp_registries
+        else:
+            self.__registries_of_varnames.pop(varname, None)
+
+    @classmethod
+    def notify_varplace_change(cls, variable_object, old_varplace):
+        """
+        called by Variable.set_varplace; updates the varplace index of every Variables object that contains
+        variable_object
+        :param variable_object: Variable whose varplace has changed
+        :param old_varplace: previous varplace
+        :return: None
+        """
+        for registry in cls.__registries_of_varnames.get(variable_object.varname, ()):
+            tmp_variables_object = registry()
+            if tmp_variables_object is not None:
+                tmp_variables_object.update_varplace_index(variable_object, old_varplace)
 
     def __len__(self):
         return len(self.variables)
@@ -550,19 +690,79 @@ class Variables:
         """
         :return: dictionary of {varname: vartype}
         """
-        dict_tmp = {}
-        for var in self.variables:
-            dict_tmp[var.varname] = self.variables[var].vartype
-        return dict_tmp
+        return {varname: variable.vartype for varname, variable in self.variables.items()}
+
+    def update_varplace_index(self, variable_object, old_varplace):
+        """
+        called by notify_varplace_change; ignored if variable_object is not the variable of its name in this registry
+        :param variable_object: Variable whose varplace has changed
+        :param old_varplace: previous varplace
+        :return: None
+        """
+        tmp_varname = variable_object.varname
+        if self.variables.get(tmp_varname) is not variable_object:
+            return
+        self.__remove_from_index(self.varplace_index, old_varplace, tmp_varname)
+        tmp_index = self.varplace_index.setdefault(variable_object.varplace, {})
+        if tmp_index and self.__positions[next(reversed(tmp_index))] > self.__positions[tmp_varname]:
+            self.__unsorted_varplaces.add(variable_object.varplace)
+        tmp_index[tmp_varname] = None
+
+    @staticmethod
+    def __remove_from_index(index, key, varname):
+        del index[key][varname]
+        if not index[key]:
+            del index[key]
+
+    def __return_varplace_index(self, varplace) -> dict:
+        if varplace not in self.varplace_index:
+            return {}
+        if varplace in self.__unsorted_varplaces:
+            self.varplace_index[varplace] = {varname: None for varname in
+                                             sorted(self.varplace_index[varplace], key=self.__positions.__getitem__)}
+            self.__unsorted_varplaces.discard(varplace)
+        return self.varplace_index[varplace]
+
+    def return_list_of_varnames_of_varplace(self, varplace) -> list:
+        """
+        :param varplace: 'body', 'triggers', 'shown' or None
+        :return: list of varnames
+        """
+        return list(self.__return_varplace_index(varplace))
+
+    def return_list_of_varnames_of_vartype(self, vartype) -> list:
+        """
+        :param vartype: 'boolean', 'singleChoiceAnswerOption', 'string' or 'number'
+        :return: list of varnames
+        """
+        return list(self.vartype_index.get(vartype, {}))
+
+    def check_if_var(self, varname) -> bool:
+        """
+        :return: True, if varname is in self.list_all_vars() (i.e. not a shown variable); O(1)
+        """
+        return varname in self.variables and self.variables[varname].varplace != 'shown'
+
+    def check_if_shown_var(self, varname) -> bool:
+        """
+        :return: True, if varname is in self.list_all_shown_vars(); O(1)
+        """
+        return varname in self.varplace_index.get('shown', {})
 
     def list_all_shown_vars(self):
-        return [var.varname for var in self.variables.values() if var.varplace == 'shown']
+        return self.return_list_of_varnames_of_varplace('shown')
 
     def list_all_vars(self):
-        return [var.varname for var in self.variables.values() if var.varplace != 'shown']
+        if 'shown' not in self.varplace_index:
+            return list(self.variables)
+        tmp_list_of_indexes = [self.__return_varplace_index(varplace) for varplace in list(self.varplace_index) if
+                               varplace != 'shown']
+        if len(tmp_list_of_indexes) == 1:
+            return list(tmp_list_of_indexes[0])
+        return list(heapq.merge(*tmp_list_of_indexes, key=self.__positions.__getitem__))
 
     def list_all_vars_types(self):
-        return [(var.varname, var.vartype) for var in self.variables.values() if var.varplace != 'shown']
+        return [(varname, self.variables[varname].vartype) for varname in self.list_all_vars()]
 
     def list_all_vartypes(self):
         return [var.vartype for var in self.variables.values()]
@@ -574,9 +774,23 @@ class Variables:
         return self.variables
 
     def add_variable(self, variable_object, replace=False):
+        """
+        :param variable_object: Variable
+        :param replace: if False, a message is printed if the varname exists already; the existing variable is kept
+            in both cases
+        :return: None
+        """
         if isinstance(variable_object, Variable):
-            if variable_object.varname not in [self.variables[var].varname for var in self.variables]:
-                self.variables[variable_object.varname] = variable_object
+            tmp_varname = variable_object.varname
+            if tmp_varname not in self.variables:
+                self.variables[tmp_varname] = variable_object
+                self.__positions[tmp_varname] = self.__next_position
+                self.__next_position += 1
+                self.vartype_index.setdefault(variable_object.vartype, {})[tmp_varname] = None
+                self.varplace_index.setdefault(variable_object.varplace, {})[tmp_varname] = None
+                self.__register(tmp_varname)
+                if self.structure_version is not None:
+                    self.structure_version.increment()
             else:
                 if not replace:
                     # ToDo: error handling! maybe error message: yes/no ??
@@ -587,24 +801,33 @@ class Variables:
 
     def delete_variable(self, varname):
         if isinstance(varname, str):
-            tmp_list = [self.variables[var].varname for var in self.variables]
-            tmp_var_list = self.variables.keys()
-            if varname in tmp_list:
-                for var in tmp_var_list:
-                    if var.varname is varname:
-                        self.variables.pop(var)
+            if varname in self.variables:
+                tmp_variable = self.variables.pop(varname)
+                del self.__positions[varname]
+                self.__remove_from_index(self.vartype_index, tmp_variable.vartype, varname)
+                self.__remove_from_index(self.varplace_index, tmp_variable.varplace, varname)
+                self.__unregister(varname)
+                if self.structure_version is not None:
+                    self.structure_version.increment()
             else:
                 raise ValueError('Varname not found!')
         else:
             raise TypeError('Input was not of type string!')
 
+    def return_copy(self):
+        """
+        :return: new registry of the same class with the same Variable objects (in the same order), without a
+            structure version
+        """
+        tmp_variables = self.__class__()
+        for variable_object in self.variables.values():
+            tmp_variables.add_variable(variable_object)
+        return tmp_variables
+
     def check_if_vartype(self, varname, vartype):
         if isinstance(varname, str) and isinstance(vartype, str):
-            if varname in [self.variables[var].varname for var in self.variables]:
-                for var in [self.variables[var] for var in self.variables if var.varname is varname]:
-                    print(str(var))
-
-                    return var.vartype is vartype
+            if varname in self.variables:
+                return self.variables[varname].vartype == vartype
             else:
                 raise ValueError('Varname not found!')
         else:
@@ -612,27 +835,55 @@ class Variables:
 
 
 class QmlPages:
-    def __init__(self):
+    def __init__(self, structure_version=None):
+        """
+        :param structure_version: StructureVersion of the questionnaire; passed on to every added page
+        """
         self.pages = {}
+        # {uid: ordinal} - position of each page within self.pages, kept in sync by add_page / drop_page
+        self.page_ordinals = {}
+        self.structure_version = structure_version
 
     def add_page(self, qmlpage, replace=False):
         assert isinstance(qmlpage, QmlPage)
+        qmlpage.set_structure_version(self.structure_version)
         if qmlpage.uid in self.pages.keys():
             if not replace:
                 raise KeyError('Page already exists and overwrite is False.')
             else:
                 ('Page "' + qmlpage.uid + '" will be replaced.')
+                # a replaced page keeps its position (and therefore its ordinal) within self.pages
                 self.pages[qmlpage.uid] = qmlpage
         else:
+            self.page_ordinals[qmlpage.uid] = len(self.pages)
             self.pages[qmlpage.uid] = qmlpage
+        if self.structure_version is not None:
+            self.structure_version.increment()
 
     def drop_page(self, uid):
         assert isinstance(uid, str)
         if uid in self.pages:
             self.pages.pop(uid)
+            self.page_ordinals = {page_uid: ordinal for ordinal, page_uid in enumerate(self.pages)}
+            if self.structure_version is not None:
+                self.structure_version.increment()
         else:
             raise ValueError('Pagename "' + str(uid) + '" not found in self.pages!')
 
+    def return_page_ordinal(self, uid) -> int:
+        """
+        :param uid: page uid
+        :return: position of the page within self.pages (declared pages first, then appended undeclared pages) in O(1)
+        """
+        assert isinstance(uid, str)
+        if uid in self.page_ordinals:
+            return self.page_ordinals[uid]
+        else:
+            raise ValueError('Pagename "' + str(uid) + '" not found in self.pages!')
+
+    def return_distance(self, source_uid, target_uid) -> int:
+        return self.return_page_ordinal(target_uid) - self.return_page_ordinal(source_uid)
+
     def list_of_all_pagenames(self):
         tmp_list = []
         for key in self.pages:
@@ -675,9 +926,34 @@ class QmlPages:
         return tmp_list
 
 
+@functools.lru_cache(maxsize=XML_SOURCE_STR_CACHE_SIZE)
+def render_xml_source_str(xml_source_bytes: bytes) -> str:
+    """
+    :param xml_source_bytes: serialized zofar:page element
+    :return: unescaped xml string of the page, cleaned of namespace declarations and with additional newlines
+    """
+    # encode bytes to a string
+    tmp_xml_source_str_escaped = xml_source_bytes.decode('utf-8')
+    # unescape the html/xml escaped characters
+    tmp_xml_source_str = html.unescape(tmp_xml_source_str_escaped)
+    # clean the string (of namespace declarations)
+    search_string = ' xmlns:zofar="http://www.his.de/zofar/xml/questionnaire" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:display="http://www.dzhw.eu/zofar/xml/display"'
+    tmp_xml_source_str = tmp_xml_source_str.replace(search_string, '')
+    # add newlines
+    tmp_tags_with_newlines_before_list = ['<zofar:transition',
+                                          '<zofar:transitions>',
+                                          '<zofar:body>',
+                                          '<zofar:header>',
+                                          '<zofar:trigger',
+                                          '<zofar:triggers>']
+    for entry in tmp_tags_with_newlines_before_list:
+        tmp_xml_source_str = tmp_xml_source_str.replace(entry, '\n\t\t' + entry)
+    return tmp_xml_source_str
+
+
 class DuplicateVariables(Variables):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, structure_version=None):
+        super().__init__(structure_version=structure_version)
 
 
 class QmlPage(UniqueObject):
@@ -693,14 +969,109 @@ class QmlPage(UniqueObject):
         self.duplicate_variables = DuplicateVariables()
         self.questions = Questions()
         self.xml_source = None
+        self.xml_source_bytes = None
         self.xml_source_str = None
 
+    @property
+    def xml_source(self):
+        """
+        objectified xml element of the page; after unpickling (or in streaming mode) it is reconnected lazily by
+        parsing self.xml_source_bytes on first access
+        """
+        if self.__xml_source is None and self.xml_source_bytes is not None:
+            self.__xml_source = objectify.fromstring(self.xml_source_bytes)
+        return self.__xml_source
+
+    @xml_source.setter
+    def xml_source(self, xml_source_code):
+        assert isinstance(xml_source_code, objectify.ObjectifiedElement) or xml_source_code is None
+        self.__xml_source = xml_source_code
+
+    @property
+    def xml_source_str(self):
+        """
+        unescaped xml string of the page; rendered on first access from self.xml_source or self.xml_source_bytes
+        (see render_xml_source_str), unless it has been set explicitly
+        """
+        if self.__xml_source_str is not None:
+            return self.__xml_source_str
+        if self.__xml_source is not None:
+            return render_xml_source_str(etree.tostring(self.__xml_source))
+        if self.xml_source_bytes is not None:
+            return render_xml_source_str(self.xml_source_bytes)
+        return None
+
+    @xml_source_str.setter
+    def xml_source_str(self, xml_source_code_str):
+        assert isinstance(xml_source_code_str, str) or xml_source_code_str is None
+        self.__xml_source_str = xml_source_code_str
+
     def set_xml_source(self, xml_source_code: objectify.ObjectifiedElement):
         self.xml_source = xml_source_code
 
+    def set_xml_source_bytes(self, xml_source_code_bytes: bytes):
+        self.xml_source_bytes = xml_source_code_bytes
+
     def set_xml_source_str(self, xml_source_code_str: str):
         self.xml_source_str = xml_source_code_str
 
+    def __getstate__(self):
+        """
+        serializable form of the page: lxml elements cannot be pickled, so the element is dropped and only its
+        serialization (self.xml_source_bytes) is kept; see the property xml_source for the reconnection
+        """
+        state = self.__dict__.copy()
+        # uid is a slot of UniqueObject, not part of __dict__
+        state['uid'] = self.uid
+        if state['_QmlPage__xml_source'] is not None:
+            if state['xml_source_bytes'] is None:
+                state['xml_source_bytes'] = etree.tostring(state['_QmlPage__xml_source'])
+            state['_QmlPage__xml_source'] = None
+        return state
+
+    def __setstate__(self, state):
+        state = state.copy()
+        self.uid = state.pop('uid')
+        self.__dict__.update(state)
+
+    def set_structure_version(self, structure_version):
+        """
+        :param structure_version: StructureVersion of the questionnaire the page belongs to (see QmlPages.add_page);
+            incremented on changes of the transitions and variables of the page
+        """
+        self.transitions.structure_version = structure_version
+        self.variables.structure_version = structure_version
+        self.duplicate_variables.structure_version = structure_version
+
+    def return_copy_without_routing(self):
+        """
+        :return: shallow copy of the page (sharing headers, Variable objects, triggers, questions and sources of the
+            xml) with empty transitions and sources, e.g. for merging several questionnaires without changing them;
+            the variable registries are copied, so that the copy can get the structure version of another
+            questionnaire
+        """
+        tmp_page = QmlPage.__new__(QmlPage)
+        tmp_page.__dict__.update(self.__dict__)
+        tmp_page.uid = self.uid
+        tmp_page.transitions = Transitions()
+        tmp_page.sources = Sources()
+        tmp_page.variables = self.variables.return_copy()
+        tmp_page.duplicate_variables = self.duplicate_variables.return_copy()
+        return tmp_page
+
+    def return_copy(self):
+        """
+        :return: copy of the page as in return_copy_without_routing, with new transitions and sources that contain the
+            same Transition objects, e.g. for appending the page to another questionnaire without changing this one
+        """
+        tmp_page = self.return_copy_without_routing()
+        for transition in self.transitions.transitions.values():
+            tmp_page.transitions.add_transitions(transition)
+        for list_of_transitions in self.sources.sources.values():
+            for transition in list_of_transitions:
+                tmp_page.sources.add_source(transition)
+        return tmp_page
+
     def add_sources(self, source):
         self.sources.add_source(source)
 
@@ -717,60 +1088,11 @@ class QmlPage(UniqueObject):
         self.header.add_header_object(header_text)
 
     def __translate_transition_condition_to_python_syntax(self):
-        regex1 = re.compile(r'==')  # 'is'
-        regex2 = re.compile(r'!=')  # 'is not'
-        regex3 = re.compile(r'gt')  # '>'
-        regex4 = re.compile(r'ge')  # '>='
-        regex5 = re.compile(r'lt')  # '<'
-        regex6 = re.compile(r'le')  # '<='
-        regex7 = re.compile(r'zofar.asNumber')  # 'int'
-        regex8 = re.compile(r'zofar.isMissing\(([a-zA-Z0-9\-_]+)\)')  # '(\1 is None)'
-        regex9 = re.compile(r'.value')  # 'is True'
-        regex10 = re.compile(r'!')  # 'not'
-        regex11 = re.compile(r' AND ')  # ' and '
-        regex12 = re.compile(r' OR ')  # ' or '
-
-        if self.transitions is not {}:
-            for key in self.transitions.keys():
-                if self.transitions.transitions[key]['condition'] is None:
-                    self.transitions.transitions[key]['condition_python'] = 'True'
-                else:
-                    self.transitions.transitions[key]['condition_python'] = regex1.sub('is',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition'])
-                    self.transitions.transitions[key]['condition_python'] = regex2.sub('is not',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex3.sub('>',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex4.sub('>=',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex5.sub('<',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex6.sub('<=',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex7.sub('int',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex8.sub('(\g<1> is None)',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex9.sub('is True',
-                                                                                       self.transitions.transitions[
-                                                                                           key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex10.sub('not ',
-                                                                                        self.transitions.transitions[
-                                                                                            key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex11.sub(' and ',
-                                                                                        self.transitions.transitions[
-                                                                                            key]['condition_python'])
-                    self.transitions.transitions[key]['condition_python'] = regex12.sub(' or ',
-                                                                                        self.transitions.transitions[
-                                                                                            key]['condition_python'])
+        for transition in self.transitions.transitions.values():
+            if transition.condition is None:
+                transition.condition_python = 'True'
+            else:
+                transition.condition_python = transition.compiled_condition.python_source
 
 
 class Questionnaire:
@@ -781,6 +1103,7 @@ class Questionnaire:
         self.__flowchart_show_conditions = True
         self.__flowchart_show_variable_names = True
         self.__flowchart_bidirectional_edges = False
+        self.__flowchart_compress_chains = False
         self.logger = logging.getLogger('debug')
         self.DiGraph = nx.DiGraph()
         self.filename = None
@@ -789,34 +1112,260 @@ class Questionnaire:
         self.title = None
         self.set_title(title)
         self.pgv_graph = None
-        self.variables = Variables()
-        self.pages = QmlPages()
+        # shared with self.variables, self.pages and all pages, see StructureVersion
+        self.__structure_version = StructureVersion()
+        self.variables = Variables(structure_version=self.__structure_version)
+        self.pages = QmlPages(structure_version=self.__structure_version)
+        # built on first use, see self.return_transition_table()
+        self.__transition_table = None
+        # views of the routing graph, built on first use, see self.return_routing_graph()
+        self.__routing_graphs = routingGraph.RoutingGraphCache()
+
+    def __getstate__(self):
+        """
+        the pygraphviz graph (self.pgv_graph) cannot be pickled and is dropped; it is recreated by init_pgv_graph()
+        """
+        state = self.__dict__.copy()
+        state['pgv_graph'] = None
+        # rebuilt on demand
+        state['_Questionnaire__transition_table'] = None
+        state['_Questionnaire__routing_graphs'] = routingGraph.RoutingGraphCache()
+        return state
 
     def startup_logger(self, log_level=logging.DEBUG):
         """
         CRITICAL: 50, ERROR: 40, WARNING: 30, INFO: 20, DEBUG: 10, NOTSET: 0
         """
-        logging.basicConfig(level=log_level)
-        fh = logging.FileHandler("{0}.log".format('log_' + __name__))
-        fh.setLevel(log_level)
-        fh_format = logging.Formatter('%(name)s\t%(module)s\t%(funcName)s\t%(asctime)s\t%(lineno)d\t'
-                                      '%(levelname)-8s\t%(message)s')
-        fh.setFormatter(fh_format)
-        self.logger.addHandler(fh)
+        # the file handler is attached only once per process, not once per call
+        instrumentation.setup_debug_logger("{0}.log".format('log_' + 'Questionnaire'), log_level=log_level)
+
+    def return_structure_version(self) -> int:
+        """
+        :return: number of changes of the pages, transitions and variables of this questionnaire so far
+        """
+        return self.__structure_version.version
+
+    def return_routing_graph(self) -> nx.DiGraph:
+        """
+        :return: read-only nx.DiGraph: all pages as nodes (in page order), the transitions as edges; cached until pages,
+            transitions or variables change
+        """
+        return self.__routing_graphs.return_graph(routingGraph.ROUTING, self.return_structure_version(),
+                                                  lambda: routingGraph.build_routing_graph(self))
+
+    def return_bidirectional_routing_graph(self) -> nx.DiGraph:
+        """
+        :return: read-only nx.DiGraph: the routing graph with all edges duplicated in opposing direction
+        """
+        return self.__routing_graphs.return_graph(
+            routingGraph.BIDIRECTIONAL, self.return_structure_version(),
+            lambda: routingGraph.return_graph_with_reversed_edges(self.return_routing_graph()))
+
+    def return_flowchart_graph(self, show_conditions: bool = None, show_variable_names: bool = None,
+                               bidirectional: bool = None, compress_chains: bool = None) -> nx.DiGraph:
+        """
+        :param show_conditions: label the edges with the conditions; None: see flowchart_set_show_conditions
+        :param show_variable_names: label the nodes with the variables; None: see flowchart_set_show_variablenames
+        :param bidirectional: duplicate the edges in opposing direction; None: see flowchart_set_bidirectional
+        :param compress_chains: collapse chains of pages without branches; None: see flowchart_set_compress_chains
+        :return: read-only nx.DiGraph of the flowchart; cached per combination of the parameters
+        """
+        if show_conditions is None:
+            show_conditions = self.__flowchart_show_conditions
+        if show_variable_names is None:
+            show_variable_names = self.__flowchart_show_variable_names
+        if bidirectional is None:
+            bidirectional = self.__flowchart_bidirectional_edges
+        if compress_chains is None:
+            compress_chains = self.__flowchart_compress_chains
+        return self.__routing_graphs.return_graph(
+            (routingGraph.FLOWCHART, show_conditions, show_variable_names, bidirectional, compress_chains),
+            self.return_structure_version(),
+            lambda: routingGraph.build_flowchart_graph(self, show_conditions=show_conditions,
+                                                       show_variable_names=show_variable_names,
+                                                       bidirectional=bidirectional, compress_chains=compress_chains))
+
+    def clear_routing_graphs(self):
+        """
+        drops all cached views of the routing graph, e.g. after conditions have been changed in place
+        """
+        self.__routing_graphs.clear()
+
+    def return_condensed_routing_graph(self) -> nx.DiGraph:
+        """
+        :return: read-only nx.DiGraph: the routing graph with every loop condensed into one node, see
+            routingGraph.build_condensed_graph
+        """
+        return self.__routing_graphs.return_graph(routingGraph.CONDENSATION, self.return_structure_version(),
+                                                  lambda: routingGraph.build_condensed_graph(self.return_routing_graph()))
+
+    def return_page_order(self) -> routingGraph.PageOrder:
+        """
+        :return: routingGraph.PageOrder (order of all pages, loops), see routingGraph.return_page_order; cached with the
+            routing graph
+        """
+        return self.__routing_graphs.return_value(routingGraph.PAGE_ORDER, self.return_structure_version(),
+                                                  lambda: routingGraph.return_page_order(
+                                                      self.return_routing_graph(),
+                                                      condensation=self.return_condensed_routing_graph()))
+
+    def return_reachability_index(self) -> routingGraph.ReachabilityIndex:
+        """
+        :return: routingGraph.ReachabilityIndex of the routing graph (reachability in O(1), unreachable and dead-end
+            pages); cached with the routing graph
+        """
+        return self.__routing_graphs.return_value(routingGraph.REACHABILITY, self.return_structure_version(),
+                                                  lambda: routingGraph.ReachabilityIndex(
+                                                      self.return_routing_graph(),
+                                                      condensation=self.return_condensed_routing_graph(),
+                                                      page_order=self.return_page_order()))
+
+    def return_sections(self, start_page: str = 'index', end_page: str = 'end',
+                        excluded_pages: list = None) -> tuple:
+        """
+        :param start_page: uid of the first page
+        :param end_page: uid of the last page
+        :param excluded_pages: list of page uids that belong to no section, e.g. the cancel pages
+        :return: tuple of routingGraph.Section (entry, exit, pages, variables), cut at the pages every route passes,
+            see routingGraph.return_sections; cached with the routing graph
+        """
+        tmp_excluded_pages = tuple(excluded_pages) if excluded_pages is not None else ()
+        return self.__routing_graphs.return_value(
+            (routingGraph.SECTIONS, start_page, end_page, tmp_excluded_pages), self.return_structure_version(),
+            lambda: routingGraph.return_sections(self.return_routing_graph(), start_page=start_page,
+                                                 end_page=end_page, excluded_pages=tmp_excluded_pages,
+                                                 dict_of_page_variables=routingGraph.return_dict_of_page_variables(self),
+                                                 page_order=self.return_page_order()))
+
+    def return_section_flowchart_graph(self, section: routingGraph.Section, show_conditions: bool = None,
+                                       show_variable_names: bool = None, compress_chains: bool = None) -> nx.DiGraph:
+        """
+        :param section: routingGraph.Section, see self.return_sections()
+        :param show_conditions: see return_flowchart_graph
+        :param show_variable_names: see return_flowchart_graph
+        :param compress_chains: see return_flowchart_graph
+        :return: read-only nx.DiGraph: the flowchart of the pages of the section and its exit page
+        """
+        if show_variable_names is None:
+            show_variable_names = self.__flowchart_show_variable_names
+        if compress_chains is None:
+            compress_chains = self.__flowchart_compress_chains
+        tmp_list_of_pages = list(section.pages) + ([section.exit] if section.exit is not None else [])
+        tmp_graph = nx.DiGraph(self.return_flowchart_graph(show_conditions=show_conditions, show_variable_names=False,
+                                                           bidirectional=False, compress_chains=False).subgraph(
+            tmp_list_of_pages))
+        if compress_chains:
+            tmp_graph = routingGraph.build_compressed_graph(
+                tmp_graph, dict_of_page_variables=routingGraph.return_dict_of_page_variables(self)
+                if show_variable_names else None)
+        elif show_variable_names:
+            tmp_node_labels = routingGraph.return_dict_of_node_labels_with_variables(self)
+            tmp_graph = nx.relabel_nodes(tmp_graph, {node: tmp_node_labels[node] for node in tmp_graph
+                                                     if node in tmp_node_labels})
+        return nx.freeze(tmp_graph)
+
+    def return_list_of_section_statistics(self, start_page: str = 'index', end_page: str = 'end',
+                                          excluded_pages: list = None) -> list:
+        """
+        :return: list of dicts {'entry', 'exit', 'pages' (number of pages), 'variables' (number of variables),
+            'transitions' (number of edges between the pages of the section), 'routes' (number of routes from entry to
+            exit, see return_number_of_paths; None for the last section)}, one per section, see self.return_sections()
+        """
+        tmp_routing_graph = self.return_routing_graph()
+        tmp_list_of_statistics = []
+        for section in self.return_sections(start_page=start_page, end_page=end_page, excluded_pages=excluded_pages):
+            tmp_list_of_statistics.append({
+                'entry': section.entry, 'exit': section.exit, 'pages': len(section.pages),
+                'variables': len(section.variables),
+                'transitions': tmp_routing_graph.subgraph(section.pages).number_of_edges(),
+                'routes': self.return_number_of_paths(section.entry, section.exit) if section.exit is not None else None})
+        return tmp_list_of_statistics
+
+    def return_path_metrics(self, start_page: str = 'index', end_page: str = 'end') -> routingGraph.PathMetrics:
+        """
+        :param start_page: uid of the first page
+        :param end_page: uid of the last page
+        :return: routingGraph.PathMetrics: shortest and longest route in pages and in variables, see
+            routingGraph.return_path_metrics; cached with the routing graph
+        """
+        return self.__routing_graphs.return_value(
+            (routingGraph.PATH_METRICS, start_page, end_page), self.return_structure_version(),
+            lambda: routingGraph.return_path_metrics(self.return_routing_graph(), start_page=start_page,
+                                                     end_page=end_page,
+                                                     dict_of_page_variables=routingGraph.return_dict_of_page_variables(
+                                                         self),
+                                                     condensation=self.return_condensed_routing_graph(),
+                                                     page_order=self.return_page_order()))
+
+    def return_expected_length(self, dict_of_edge_frequencies: dict = None, start_page: str = 'index',
+                               max_loop_steps: int = routingGraph.DEFAULT_MAX_LOOP_STEPS) -> routingGraph.ExpectedLength:
+        """
+        :param dict_of_edge_frequencies: {(source, target): observed frequency}, e.g. from history data (see
+            batchRouting.return_dict_of_transition_frequencies); None: equal probabilities for all transitions
+        :param start_page: uid of the first page
+        :param max_loop_steps: maximum number of steps within one loop
+        :return: routingGraph.ExpectedLength: expected number of pages and variables, expected number of visits per
+            page (not visit probabilities); cached with the routing graph per frequencies and max_loop_steps
+        """
+        tmp_frequencies_key = None if dict_of_edge_frequencies is None else frozenset(dict_of_edge_frequencies.items())
+        return self.__routing_graphs.return_value(
+            (routingGraph.EXPECTED_LENGTH, start_page, tmp_frequencies_key, max_loop_steps),
+            self.return_structure_version(),
+            lambda: routingGraph.return_expected_length(
+                self.return_routing_graph(), start_page=start_page, dict_of_edge_frequencies=dict_of_edge_frequencies,
+                dict_of_page_variables=routingGraph.return_dict_of_page_variables(self),
+                condensation=self.return_condensed_routing_graph(), page_order=self.return_page_order(),
+                max_loop_steps=max_loop_steps))
+
+    def return_number_of_paths(self, source: str = 'index', target: str = 'end') -> int:
+        """
+        :param source: page uid
+        :param target: page uid
+        :return: number of routes from source to target, every loop counted as one step, see
+            routingGraph.return_number_of_paths
+        """
+        return routingGraph.return_number_of_paths(self.return_routing_graph(), source, target,
+                                                   condensation=self.return_condensed_routing_graph())
+
+    def return_list_of_pages_between(self, source: str, target: str) -> list:
+        """
+        :param source: page uid
+        :param target: page uid
+        :return: list of the page uids on some route from source to target (both included), in route order
+        """
+        return list(routingGraph.return_pages_between(self.return_routing_graph(), source, target,
+                                                      page_order=self.return_page_order()))
 
     def return_topologically_sorted_list_of_pages(self) -> list:
-        self.transitions_to_nodes_edges_no_additional_node_label()
-        list_of_looped_edges = []
-        for u, v in self.DiGraph.edges:
-            if u == v:
-                list_of_looped_edges.append((u, v))
-
-        for u, v in list_of_looped_edges:
-            self.DiGraph.remove_edge(u, v)
-        try:
-            return [node for node in nx.topological_sort(self.DiGraph)]
-        except nx.exception.NetworkXUnfeasible:
-            return []
+        """
+        :return: list of all page uids, sorted topologically; pages within loops (back jumps) are kept together in
+            declaration order, see routingGraph.return_page_order
+        """
+        return list(self.return_page_order().pages)
+
+    def return_list_of_loops(self) -> list:
+        """
+        :return: list of lists of page uids that are connected by loops (strongly connected components with more than
+            one page), in page order
+        """
+        return [list(loop) for loop in self.return_page_order().loops]
+
+    def return_bottleneck_pages(self, start_page: str = 'index', end_page: str = 'end',
+                                excluded_pages: list = None) -> routingGraph.BottleneckPages:
+        """
+        :param start_page: uid of the first page
+        :param end_page: uid of the last page
+        :param excluded_pages: list of page uids that are ignored for the articulation points, e.g. the cancel pages
+        :return: routingGraph.BottleneckPages: pages every respondent passes from start_page to end_page (dominators)
+            and articulation points of the routing graph, both in route order (e.g. as section boundaries); cached with
+            the routing graph
+        """
+        tmp_excluded_pages = tuple(excluded_pages) if excluded_pages is not None else ()
+        return self.__routing_graphs.return_value(
+            (routingGraph.BOTTLENECKS, start_page, end_page, tmp_excluded_pages), self.return_structure_version(),
+            lambda: routingGraph.return_bottleneck_pages(self.return_routing_graph(), start_page=start_page,
+                                                         end_page=end_page, excluded_pages=tmp_excluded_pages,
+                                                         page_order=self.return_page_order()))
 
     def find_unused_variables(self):
         vars_from_pages_list = []
@@ -837,6 +1386,16 @@ class Questionnaire:
                                                 page.transitions.transitions.items()]
         return list_of_all_transitions
 
+    def return_transition_table(self) -> transitionTable.TransitionTable:
+        """
+        :return: TransitionTable of all transitions; rebuilt only if pages or transitions have changed
+        """
+        if self.__transition_table is None or self.__transition_table.version != self.return_structure_version():
+            self.__transition_table = transitionTable.TransitionTable(self.return_list_of_all_transitions(),
+                                                                      self.pages.page_ordinals,
+                                                                      version=self.return_structure_version())
+        return self.__transition_table
+
     def return_list_of_transitions(self, min_distance: int = None, max_distance: int = 0, max_count: int = None,
                                    sort: bool = True,
                                    sort_key: str = 'distance') -> list:
@@ -846,6 +1405,13 @@ class Questionnaire:
         assert isinstance(sort, bool)
         assert isinstance(sort_key, str) or sort_key is None
 
+        if not sort or sort_key is None or sort_key in transitionTable.NUMERIC_SORT_KEYS + \
+                transitionTable.UID_SORT_KEYS:
+            return self.return_transition_table().return_list_of_transitions(
+                min_distance=min_distance, max_distance=max_distance, max_count=max_count, sort=sort,
+                sort_key=sort_key)
+
+        # sort keys that are no column of the transition table
         if min_distance is None:
             min_distance = float('-inf')  # set value to negative infinity
         if max_distance is None:
@@ -863,6 +1429,22 @@ class Questionnaire:
         return [transition for transition in tmp_transitions_list[:max_count] if
                 min_distance < transition.distance < max_distance]
 
+    def return_list_of_top_k_transitions(self, k: int, sort_key: str = 'distance', largest: bool = True) -> list:
+        """
+        :param k: number of transitions
+        :param sort_key: 'distance', 'index', 'source' or 'target'
+        :param largest: True: largest values first, False: smallest values first
+        :return: list of the k first transitions of a stable sort by sort_key
+        """
+        return self.return_transition_table().return_list_of_top_k_transitions(k, sort_key=sort_key, largest=largest)
+
+    def return_distance_histogram(self, min_distance: int = None, max_distance: int = None) -> dict:
+        """
+        :return: {distance: number of transitions}, sorted by distance
+        """
+        return self.return_transition_table().return_distance_histogram(min_distance=min_distance,
+                                                                        max_distance=max_distance)
+
     def print_backwards_jumps(self, min_distance=None, max_distance=0, max_count=None):
         tmp_list = self.return_list_of_transitions(min_distance=min_distance, max_distance=max_distance,
                                                    max_count=max_count)
@@ -894,87 +1476,42 @@ class Questionnaire:
         assert isinstance(set_biderectional, bool)
         self.__flowchart_bidirectional_edges = set_biderectional
 
+    def flowchart_set_compress_chains(self, compress_chains=False):
+        """
+
+        :param compress_chains: True collapses chains of pages without branches into one node, False does nothing such.
+        :return: none
+        """
+        assert isinstance(compress_chains, bool)
+        self.__flowchart_compress_chains = compress_chains
+
     def flowchart_create_birectional_edges(self):
         """
-        duplicates the existing edges in opposing direction - only useful for weighted graphs/charts
+        replaces self.DiGraph by a copy with the existing edges duplicated in opposing direction - only useful for
+        weighted graphs/charts
         :return: none
         """
-        for edge in self.DiGraph.edges():
-            if edge[0] != edge[1]:
-                self.DiGraph.add_edge(edge[1], edge[0])
+        self.DiGraph = nx.freeze(routingGraph.return_graph_with_reversed_edges(self.DiGraph))
 
     def transitions_to_nodes_edges_no_additional_node_label(self):
-        for page in self.pages.pages.values():
-            for transition in page.transitions.transitions.values():
-                self.DiGraph.add_edge(page.uid, transition.target)
+        self.DiGraph = self.return_routing_graph()
 
     def transitions_to_nodes_edges(self, truncate=False):
-        self.DiGraph = nx.DiGraph()
         logging.info("transitions_to_nodes_edges")
         print("transitions_nodes_to_edges")
-        self.create_readable_conditions()
         self.startup_logger(log_level=logging.DEBUG)
 
-        for page in self.pages.pages.values():
-            self.DiGraph.add_node(page.uid)  # create nodes
-
-            cnt = 0
-            dict_transitions = {}
-            for transition in page.transitions.transitions.values():
-                if transition.condition is not None:
-                    if transition.target in dict_transitions.keys():
-                        dict_transitions[transition.target] = dict_transitions[transition.target] + ' |\n(' + '[' + str(
-                            cnt) + '] ' + transition.condition_new + ']' + ')'
-                        if self.__flowchart_show_conditions:
-                            self.DiGraph.add_edge(page.uid, transition.target,
-                                                  label='[' + str(cnt) + '] ' + dict_transitions[transition.target])
-                        else:
-                            self.DiGraph.add_edge(page.uid, transition.target)
-                    else:
-                        dict_transitions[transition.target] = '(' + '[' + str(
-                            cnt) + '] ' + transition.condition_new + ')'
-
-                    if self.__flowchart_show_conditions:
-                        self.DiGraph.add_edge(page.uid, transition.target, label=dict_transitions[transition.target])
-                    else:
-                        self.DiGraph.add_edge(page.uid, transition.target)
-
-                else:  # if transition.condition is None
-                    if transition.target in dict_transitions.keys():
-                        if self.__flowchart_show_conditions:
-                            self.DiGraph.add_edge(page.uid, transition.target, label='')
-                        else:
-                            self.DiGraph.add_edge(page.uid, transition.target)
-                    else:
-                        if cnt == 0:
-                            if self.__flowchart_show_conditions:
-                                self.DiGraph.add_edge(page.uid, transition.target, label='')
-                            else:
-                                self.DiGraph.add_edge(page.uid, transition.target)
-                        if cnt != 0:
-                            if self.__flowchart_show_conditions:
-                                self.DiGraph.add_edge(page.uid, transition.target, label='[' + str(cnt) + ']')
-                            else:
-                                self.DiGraph.add_edge(page.uid, transition.target)
-                cnt = cnt + 1
-
-        if self.__flowchart_show_variable_names:
-            self.add_variables_to_node()
-        if self.__flowchart_bidirectional_edges:
-            self.flowchart_create_birectional_edges()
+        # cached, see self.return_flowchart_graph()
+        self.DiGraph = self.return_flowchart_graph()
+        instrumentation.count('graph nodes', self.DiGraph.number_of_nodes())
+        instrumentation.count('graph edges', self.DiGraph.number_of_edges())
 
     def add_variables_to_node(self):
-        mapping = {}
-        for pagename in self.pages.list_of_all_pagenames():
-            tmp_output_string = ''
-            tmp_var_list = self.pages.pages[pagename].variables.list_all_vars()
-            if len(tmp_var_list) > 0:
-                while len(tmp_var_list) > 3:
-                    tmp_output_string += ', '.join(tmp_var_list[:3]) + ',\n'
-                    tmp_var_list = tmp_var_list[3:]
-                tmp_output_string += ', '.join(tmp_var_list) + ']'
-                mapping[pagename] = pagename + '\n\n[' + tmp_output_string
-        self.DiGraph = nx.relabel_nodes(self.DiGraph, mapping)
+        """
+        replaces self.DiGraph by a copy whose nodes are labelled with the variables of their pages
+        """
+        self.DiGraph = nx.freeze(nx.relabel_nodes(self.DiGraph,
+                                                  routingGraph.return_dict_of_node_labels_with_variables(self)))
 
     def flowchart_create_graph(self, output_dir=None):
         """
@@ -986,13 +1523,28 @@ class Questionnaire:
         self.init_pgv_graph()
         self.prepare_and_draw_pgv_graph(output_dir=output_dir)
 
+    def flowchart_create_section_graphs(self, output_dir=None, start_page='index', end_page='end',
+                                        excluded_pages=None):
+        """
+        draws one flowchart per section, see self.return_sections(); self.DiGraph is the flowchart of the last section
+        :return: None
+        """
+        logging.info("create_section_graphs")
+        for index, section in enumerate(self.return_sections(start_page=start_page, end_page=end_page,
+                                                             excluded_pages=excluded_pages)):
+            self.DiGraph = self.return_section_flowchart_graph(section)
+            self.init_pgv_graph()
+            self.prepare_and_draw_pgv_graph(output_dir=output_dir,
+                                            filename_suffix='_section' + str(index + 1) + '_' + section.entry)
+
     def init_pgv_graph(self, graph_name='graph'):
         """
         :param: graph_name: string
         :return: None
         """
         logging.info("init_pgv_graph")
-        self.pgv_graph = nx.nx_agraph.to_agraph(self.DiGraph)
+        with instrumentation.phase('build graph'):
+            self.pgv_graph = nx.nx_agraph.to_agraph(self.DiGraph)
 
         t = time.localtime()
         timestamp = time.strftime('%Y-%m-%d_%H-%M', t)
@@ -1000,12 +1552,13 @@ class Questionnaire:
         self.pgv_graph.node_attr['shape'] = 'box'
         self.pgv_graph.graph_attr[
             'label'] = 'title: ' + self.title + '\nfile: ' + self.filename + '\n timestamp: ' + timestamp
-        self.pgv_graph.layout(prog="dot")
+        with instrumentation.phase('layout'):
+            self.pgv_graph.layout(prog="dot")
 
-    def prepare_and_draw_pgv_graph(self, output_dir=None):
+    def prepare_and_draw_pgv_graph(self, output_dir=None, filename_suffix=''):
         """
         prepares an output folder and timestampfs; draws the graph
-        :param:
+        :param: filename_suffix: appended to the filenames, e.g. for several graphs of one questionnaire
         :return:
         """
         logging.info("prepare_pgv_graph")
@@ -1027,21 +1580,24 @@ class Questionnaire:
 
         t = time.localtime()
         timestamp = time.strftime('%Y-%m-%d_%H-%M-%S', t)
-        filename = timestamp + '_' + path.splitext(path.split(self.file)[1])[0]
+        filename = timestamp + '_' + path.splitext(path.split(self.file)[1])[0] + filename_suffix
 
         # gml output
         self.logger.info('output_gml: ' + str(path.join(output_folder, filename + '.gml')))
-        nx.write_gml(self.DiGraph, path.join(output_folder, filename + '.gml'))
+        with instrumentation.phase('write outputs'):
+            nx.write_gml(self.DiGraph, path.join(output_folder, filename + '.gml'))
 
         # dot output
 
         self.logger.info('output_dot: ' + str(path.join(output_folder, filename + '.dot')))
-        self.pgv_graph.write(path.join(output_folder, filename + '.dot'))
+        with instrumentation.phase('write outputs'):
+            self.pgv_graph.write(path.join(output_folder, filename + '.dot'))
 
         # png output
         self.logger.info('output_png: ' + str(path.join(output_folder, filename + '.png')))
         self.draw_pgv_graph(path.join(output_folder, filename + '.png'))
 
+    @instrumentation.timed('draw')
     def draw_pgv_graph(self, output_file='output_file.png'):
         logging.info("draw_pgv_graph")
         self.pgv_graph.draw(output_file)
@@ -1058,7 +1614,8 @@ class Questionnaire:
         for appended_page in questionnaire_object.pages.pages.values():
             self.logger.info("pages added: " + str(appended_page.uid))
             # ToDo: error handling! maybe error message: yes/no ?? output: list of duplicate pages / replaced pages
-            self.pages.add_page(appended_page, replace=True)
+            # a copy: the pages of questionnaire_object keep its structure version (and therefore its caches valid)
+            self.pages.add_page(appended_page.return_copy(), replace=True)
 
         for appended_variable in questionnaire_object.variables.variables.values():
             # ToDo: error handling! maybe error message: yes/no ?? output: list of duplicate variables / replaced variables
@@ -0,0 +1,166 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+# Merges several questionnaires (e.g. the module files of one wave) into a new Questionnaire in one pass over their
+#  pages, variables and transitions; the merged questionnaires are not changed.
+#
+# - declared pages are taken in module order; pages that are only known as transition targets (declared=False) are
+#   resolved against their declaration in any module, the remaining ones are appended after the declared pages
+# - all transitions are copied with the distances of the merged page order, the sources are built once at the end
+# - duplicate declared pages, variables with conflicting types and transitions to pages that are declared in none of
+#   the modules are collected in a MergeConflictReport
+#
+# usage:
+#   merge_result = questionnaireMerge.merge_questionnaires([q1, q2, q3])
+#   merge_result.questionnaire, merge_result.conflicts.return_dict_of_conflicts()
+
+import logging
+from collections import namedtuple
+from qmlReader import questionnaire
+
+DUPLICATE_POLICIES = ['first', 'last']
+# precedence of the varplaces if a variable is used in several modules, see QmlReader.update_varplaces
+VARPLACE_PRECEDENCE = {'triggers': 3, 'body': 2, 'shown': 1, None: 0}
+
+# result of merge_questionnaires: merged Questionnaire, MergeConflictReport
+MergeResult = namedtuple('MergeResult', ['questionnaire', 'conflicts'])
+# a page that is declared in more than one module; kept_file: module whose page is in the merged questionnaire
+DuplicatePage = namedtuple('DuplicatePage', ['uid', 'first_file', 'duplicate_file', 'kept_file'])
+# a variable that is declared with different types; the merged questionnaire keeps the first type
+TypeConflictingVariable = namedtuple('TypeConflictingVariable', ['varname', 'first_vartype', 'first_file',
+                                                                 'other_vartype', 'other_file'])
+# a transition whose target is declared in none of the modules
+DanglingTarget = namedtuple('DanglingTarget', ['source', 'target', 'index', 'file'])
+
+
+class MergeConflictReport:
+    def __init__(self):
+        self.duplicate_pages = []
+        self.type_conflicting_variables = []
+        self.dangling_targets = []
+
+    def has_conflicts(self) -> bool:
+        return bool(self.duplicate_pages or self.type_conflicting_variables or self.dangling_targets)
+
+    def return_dict_of_conflicts(self) -> dict:
+        """
+        :return: json serializable dict {'duplicate_pages': [...], 'type_conflicting_variables': [...],
+            'dangling_targets': [...]}, every conflict as a dict
+        """
+        return {'duplicate_pages': [entry._asdict() for entry in self.duplicate_pages],
+                'type_conflicting_variables': [entry._asdict() for entry in self.type_conflicting_variables],
+                'dangling_targets': [entry._asdict() for entry in self.dangling_targets]}
+
+    def __str__(self):
+        tmp_list_of_lines = [str(len(self.duplicate_pages)) + ' duplicate page(s), ' +
+                             str(len(self.type_conflicting_variables)) + ' type conflicting variable(s), ' +
+                             str(len(self.dangling_targets)) + ' dangling target(s)']
+        for entry in self.duplicate_pages:
+            tmp_list_of_lines.append('duplicate page "' + entry.uid + '": ' + str(entry.first_file) + ', ' +
+                                     str(entry.duplicate_file) + ' (kept: ' + str(entry.kept_file) + ')')
+        for entry in self.type_conflicting_variables:
+            tmp_list_of_lines.append('variable "' + entry.varname + '": ' + str(entry.first_vartype) + ' (' +
+                                     str(entry.first_file) + ') vs. ' + str(entry.other_vartype) + ' (' +
+                                     str(entry.other_file) + ')')
+        for entry in self.dangling_targets:
+            tmp_list_of_lines.append('dangling target "' + entry.target + '" of page "' + entry.source + '" (' +
+                                     str(entry.file) + ')')
+        return '\n'.join(tmp_list_of_lines)
+
+
+def return_name_of_questionnaire(questionnaire_object) -> str:
+    return str(questionnaire_object.file if questionnaire_object.file is not None else questionnaire_object.filename)
+
+
+def merge_questionnaires(list_of_questionnaires, filename='questionnaire_combined', title=None,
+                         duplicate_policy='last') -> MergeResult:
+    """
+    :param list_of_questionnaires: list of questionnaire.Questionnaire objects, in module order
+    :param filename: filename of the merged questionnaire
+    :param title: title of the merged questionnaire; None: title of the first questionnaire
+    :param duplicate_policy: 'first' or 'last' - which of several declarations of a page is kept; the page keeps the
+        position of its first declaration in both cases ('last' is the behaviour of
+        Questionnaire.append_other_questionnaire)
+    :return: MergeResult
+    """
+    assert duplicate_policy in DUPLICATE_POLICIES
+    logger = logging.getLogger('debug')
+    list_of_questionnaires = list(list_of_questionnaires)
+    for questionnaire_object in list_of_questionnaires:
+        assert isinstance(questionnaire_object, questionnaire.Questionnaire)
+    tmp_conflicts = MergeConflictReport()
+
+    # pages: {uid: (page, name of the module)}, in order of the first declaration
+    tmp_dict_of_declared_pages = {}
+    # {uid: name of the module of the first declaration}; differs from the kept module for duplicate_policy 'last'
+    tmp_dict_of_first_declarations = {}
+    # pages that are only transition targets, in order of their first appearance
+    tmp_dict_of_undeclared_pages = {}
+    # variables: {varname: (merged Variable, name of the module)}
+    tmp_dict_of_variables = {}
+    for questionnaire_object in list_of_questionnaires:
+        tmp_name = return_name_of_questionnaire(questionnaire_object)
+        logger.info('merge_questionnaires: ' + tmp_name)
+        for page_uid, page in questionnaire_object.pages.pages.items():
+            if not page.declared:
+                if page_uid not in tmp_dict_of_undeclared_pages:
+                    tmp_dict_of_undeclared_pages[page_uid] = (page, tmp_name)
+                continue
+            if page_uid not in tmp_dict_of_declared_pages:
+                tmp_dict_of_declared_pages[page_uid] = (page, tmp_name)
+                tmp_dict_of_first_declarations[page_uid] = tmp_name
+                continue
+            tmp_first_name = tmp_dict_of_first_declarations[page_uid]
+            if duplicate_policy == 'last':
+                tmp_dict_of_declared_pages[page_uid] = (page, tmp_name)
+            tmp_conflicts.duplicate_pages.append(DuplicatePage(uid=page_uid, first_file=tmp_first_name,
+                                                               duplicate_file=tmp_name,
+                                                               kept_file=tmp_dict_of_declared_pages[page_uid][1]))
+
+        for varname, variable in questionnaire_object.variables.variables.items():
+            if varname not in tmp_dict_of_variables:
+                tmp_dict_of_variables[varname] = (questionnaire.Variable(varname, variable.vartype,
+                                                                         variable.varplace), tmp_name)
+                continue
+            tmp_variable, tmp_first_name = tmp_dict_of_variables[varname]
+            if tmp_variable.vartype != variable.vartype:
+                tmp_conflicts.type_conflicting_variables.append(TypeConflictingVariable(
+                    varname=varname, first_vartype=tmp_variable.vartype, first_file=tmp_first_name,
+                    other_vartype=variable.vartype, other_file=tmp_name))
+            elif VARPLACE_PRECEDENCE[variable.varplace] > VARPLACE_PRECEDENCE[tmp_variable.varplace]:
+                tmp_variable.set_varplace(varplace=variable.varplace, varname=varname)
+
+    tmp_questionnaire = questionnaire.Questionnaire(
+        file=list_of_questionnaires[0].file if list_of_questionnaires else None, filename=filename,
+        title=title if title is not None else (list_of_questionnaires[0].title if list_of_questionnaires else
+                                               'Zofar Survey'))
+    for page_uid, (page, tmp_name) in tmp_dict_of_declared_pages.items():
+        tmp_questionnaire.pages.add_page(page.return_copy_without_routing())
+    for page_uid, (page, tmp_name) in tmp_dict_of_undeclared_pages.items():
+        if page_uid not in tmp_dict_of_declared_pages:
+            tmp_questionnaire.pages.add_page(page.return_copy_without_routing())
+    for varname, (variable, tmp_name) in tmp_dict_of_variables.items():
+        tmp_questionnaire.variables.add_variable(variable)
+
+    # transitions with the distances of the merged page order; sources are built here, once
+    tmp_merged_pages = tmp_questionnaire.pages.pages
+    for page_uid, (page, tmp_name) in tmp_dict_of_declared_pages.items():
+        for transition in page.transitions.transitions.values():
+            if transition.target not in tmp_dict_of_declared_pages:
+                tmp_conflicts.dangling_targets.append(DanglingTarget(source=page_uid, target=transition.target,
+                                                                     index=transition.index, file=tmp_name))
+                if transition.target not in tmp_merged_pages:
+                    tmp_questionnaire.pages.add_page(questionnaire.QmlPage(transition.target, declared=False))
+            tmp_transition = questionnaire.Transition(
+                index=transition.index, target=transition.target, condition=transition.condition, source=page_uid,
+                distance=tmp_questionnaire.pages.return_distance(page_uid, transition.target))
+            tmp_merged_pages[page_uid].transitions.add_transitions(tmp_transition)
+            tmp_merged_pages[transition.target].sources.add_source(tmp_transition)
+
+    logger.info('merge_questionnaires: ' + str(len(list_of_questionnaires)) + ' questionnaire(s), ' +
+                str(len(tmp_merged_pages)) + ' pages, ' + str(len(tmp_dict_of_variables)) + ' variables; ' +
+                str(tmp_conflicts).split('\n')[0])
+    return MergeResult(questionnaire=tmp_questionnaire, conflicts=tmp_conflicts)
@@ -0,0 +1,808 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+# Graph views of the routing of a questionnaire (networkx DiGraphs):
+#   ROUTING: one node per page (in page order), one edge per distinct (source, target) of the transitions
+#   BIDIRECTIONAL: ROUTING plus the reversed edges (only useful for weighted graphs/charts)
+#   FLOWCHART: edges labelled with the readable conditions, nodes optionally labelled with the page variables
+#   CONDENSATION: ROUTING with every loop (strongly connected component) condensed into one node (a DAG)
+#   FLOWCHART with compress_chains: every chain of pages without branches collapsed into one node, see
+#    build_compressed_graph
+#
+# The views are built lazily, frozen (read-only: networkx raises an error on any change) and cached per questionnaire;
+#  a cached view is rebuilt when the structure version of its questionnaire (see
+#  Questionnaire.return_structure_version()) has changed. Results of analyses of the routing graph (e.g. PAGE_ORDER)
+#  are cached the same way.
+
+from collections import namedtuple
+import heapq
+import networkx as nx
+from qmlReader import instrumentation
+
+ROUTING = 'routing'
+BIDIRECTIONAL = 'bidirectional'
+FLOWCHART = 'flowchart'
+PAGE_ORDER = 'page order'
+BOTTLENECKS = 'bottlenecks'
+CONDENSATION = 'condensation'
+REACHABILITY = 'reachability'
+SECTIONS = 'sections'
+PATH_METRICS = 'path metrics'
+EXPECTED_LENGTH = 'expected length'
+# expected lengths: maximum number of steps within one loop, and the probability below which a loop is left
+DEFAULT_MAX_LOOP_STEPS = 1000
+LOOP_TOLERANCE = 1e-12
+
+# result of return_page_order: pages: tuple of all page uids, loops: tuple of the loops (tuples of page uids of the
+#  strongly connected components with more than one page), both in page order
+PageOrder = namedtuple('PageOrder', ['pages', 'loops'])
+# result of return_bottleneck_pages: dominators: tuple of the pages on every route from the start page to the end page
+#  (both included), articulation_points: tuple of the pages whose removal disconnects the (undirected) routing graph,
+#  both in route order
+BottleneckPages = namedtuple('BottleneckPages', ['dominators', 'articulation_points'])
+# one section of return_sections: entry: first page (a page every route passes), exit: entry of the next section or
+#  None for the last section, pages: tuple of the page uids of the section (entry first, exit excluded) in route
+#  order, variables: tuple of the varnames of these pages
+Section = namedtuple('Section', ['entry', 'exit', 'pages', 'variables'])
+# result of return_path_metrics: shortest and longest route from the start page to the end page, in pages and in
+#  variables (both pages included); None if the end page cannot be reached
+PathMetrics = namedtuple('PathMetrics', ['min_pages', 'max_pages', 'min_variables', 'max_variables'])
+# result of return_expected_length: expected number of pages and of variables per interview, expected_visits: {page
+#  uid: expected number of visits per interview} - a count, not a probability: it exceeds 1 for pages that are visited
+#  repeatedly within a loop, and only equals the probability of a visit for pages outside loops;
+#  truncated_probability: probability that was still within a loop after max_loop_steps steps and is not counted
+ExpectedLength = namedtuple('ExpectedLength', ['pages', 'variables', 'expected_visits', 'truncated_probability'])
+
+
+class RoutingGraphCache:
+    def __init__(self):
+        # {key: (structure version, frozen graph or cached value)}
+        self.graphs = {}
+
+    def return_graph(self, key, version, build_function) -> nx.DiGraph:
+        """
+        :param key: hashable key of the view, e.g. (FLOWCHART, show_conditions, show_variable_names, bidirectional)
+        :param version: current structure version
+        :param build_function: callable() that returns a new nx.DiGraph of the view
+        :return: frozen graph of the view, built only if there is none for the current version
+        """
+        return self.return_value(key, version, lambda: nx.freeze(build_function()))
+
+    def return_value(self, key, version, build_function):
+        """
+        :param key: hashable key of the value
+        :param version: current structure version
+        :param build_function: callable() that returns the value; the value must not be changed by the caller
+        :return: cached value, built only if there is none for the current version
+        """
+        if key not in self.graphs or self.graphs[key][0] != version:
+            self.graphs[key] = (version, build_function())
+        return self.graphs[key][1]
+
+    def clear(self):
+        self.graphs = {}
+
+
+@instrumentation.timed('build graph')
+def build_routing_graph(questionnaire_object) -> nx.DiGraph:
+    """
+    :param questionnaire_object: questionnaire.Questionnaire
+    :return: new nx.DiGraph with all pages as nodes and the transitions as edges (self-loops included)
+    """
+    tmp_graph = nx.DiGraph()
+    tmp_graph.add_nodes_from(questionnaire_object.pages.pages)
+    for page in questionnaire_object.pages.pages.values():
+        for transition in page.transitions.transitions.values():
+            tmp_graph.add_edge(page.uid, transition.target)
+    return tmp_graph
+
+
+def build_condensed_graph(graph) -> nx.DiGraph:
+    """
+    :param graph: routing graph, see build_routing_graph (nodes in declaration order)
+    :return: new nx.DiGraph (DAG) with one node per strongly connected component (a loop or a single page), see
+        nx.condensation; node attribute 'members': tuple of the page uids of the component in declaration order, graph
+        attribute 'mapping': {page uid: component}
+    """
+    tmp_condensation = nx.condensation(graph)
+    tmp_mapping = tmp_condensation.graph['mapping']
+    tmp_list_of_members = [[] for _ in range(tmp_condensation.number_of_nodes())]
+    for node in graph:
+        tmp_list_of_members[tmp_mapping[node]].append(node)
+    for component, members in enumerate(tmp_list_of_members):
+        tmp_condensation.nodes[component]['members'] = tuple(members)
+    return tmp_condensation
+
+
+def return_page_order(graph, condensation=None) -> PageOrder:
+    """
+    Order of the pages that exists for graphs with loops as well: the strongly connected components (loops) are
+    condensed into single nodes, the resulting DAG is sorted topologically - of several components that may come next,
+    the one with the first declared page first - and the pages within a component are in declaration order. For a
+    graph without loops this is a topological sort of the pages.
+    Kahn's algorithm with the ready components bucketed by the declaration ordinal of their first page, scanned by a
+    cursor that only moves forward: O(V+E) as long as the components become ready in declaration order (transitions
+    to pages declared later); a component that becomes ready behind the cursor goes to a heap, O(log V) each.
+    :param graph: routing graph, see build_routing_graph (nodes in declaration order)
+    :param condensation: condensed graph of graph (see build_condensed_graph) or None: it is built
+    :return: PageOrder
+    """
+    if condensation is None:
+        condensation = build_condensed_graph(graph)
+    tmp_node_ordinals = {node: ordinal for ordinal, node in enumerate(graph)}
+    tmp_list_of_members = [condensation.nodes[component]['members'] for component in range(len(condensation))]
+    # the first pages of the components are distinct: one bucket per page ordinal holds at most one component
+    tmp_first_ordinals = [tmp_node_ordinals[members[0]] for members in tmp_list_of_members]
+    tmp_in_degrees = [condensation.in_degree(component) for component in range(len(condensation))]
+    tmp_buckets = [None] * len(tmp_node_ordinals)
+    for component, in_degree in enumerate(tmp_in_degrees):
+        if in_degree == 0:
+            tmp_buckets[tmp_first_ordinals[component]] = component
+    tmp_heap = []
+    tmp_cursor = 0
+    tmp_list_of_components = []
+    while len(tmp_list_of_components) < len(tmp_list_of_members):
+        while tmp_cursor < len(tmp_buckets) and tmp_buckets[tmp_cursor] is None:
+            tmp_cursor += 1
+        if tmp_heap and (tmp_cursor == len(tmp_buckets) or tmp_heap[0][0] < tmp_cursor):
+            tmp_component = heapq.heappop(tmp_heap)[1]
+        else:
+            tmp_component = tmp_buckets[tmp_cursor]
+            tmp_buckets[tmp_cursor] = None
+        tmp_list_of_components.append(tmp_component)
+        for successor in condensation.successors(tmp_component):
+            tmp_in_degrees[successor] -= 1
+            if tmp_in_degrees[successor] == 0:
+                if tmp_first_ordinals[successor] > tmp_cursor:
+                    tmp_buckets[tmp_first_ordinals[successor]] = successor
+                else:
+                    heapq.heappush(tmp_heap, (tmp_first_ordinals[successor], successor))
+    return PageOrder(pages=tuple(node for component in tmp_list_of_components
+                                 for node in tmp_list_of_members[component]),
+                     loops=tuple(tmp_list_of_members[component] for component in tmp_list_of_components
+                                 if len(tmp_list_of_members[component]) > 1))
+
+
+def return_number_of_paths(graph, source, target, condensation=None) -> int:
+    """
+    Number of routes from source to target, counted by dynamic programming over the condensed graph in topological
+    order, O(V+E) additions: every loop (strongly connected component) counts as one step, so repetitions of a loop
+    do not make the number infinite. The number is a python int (no overflow); use math.log10 for its magnitude.
+    :param graph: routing graph, see build_routing_graph
+    :param source: page uid
+    :param target: page uid
+    :param condensation: condensed graph of graph (see build_condensed_graph) or None: it is built
+    :return: number of paths from the component of source to the component of target in the condensed graph (1 if
+        both are in the same component, 0 if target cannot be reached or one of the pages is not in graph)
+    """
+    if source not in graph or target not in graph:
+        return 0
+    if condensation is None:
+        condensation = build_condensed_graph(graph)
+    tmp_mapping = condensation.graph['mapping']
+    tmp_source_component = tmp_mapping[source]
+    tmp_target_component = tmp_mapping[target]
+    # only the components that can be reached from source are visited
+    tmp_set_of_reachable_components = nx.descendants(condensation, tmp_source_component)
+    tmp_set_of_reachable_components.add(tmp_source_component)
+    if tmp_target_component not in tmp_set_of_reachable_components:
+        return 0
+    tmp_dict_of_numbers = {tmp_source_component: 1}
+    for component in nx.topological_sort(condensation.subgraph(tmp_set_of_reachable_components)):
+        tmp_number = tmp_dict_of_numbers.get(component, 0)
+        if component == tmp_target_component:
+            return tmp_number
+        for successor in condensation.successors(component):
+            tmp_dict_of_numbers[successor] = tmp_dict_of_numbers.get(successor, 0) + tmp_number
+    return 0
+
+
+def return_pages_between(graph, source, target, page_order=None) -> tuple:
+    """
+    Pages that lie on some route from source to target: the pages reachable from source that target can be reached
+    from (forward and backward search, O(V+E)), instead of the union of all simple paths.
+    :param graph: routing graph, see build_routing_graph
+    :param source: page uid
+    :param target: page uid
+    :param page_order: PageOrder of graph (see return_page_order) or None: it is computed
+    :return: tuple of page uids (source and target included) in route order; empty if target cannot be reached from
+        source
+    """
+    if source not in graph or target not in graph:
+        return ()
+    tmp_set_of_reachable_pages = nx.descendants(graph, source)
+    tmp_set_of_reachable_pages.add(source)
+    if target not in tmp_set_of_reachable_pages:
+        return ()
+    tmp_set_of_pages_before_target = nx.ancestors(graph, target)
+    tmp_set_of_pages_before_target.add(target)
+    tmp_set_of_pages_between = tmp_set_of_reachable_pages & tmp_set_of_pages_before_target
+    if page_order is None:
+        page_order = return_page_order(graph)
+    return tuple(node for node in page_order.pages if node in tmp_set_of_pages_between)
+
+
+def return_dominators(graph, start_page='index', end_page='end') -> tuple:
+    """
+    Pages that every respondent passes on the way from start_page to end_page: the chain of immediate dominators of
+    end_page (Cooper/Harvey/Kennedy, nx.immediate_dominators), O(V+E) for the usual, nearly acyclic routing.
+    :param graph: routing graph, see build_routing_graph
+    :param start_page: uid of the first page
+    :param end_page: uid of the last page
+    :return: tuple of page uids from start_page to end_page (both included), in route order; empty if end_page cannot
+        be reached from start_page
+    """
+    if start_page not in graph or end_page not in graph:
+        return ()
+    if start_page == end_page:
+        return start_page,
+    tmp_immediate_dominators = nx.immediate_dominators(graph, start_page)
+    if end_page not in tmp_immediate_dominators:
+        return ()
+    tmp_list_of_dominators = [end_page]
+    while tmp_list_of_dominators[-1] != start_page:
+        tmp_list_of_dominators.append(tmp_immediate_dominators[tmp_list_of_dominators[-1]])
+    return tuple(reversed(tmp_list_of_dominators))
+
+
+def return_sections(graph, start_page='index', end_page='end', excluded_pages=None, dict_of_page_variables=None,
+                    page_order=None) -> tuple:
+    """
+    Cuts the routing graph into sections at the pages that every route from start_page passes before it ends. A route
+    ends at end_page or at a page without transitions to other pages (a dead end, or a page whose targets are all
+    excluded), so the cut pages are the dominators of a virtual exit behind all of them and end_page need not be
+    reachable. Every page that can be reached from start_page belongs to the section of the nearest such page that
+    dominates it; O(V+E).
+    :param graph: routing graph, see build_routing_graph (not changed)
+    :param start_page: uid of the first page
+    :param end_page: uid of the last page
+    :param excluded_pages: iterable of page uids that are removed first, e.g. the cancel pages, or None; they do not
+        belong to any section
+    :param dict_of_page_variables: {page uid: list of varnames} or None: the sections have no variables
+    :param page_order: PageOrder of graph (see return_page_order) or None: it is computed
+    :return: tuple of Section in route order; empty if start_page is not in graph
+    """
+    tmp_set_of_excluded_pages = set(excluded_pages) if excluded_pages is not None else set()
+    if start_page not in graph or start_page in tmp_set_of_excluded_pages:
+        return ()
+    tmp_graph = nx.DiGraph()
+    tmp_graph.add_nodes_from(node for node in graph if node not in tmp_set_of_excluded_pages)
+    tmp_graph.add_edges_from((u, v) for u, v in graph.edges() if u not in tmp_set_of_excluded_pages and
+                             v not in tmp_set_of_excluded_pages)
+    tmp_set_of_reachable_pages = nx.descendants(tmp_graph, start_page)
+    tmp_set_of_reachable_pages.add(start_page)
+    tmp_exit = object()
+    for node in tmp_set_of_reachable_pages:
+        if node == end_page or not any(successor != node for successor in tmp_graph.successors(node)):
+            tmp_graph.add_edge(node, tmp_exit)
+    tmp_immediate_dominators = nx.immediate_dominators(tmp_graph, start_page)
+    tmp_immediate_dominators.pop(start_page, None)
+
+    # pages every route passes: the dominator chain of the virtual exit
+    tmp_list_of_cut_pages = []
+    if tmp_exit in tmp_immediate_dominators:
+        tmp_node = tmp_immediate_dominators[tmp_exit]
+        while tmp_node != start_page:
+            tmp_list_of_cut_pages.append(tmp_node)
+            tmp_node = tmp_immediate_dominators[tmp_node]
+    tmp_list_of_cut_pages.append(start_page)
+    tmp_list_of_cut_pages.reverse()
+    tmp_set_of_cut_pages = set(tmp_list_of_cut_pages)
+
+    # section of every page: the nearest cut page in the dominator tree, top-down from start_page
+    tmp_dict_of_children = {}
+    for node, dominator in tmp_immediate_dominators.items():
+        tmp_dict_of_children.setdefault(dominator, []).append(node)
+    tmp_dict_of_sections = {start_page: start_page}
+    tmp_stack = [start_page]
+    while tmp_stack:
+        tmp_node = tmp_stack.pop()
+        for child in tmp_dict_of_children.get(tmp_node, []):
+            if child is tmp_exit:
+                continue
+            tmp_dict_of_sections[child] = child if child in tmp_set_of_cut_pages else tmp_dict_of_sections[tmp_node]
+            tmp_stack.append(child)
+
+    if page_order is None:
+        page_order = return_page_order(graph)
+    tmp_dict_of_pages = {cut_page: [cut_page] for cut_page in tmp_list_of_cut_pages}
+    for node in page_order.pages:
+        if node in tmp_dict_of_sections and node not in tmp_set_of_cut_pages:
+            tmp_dict_of_pages[tmp_dict_of_sections[node]].append(node)
+    tmp_list_of_sections = []
+    for index, cut_page in enumerate(tmp_list_of_cut_pages):
+        tmp_list_of_varnames = []
+        if dict_of_page_variables is not None:
+            # without duplicates, in order of their first occurrence
+            tmp_list_of_varnames = list(dict.fromkeys(varname for node in tmp_dict_of_pages[cut_page]
+                                                      for varname in dict_of_page_variables.get(node, [])))
+        tmp_list_of_sections.append(Section(
+            entry=cut_page, exit=tmp_list_of_cut_pages[index + 1] if index + 1 < len(tmp_list_of_cut_pages) else None,
+            pages=tuple(tmp_dict_of_pages[cut_page]), variables=tuple(tmp_list_of_varnames)))
+    return tuple(tmp_list_of_sections)
+
+
+def return_articulation_points(graph, excluded_pages=None, page_order=None) -> tuple:
+    """
+    Pages whose removal splits the routing graph (edge directions ignored) into more components - the same pages
+    that the copy-per-node check with nx.is_weakly_connected finds, in O(V+E) (Hopcroft/Tarjan).
+    :param graph: routing graph, see build_routing_graph (not changed)
+    :param excluded_pages: iterable of page uids that are removed first, e.g. ['cancel1', 'cancel2'], or None
+    :param page_order: PageOrder of graph (see return_page_order) or None: it is computed
+    :return: tuple of page uids in route order (see return_page_order)
+    """
+    tmp_set_of_excluded_pages = set(excluded_pages) if excluded_pages is not None else set()
+    tmp_undirected_graph = nx.Graph()
+    tmp_undirected_graph.add_nodes_from(node for node in graph if node not in tmp_set_of_excluded_pages)
+    tmp_undirected_graph.add_edges_from((u, v) for u, v in graph.edges() if u != v and
+                                        u not in tmp_set_of_excluded_pages and v not in tmp_set_of_excluded_pages)
+    tmp_set_of_articulation_points = set(nx.articulation_points(tmp_undirected_graph))
+    if page_order is None:
+        page_order = return_page_order(graph)
+    return tuple(node for node in page_order.pages if node in tmp_set_of_articulation_points)
+
+
+def return_bottleneck_pages(graph, start_page='index', end_page='end', excluded_pages=None,
+                            page_order=None) -> BottleneckPages:
+    """
+    :param graph: routing graph, see build_routing_graph
+    :param start_page: uid of the first page
+    :param end_page: uid of the last page
+    :param excluded_pages: pages that are ignored for the articulation points, see return_articulation_points
+    :param page_order: PageOrder of graph or None
+    :return: BottleneckPages, see return_dominators and return_articulation_points
+    """
+    if page_order is None:
+        page_order = return_page_order(graph)
+    return BottleneckPages(dominators=return_dominators(graph, start_page=start_page, end_page=end_page),
+                           articulation_points=return_articulation_points(graph, excluded_pages=excluded_pages,
+                                                                          page_order=page_order))
+
+
+class ReachabilityIndex:
+    """
+    Transitive closure of the routing graph, built once in O(E * V / 64): the loops (strongly connected components)
+    are condensed, every component gets one bit (in route order, see return_page_order) and, in reverse topological
+    order, every component gets the bitset (python int) of the components that can be reached from it. Afterwards
+    is_reachable is O(1) and the lists below are O(V).
+    """
+
+    def __init__(self, graph, condensation=None, page_order=None):
+        """
+        :param graph: routing graph, see build_routing_graph
+        :param condensation: condensed graph of graph (see build_condensed_graph) or None: it is built
+        :param page_order: PageOrder of graph (see return_page_order) or None: it is computed
+        """
+        if condensation is None:
+            condensation = build_condensed_graph(graph)
+        if page_order is None:
+            page_order = return_page_order(graph, condensation=condensation)
+        tmp_mapping = condensation.graph['mapping']
+        # {page uid: bit of its component}; the bits are assigned in route order
+        self.dict_of_bits = {}
+        # [tuple of page uids of the component] per bit
+        self.list_of_members = []
+        for node in page_order.pages:
+            tmp_members = condensation.nodes[tmp_mapping[node]]['members']
+            if node == tmp_members[0]:
+                for member in tmp_members:
+                    self.dict_of_bits[member] = len(self.list_of_members)
+                self.list_of_members.append(tmp_members)
+        # [bitset of the components reachable in at least one step] per bit; a component reaches itself only if it is
+        #  a loop or a page with a self-loop
+        self.list_of_reachable_bits = [0] * len(self.list_of_members)
+        for bit in reversed(range(len(self.list_of_members))):
+            tmp_members = self.list_of_members[bit]
+            tmp_bits = 0
+            for successor in condensation.successors(tmp_mapping[tmp_members[0]]):
+                tmp_successor_bit = self.dict_of_bits[condensation.nodes[successor]['members'][0]]
+                tmp_bits |= self.list_of_reachable_bits[tmp_successor_bit] | (1 << tmp_successor_bit)
+            if len(tmp_members) > 1 or graph.has_edge(tmp_members[0], tmp_members[0]):
+                tmp_bits |= 1 << bit
+            self.list_of_reachable_bits[bit] = tmp_bits
+        self.dict_of_out_degrees = {node: sum(1 for successor in graph.successors(node) if successor != node)
+                                    for node in graph}
+
+    def is_reachable(self, source, target) -> bool:
+        """
+        :return: True if target can be reached from source in at least one step (source itself only on a loop);
+            False if not or if one of the pages is unknown
+        """
+        if source not in self.dict_of_bits or target not in self.dict_of_bits:
+            return False
+        return bool(self.list_of_reachable_bits[self.dict_of_bits[source]] >> self.dict_of_bits[target] & 1)
+
+    def return_list_of_pages(self, bits) -> list:
+        """
+        :param bits: bitset of components
+        :return: list of the page uids of the components, in route order
+        """
+        tmp_list_of_pages = []
+        while bits:
+            tmp_lowest_bit = bits & -bits
+            tmp_list_of_pages += self.list_of_members[tmp_lowest_bit.bit_length() - 1]
+            bits ^= tmp_lowest_bit
+        return tmp_list_of_pages
+
+    def return_list_of_reachable_pages(self, source) -> list:
+        """
+        :return: list of the page uids that can be reached from source, in route order
+        """
+        if source not in self.dict_of_bits:
+            return []
+        return self.return_list_of_pages(self.list_of_reachable_bits[self.dict_of_bits[source]])
+
+    def return_list_of_unreachable_pages(self, start_page='index') -> list:
+        """
+        :return: list of the page uids (except start_page) that cannot be reached from start_page, in route order; all
+            pages if start_page is unknown
+        """
+        tmp_all_bits = (1 << len(self.list_of_members)) - 1
+        if start_page not in self.dict_of_bits:
+            return self.return_list_of_pages(tmp_all_bits)
+        tmp_start_bit = self.dict_of_bits[start_page]
+        return [page for page in self.return_list_of_pages(
+            tmp_all_bits & ~self.list_of_reachable_bits[tmp_start_bit] & ~(1 << tmp_start_bit))
+                if page != start_page]
+
+    def return_list_of_pages_not_reaching(self, end_page='end') -> list:
+        """
+        :return: list of the page uids (except end_page) from which end_page cannot be reached, in route order; all
+            pages if end_page is unknown
+        """
+        tmp_end_bit = self.dict_of_bits.get(end_page)
+        return [page for bit, members in enumerate(self.list_of_members) for page in members
+                if page != end_page and (tmp_end_bit is None or not self.list_of_reachable_bits[bit] >> tmp_end_bit & 1)]
+
+    def return_list_of_dead_end_pages(self, end_page='end') -> list:
+        """
+        :return: list of the page uids (except end_page) without transitions to other pages, in route order
+        """
+        return [page for members in self.list_of_members for page in members
+                if page != end_page and self.dict_of_out_degrees[page] == 0]
+
+
+def return_list_of_components(condensation, page_order) -> list:
+    """
+    :return: list of the components of condensation in the order of page_order (a topological order)
+    """
+    tmp_mapping = condensation.graph['mapping']
+    return [tmp_mapping[node] for node in page_order.pages
+            if condensation.nodes[tmp_mapping[node]]['members'][0] == node]
+
+
+def return_path_metrics(graph, start_page='index', end_page='end', dict_of_page_variables=None, condensation=None,
+                        page_order=None) -> PathMetrics:
+    """
+    Shortest routes: breadth-first search (pages) and Dijkstra with the number of variables of the target page as edge
+    weight (variables), exact for graphs with loops as well. Longest routes: dynamic programming over the condensed
+    graph in topological order, O(V+E); a loop counts with all its pages once (an upper bound for the longest route
+    without repeated pages).
+    :param graph: routing graph, see build_routing_graph
+    :param start_page: uid of the first page
+    :param end_page: uid of the last page
+    :param dict_of_page_variables: {page uid: list of varnames} or None: the variables are not counted (0)
+    :param condensation: condensed graph of graph (see build_condensed_graph) or None: it is built
+    :param page_order: PageOrder of graph (see return_page_order) or None: it is computed
+    :return: PathMetrics
+    """
+    if start_page not in graph or end_page not in graph or not nx.has_path(graph, start_page, end_page):
+        return PathMetrics(min_pages=None, max_pages=None, min_variables=None, max_variables=None)
+    if dict_of_page_variables is None:
+        dict_of_page_variables = {}
+    if condensation is None:
+        condensation = build_condensed_graph(graph)
+    if page_order is None:
+        page_order = return_page_order(graph, condensation=condensation)
+
+    def return_variable_count(node):
+        return len(dict_of_page_variables.get(node, []))
+
+    tmp_min_pages = nx.shortest_path_length(graph, start_page, end_page) + 1
+    tmp_min_variables = return_variable_count(start_page) + nx.dijkstra_path_length(
+        graph, start_page, end_page, weight=lambda u, v, data: return_variable_count(v))
+
+    tmp_mapping = condensation.graph['mapping']
+    tmp_start_component = tmp_mapping[start_page]
+    tmp_end_component = tmp_mapping[end_page]
+    # (pages, variables) of the longest routes from the start component, per component
+    tmp_dict_of_longest = {tmp_start_component: (0, 0)}
+    for component in return_list_of_components(condensation, page_order):
+        if component not in tmp_dict_of_longest:
+            continue
+        tmp_members = condensation.nodes[component]['members']
+        tmp_pages = tmp_dict_of_longest[component][0] + len(tmp_members)
+        tmp_variables = tmp_dict_of_longest[component][1] + sum(return_variable_count(node) for node in tmp_members)
+        if component == tmp_end_component:
+            return PathMetrics(min_pages=tmp_min_pages, max_pages=tmp_pages, min_variables=tmp_min_variables,
+                               max_variables=tmp_variables)
+        for successor in condensation.successors(component):
+            tmp_longest = tmp_dict_of_longest.get(successor, (0, 0))
+            tmp_dict_of_longest[successor] = (max(tmp_longest[0], tmp_pages), max(tmp_longest[1], tmp_variables))
+    return PathMetrics(min_pages=None, max_pages=None, min_variables=None, max_variables=None)
+
+
+def return_dict_of_edge_probabilities(graph, dict_of_edge_frequencies=None) -> dict:
+    """
+    :param graph: routing graph, see build_routing_graph
+    :param dict_of_edge_frequencies: {(source, target): observed frequency}, e.g. from history data (see
+        batchRouting.return_dict_of_transition_frequencies), or None
+    :return: {page uid: list of (target, probability)}: the observed frequencies of the edges of every page,
+        normalized; equal probabilities for pages without observed frequencies
+    """
+    if dict_of_edge_frequencies is None:
+        dict_of_edge_frequencies = {}
+    tmp_dict_of_probabilities = {}
+    for node in graph:
+        tmp_list_of_targets = list(graph.successors(node))
+        tmp_frequencies = [dict_of_edge_frequencies.get((node, target), 0) for target in tmp_list_of_targets]
+        tmp_sum = sum(tmp_frequencies)
+        if tmp_sum > 0:
+            tmp_dict_of_probabilities[node] = [(target, frequency / tmp_sum) for target, frequency in
+                                               zip(tmp_list_of_targets, tmp_frequencies) if frequency > 0]
+        else:
+            tmp_dict_of_probabilities[node] = [(target, 1 / len(tmp_list_of_targets)) for target in
+                                               tmp_list_of_targets]
+    return tmp_dict_of_probabilities
+
+
+def return_expected_length(graph, start_page='index', dict_of_edge_frequencies=None, dict_of_page_variables=None,
+                           condensation=None, page_order=None, max_loop_steps=DEFAULT_MAX_LOOP_STEPS) -> ExpectedLength:
+    """
+    Expected number of visits of every page (not the probability of at least one visit, which is smaller for pages
+    within loops): the probability of the start page (1) is passed along the edges in
+    topological order of the condensed graph, O(V+E); within a loop it is passed on step by step until less than
+    LOOP_TOLERANCE is left or after max_loop_steps steps. An interview ends at a page without transitions.
+    :param graph: routing graph, see build_routing_graph
+    :param start_page: uid of the first page
+    :param dict_of_edge_frequencies: see return_dict_of_edge_probabilities
+    :param dict_of_page_variables: {page uid: list of varnames} or None: the variables are not counted (0)
+    :param condensation: condensed graph of graph (see build_condensed_graph) or None: it is built
+    :param page_order: PageOrder of graph (see return_page_order) or None: it is computed
+    :param max_loop_steps: maximum number of steps within one loop
+    :return: ExpectedLength
+    """
+    if start_page not in graph:
+        return ExpectedLength(pages=0.0, variables=0.0, expected_visits={}, truncated_probability=0.0)
+    if dict_of_page_variables is None:
+        dict_of_page_variables = {}
+    if condensation is None:
+        condensation = build_condensed_graph(graph)
+    if page_order is None:
+        page_order = return_page_order(graph, condensation=condensation)
+    tmp_dict_of_probabilities = return_dict_of_edge_probabilities(graph, dict_of_edge_frequencies)
+
+    tmp_dict_of_visits = {}
+    tmp_dict_of_inflows = {start_page: 1.0}
+    tmp_truncated_probability = 0.0
+    for component in return_list_of_components(condensation, page_order):
+        tmp_members = condensation.nodes[component]['members']
+        tmp_dict_of_current = {node: tmp_dict_of_inflows.pop(node) for node in tmp_members
+                               if node in tmp_dict_of_inflows}
+        if not tmp_dict_of_current:
+            continue
+        tmp_set_of_members = set(tmp_members)
+        tmp_is_loop = len(tmp_members) > 1 or graph.has_edge(tmp_members[0], tmp_members[0])
+        tmp_step = 0
+        while tmp_dict_of_current:
+            if tmp_step == max_loop_steps:
+                tmp_truncated_probability += sum(tmp_dict_of_current.values())
+                break
+            tmp_dict_of_next = {}
+            for node, probability in tmp_dict_of_current.items():
+                tmp_dict_of_visits[node] = tmp_dict_of_visits.get(node, 0.0) + probability
+                for target, edge_probability in tmp_dict_of_probabilities[node]:
+                    tmp_dict_of_targets = tmp_dict_of_next if target in tmp_set_of_members else tmp_dict_of_inflows
+                    tmp_dict_of_targets[target] = tmp_dict_of_targets.get(target, 0.0) + probability * edge_probability
+            if not tmp_is_loop or sum(tmp_dict_of_next.values()) < LOOP_TOLERANCE:
+                break
+            tmp_dict_of_current = tmp_dict_of_next
+            tmp_step += 1
+    tmp_dict_of_visits = {node: tmp_dict_of_visits[node] for node in page_order.pages if node in tmp_dict_of_visits}
+    return ExpectedLength(pages=sum(tmp_dict_of_visits.values()),
+                          variables=sum(visits * len(dict_of_page_variables.get(node, []))
+                                        for node, visits in tmp_dict_of_visits.items()),
+                          expected_visits=tmp_dict_of_visits, truncated_probability=tmp_truncated_probability)
+
+
+def return_graph_with_reversed_edges(graph) -> nx.DiGraph:
+    """
+    :param graph: nx.DiGraph (not changed)
+    :return: new nx.DiGraph with all edges of graph and, for every edge (u, v) with u != v, an edge (v, u) (without
+        attributes, if it is not an edge of graph already)
+    """
+    tmp_graph = nx.DiGraph(graph)
+    for u, v in list(graph.edges()):
+        if u != v and not tmp_graph.has_edge(v, u):
+            tmp_graph.add_edge(v, u)
+    return tmp_graph
+
+
+def return_list_of_chains(graph) -> list:
+    """
+    Maximal chains of pages without branches, found in one pass, O(V+E): an edge (u, v) is part of a chain if it is
+    the only edge leaving u and the only edge entering v (self-loops break chains); a loop that consists of such edges
+    only is cut before its first declared page.
+    :param graph: nx.DiGraph, e.g. the routing graph (nodes in declaration order)
+    :return: list of tuples of nodes (every node in exactly one tuple, single nodes as tuples of length 1), in the
+        order of the first node of every chain in graph
+    """
+    def return_chain_successor(node):
+        if graph.out_degree(node) != 1:
+            return None
+        tmp_successor = next(iter(graph.successors(node)))
+        if tmp_successor == node or graph.in_degree(tmp_successor) != 1:
+            return None
+        return tmp_successor
+
+    tmp_dict_of_successors = {node: return_chain_successor(node) for node in graph}
+    tmp_set_of_inner_nodes = set(successor for successor in tmp_dict_of_successors.values() if successor is not None)
+    tmp_set_of_visited_nodes = set()
+    tmp_dict_of_chains = {}
+
+    def walk_chain(first_node):
+        tmp_chain = [first_node]
+        tmp_set_of_visited_nodes.add(first_node)
+        tmp_node = tmp_dict_of_successors[first_node]
+        while tmp_node is not None and tmp_node not in tmp_set_of_visited_nodes:
+            tmp_chain.append(tmp_node)
+            tmp_set_of_visited_nodes.add(tmp_node)
+            tmp_node = tmp_dict_of_successors[tmp_node]
+        tmp_dict_of_chains[first_node] = tuple(tmp_chain)
+
+    for node in graph:
+        if node not in tmp_set_of_inner_nodes:
+            walk_chain(node)
+    # the remaining nodes are on loops that consist of chain edges only
+    for node in graph:
+        if node not in tmp_set_of_visited_nodes:
+            walk_chain(node)
+    return [tmp_dict_of_chains[node] for node in graph if node in tmp_dict_of_chains]
+
+
+def return_variables_label(list_of_varnames) -> str:
+    """
+    :return: '[var1, var2, var3,\\nvar4]' - the variables three per line
+    """
+    tmp_output_string = ''
+    tmp_var_list = list(list_of_varnames)
+    while len(tmp_var_list) > 3:
+        tmp_output_string += ', '.join(tmp_var_list[:3]) + ',\n'
+        tmp_var_list = tmp_var_list[3:]
+    tmp_output_string += ', '.join(tmp_var_list) + ']'
+    return '[' + tmp_output_string
+
+
+def build_compressed_graph(graph, dict_of_page_variables=None) -> nx.DiGraph:
+    """
+    Collapses every chain of pages without branches (see return_list_of_chains) into one node, O(V+E); the edges
+    between the chains keep their attributes, the edges within a chain are dropped.
+    :param graph: nx.DiGraph with page uids as nodes, e.g. the routing graph or a flowchart graph without variable
+        names (not changed)
+    :param dict_of_page_variables: {page uid: list of varnames} or None: the nodes are labelled without variables
+    :return: new nx.DiGraph; node: first page uid of the chain, node attributes 'pages' (list of the page uids of the
+        chain), 'variables' (list of the varnames of these pages, in page order) and 'label' (for rendering)
+    """
+    tmp_graph = nx.DiGraph()
+    tmp_dict_of_chain_nodes = {}
+    for chain in return_list_of_chains(graph):
+        tmp_list_of_varnames = []
+        if dict_of_page_variables is not None:
+            # without duplicates, in order of their first occurrence
+            tmp_list_of_varnames = list(dict.fromkeys(varname for node in chain
+                                                      for varname in dict_of_page_variables.get(node, [])))
+        if len(chain) > 1:
+            tmp_label = str(chain[0]) + ' - ' + str(chain[-1]) + '\n(' + str(len(chain)) + ' pages)'
+        else:
+            tmp_label = str(chain[0])
+        if tmp_list_of_varnames:
+            tmp_label += '\n\n' + return_variables_label(tmp_list_of_varnames)
+        tmp_graph.add_node(chain[0], pages=list(chain), variables=tmp_list_of_varnames, label=tmp_label)
+        for node in chain:
+            tmp_dict_of_chain_nodes[node] = chain[0]
+    for u, v, data in graph.edges(data=True):
+        # all other edges end within a chain; an edge to the first page of its own chain becomes a self-loop
+        if tmp_dict_of_chain_nodes[v] == v:
+            tmp_graph.add_edge(tmp_dict_of_chain_nodes[u], v, **data)
+    return tmp_graph
+
+
+def return_dict_of_page_variables(questionnaire_object) -> dict:
+    """
+    :return: {page uid: list of the varnames of the page} for all pages
+    """
+    return {pagename: page.variables.list_all_vars() for pagename, page in questionnaire_object.pages.pages.items()}
+
+
+def return_dict_of_node_labels_with_variables(questionnaire_object) -> dict:
+    """
+    :return: {page uid: page uid followed by the variables of the page, three per line} for all pages with variables
+    """
+    mapping = {}
+    for pagename in questionnaire_object.pages.list_of_all_pagenames():
+        tmp_var_list = questionnaire_object.pages.pages[pagename].variables.list_all_vars()
+        if len(tmp_var_list) > 0:
+            mapping[pagename] = pagename + '\n\n' + return_variables_label(tmp_var_list)
+    return mapping
+
+
+@instrumentation.timed('build graph')
+def build_flowchart_graph(questionnaire_object, show_conditions=True, show_variable_names=True,
+                          bidirectional=False, compress_chains=False) -> nx.DiGraph:
+    """
+    :param questionnaire_object: questionnaire.Questionnaire
+    :param show_conditions: True: the edges are labelled with the (readable) conditions of their transitions
+    :param show_variable_names: True: the nodes are labelled with the page uid and the variables of the page
+    :param bidirectional: True: the edges are duplicated in opposing direction
+    :param compress_chains: True: chains of pages without branches are collapsed into one node (page uids as nodes,
+        the labels are node attributes), see build_compressed_graph
+    :return: new nx.DiGraph of the flowchart
+    """
+    if compress_chains:
+        tmp_graph = build_compressed_graph(
+            build_flowchart_graph(questionnaire_object, show_conditions=show_conditions, show_variable_names=False),
+            dict_of_page_variables=return_dict_of_page_variables(questionnaire_object) if show_variable_names else None)
+        if bidirectional:
+            return return_graph_with_reversed_edges(tmp_graph)
+        return tmp_graph
+
+    questionnaire_object.create_readable_conditions()
+    if show_variable_names:
+        tmp_node_labels = return_dict_of_node_labels_with_variables(questionnaire_object)
+    else:
+        tmp_node_labels = {}
+    tmp_graph = nx.DiGraph()
+
+    def add_edge(source_uid, target_uid, **attributes):
+        tmp_graph.add_edge(tmp_node_labels.get(source_uid, source_uid), tmp_node_labels.get(target_uid, target_uid),
+                           **attributes)
+
+    for page in questionnaire_object.pages.pages.values():
+        tmp_graph.add_node(tmp_node_labels.get(page.uid, page.uid))  # create nodes
+
+        cnt = 0
+        dict_transitions = {}
+        for transition in page.transitions.transitions.values():
+            if transition.condition is not None:
+                if transition.target in dict_transitions.keys():
+                    dict_transitions[transition.target] = dict_transitions[transition.target] + ' |\n(' + '[' + str(
+                        cnt) + '] ' + transition.condition_new + ']' + ')'
+                    if show_conditions:
+                        add_edge(page.uid, transition.target,
+                                 label='[' + str(cnt) + '] ' + dict_transitions[transition.target])
+                    else:
+                        add_edge(page.uid, transition.target)
+                else:
+                    dict_transitions[transition.target] = '(' + '[' + str(
+                        cnt) + '] ' + transition.condition_new + ')'
+
+                if show_conditions:
+                    add_edge(page.uid, transition.target, label=dict_transitions[transition.target])
+                else:
+                    add_edge(page.uid, transition.target)
+
+            else:  # if transition.condition is None
+                if transition.target in dict_transitions.keys():
+                    if show_conditions:
+                        add_edge(page.uid, transition.target, label='')
+                    else:
+                        add_edge(page.uid, transition.target)
+                else:
+                    if cnt == 0:
+                        if show_conditions:
+                            add_edge(page.uid, transition.target, label='')
+                        else:
+                            add_edge(page.uid, transition.target)
+                    if cnt != 0:
+                        if show_conditions:
+                            add_edge(page.uid, transition.target, label='[' + str(cnt) + ']')
+                        else:
+                            add_edge(page.uid, transition.target)
+            cnt = cnt + 1
+
+    if bidirectional:
+        return return_graph_with_reversed_edges(tmp_graph)
+    return tmp_graph
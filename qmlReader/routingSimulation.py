@@ -0,0 +1,319 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+# Monte Carlo simulation of the routing: answers are drawn from per-variable distributions, every simulated
+#  respondent is routed from the start page ("index") with first-match semantics (see batchRouting), and the
+#  page-reach and path-length counts are aggregated.
+#
+# The respondents are simulated in chunks of a fixed size; chunk i uses the i-th child of
+#  numpy.random.SeedSequence(seed), so the merged result depends on seed and chunk_size only, not on the number of
+#  worker processes.
+#
+# usage:
+#   simulation = routingSimulation.RoutingSimulation(q, answer_option_values=
+#                                                    routingSimulation.read_answer_option_values('questionnaire.xml'))
+#   simulation.set_distribution('var02', routingSimulation.ChoiceDistribution(['1', '2', '3'], weights=[1, 1, 2]))
+#   result = simulation.run(100000, seed=42, workers=4)
+#   result.return_dict_of_page_reach_probabilities()
+
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from lxml import etree
+from qmlReader import batchRouting, instrumentation
+from qmlReader.new_questionnaire_classes import VariableObject, VariableSimulation
+
+DEFAULT_START_PAGE = 'index'
+DEFAULT_END_PAGE = 'end'
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class ChoiceDistribution:
+    """
+    draws one of a list of values, e.g. the answer option values of a singleChoiceAnswerOption variable
+    """
+
+    def __init__(self, values, weights=None, missing_rate=0.0):
+        """
+        :param values: list of values
+        :param weights: list of relative weights of the values; None: all equal
+        :param missing_rate: probability of a missing value (None)
+        """
+        assert len(values) > 0
+        assert weights is None or len(weights) == len(values)
+        assert 0.0 <= missing_rate <= 1.0
+        self.values = list(values)
+        tmp_weights = np.ones(len(self.values)) if weights is None else np.asarray(weights, dtype=float)
+        assert (tmp_weights >= 0).all() and tmp_weights.sum() > 0
+        self.missing_rate = missing_rate
+        # probabilities of [missing] + values
+        self.probabilities = np.concatenate([[missing_rate], (1.0 - missing_rate) * tmp_weights / tmp_weights.sum()])
+
+    def draw(self, rng, size) -> batchRouting.FactorizedColumn:
+        """
+        :param rng: numpy.random.Generator
+        :param size: number of values
+        :return: batchRouting.FactorizedColumn of size values
+        """
+        return batchRouting.FactorizedColumn(rng.choice(len(self.probabilities), size=size, p=self.probabilities),
+                                             [None] + self.values)
+
+
+class BooleanDistribution(ChoiceDistribution):
+    def __init__(self, probability=0.5, missing_rate=0.0):
+        """
+        :param probability: probability of True
+        :param missing_rate: probability of a missing value (None)
+        """
+        assert 0.0 <= probability <= 1.0
+        super().__init__([True, False], weights=[probability, 1.0 - probability], missing_rate=missing_rate)
+
+
+class NumberDistribution:
+    """
+    draws numbers uniformly from [low, high] (integers) or [low, high) (floats)
+    """
+
+    def __init__(self, low=0, high=100, integer=True, missing_rate=0.0):
+        assert low <= high
+        assert 0.0 <= missing_rate <= 1.0
+        self.low = low
+        self.high = high
+        self.integer = integer
+        self.missing_rate = missing_rate
+
+    def draw(self, rng, size) -> batchRouting.FactorizedColumn:
+        tmp_missing = rng.random(size) < self.missing_rate
+        if self.integer:
+            tmp_codes = rng.integers(self.low, self.high, size=size, endpoint=True) - self.low + 1
+            tmp_uniques = [None] + list(range(self.low, self.high + 1))
+        else:
+            tmp_codes = np.arange(1, size + 1)
+            tmp_uniques = [None] + rng.uniform(self.low, self.high, size=size).tolist()
+        tmp_codes[tmp_missing] = 0
+        return batchRouting.FactorizedColumn(tmp_codes.astype(np.int64), tmp_uniques)
+
+
+def return_default_distribution(var_type, answer_option_values=None):
+    """
+    :param var_type: 'boolean', 'singleChoiceAnswerOption', 'number' or 'string'
+    :param answer_option_values: list of the answer option values of a singleChoiceAnswerOption variable
+    :return: distribution that is used if none has been set for a variable
+    """
+    if var_type == 'boolean':
+        return BooleanDistribution()
+    if var_type == 'singleChoiceAnswerOption':
+        if answer_option_values:
+            return ChoiceDistribution(answer_option_values, missing_rate=0.05)
+        # answer options unknown: missing only
+        return ChoiceDistribution([None])
+    if var_type == 'number':
+        return NumberDistribution(0, 100, missing_rate=0.05)
+    return ChoiceDistribution(['text'], missing_rate=0.5)
+
+
+def read_answer_option_values(file) -> dict:
+    """
+    :param file: path of the QML file
+    :return: {varname: list of the answer option values of its single choice questions}, in document order
+    """
+    tmp_dict_of_values = {}
+    for event, element in etree.iterparse(file, events=('end',), remove_comments=True):
+        if not isinstance(element.tag, str) or etree.QName(element).localname != 'responseDomain':
+            continue
+        tmp_varname = element.get('variable')
+        if tmp_varname is None:
+            continue
+        for answer_option in element.iter():
+            if isinstance(answer_option.tag, str) and etree.QName(answer_option).localname == 'answerOption' and \
+                    answer_option.get('value') is not None:
+                tmp_list_of_values = tmp_dict_of_values.setdefault(tmp_varname, [])
+                if answer_option.get('value') not in tmp_list_of_values:
+                    tmp_list_of_values.append(answer_option.get('value'))
+    return tmp_dict_of_values
+
+
+class SimulationResult:
+    """
+    aggregated counts of a simulation; results of several chunks are merged by adding the counts
+    """
+
+    def __init__(self, list_of_page_uids, end_page=DEFAULT_END_PAGE):
+        self.list_of_page_uids = list(list_of_page_uids)
+        self.end_page = end_page
+        self.respondent_count = 0
+        # numpy int64 array, number of respondents that reached the page, indexed by page ordinal
+        self.page_reach_counts = np.zeros(len(self.list_of_page_uids), dtype=np.int64)
+        # {number of pages on the path: number of respondents}
+        self.path_length_counts = {}
+        # {batchRouting.END_...: number of respondents}
+        self.end_reason_counts = {}
+        self.end_reached_count = 0
+
+    def add_routed_paths(self, routed_paths):
+        """
+        :param routed_paths: result of batchRouting.BatchRouter.return_routed_paths
+        """
+        tmp_page_ordinals = {uid: ordinal for ordinal, uid in enumerate(self.list_of_page_uids)}
+        tmp_path_counts = np.bincount(routed_paths['path_ids'], minlength=len(routed_paths['paths']))
+        self.respondent_count += int(tmp_path_counts.sum())
+        for path, count in zip(routed_paths['paths'], tmp_path_counts.tolist()):
+            if count == 0:
+                continue
+            # pages visited more than once (loops) are counted once per respondent
+            tmp_ordinals = np.unique([tmp_page_ordinals[uid] for uid in path])
+            self.page_reach_counts[tmp_ordinals] += count
+            self.path_length_counts[len(path)] = self.path_length_counts.get(len(path), 0) + count
+            if path[-1] == self.end_page:
+                self.end_reached_count += count
+        for reason, count in zip(*np.unique(routed_paths['end_reasons'], return_counts=True)):
+            self.end_reason_counts[int(reason)] = self.end_reason_counts.get(int(reason), 0) + int(count)
+
+    def merge(self, other):
+        """
+        adds the counts of other (a SimulationResult of the same questionnaire) to self
+        """
+        assert self.list_of_page_uids == other.list_of_page_uids
+        self.respondent_count += other.respondent_count
+        self.page_reach_counts += other.page_reach_counts
+        for length, count in other.path_length_counts.items():
+            self.path_length_counts[length] = self.path_length_counts.get(length, 0) + count
+        for reason, count in other.end_reason_counts.items():
+            self.end_reason_counts[reason] = self.end_reason_counts.get(reason, 0) + count
+        self.end_reached_count += other.end_reached_count
+        return self
+
+    def return_dict_of_page_reach_probabilities(self) -> dict:
+        """
+        :return: {page uid: share of the respondents that reached the page}, in page order
+        """
+        tmp_count = max(self.respondent_count, 1)
+        return {uid: count / tmp_count for uid, count in zip(self.list_of_page_uids, self.page_reach_counts.tolist())}
+
+    def return_dict_of_path_length_probabilities(self) -> dict:
+        """
+        :return: {number of pages on the path: share of the respondents}, sorted by length
+        """
+        tmp_count = max(self.respondent_count, 1)
+        return {length: self.path_length_counts[length] / tmp_count for length in sorted(self.path_length_counts)}
+
+    def return_mean_path_length(self) -> float:
+        if self.respondent_count == 0:
+            return 0.0
+        return sum(length * count for length, count in self.path_length_counts.items()) / self.respondent_count
+
+    def return_dict_of_results(self) -> dict:
+        """
+        :return: json serializable dict of the results
+        """
+        return {'respondent_count': self.respondent_count,
+                'end_reached_share': self.end_reached_count / max(self.respondent_count, 1),
+                'mean_path_length': self.return_mean_path_length(),
+                'page_reach_probabilities': self.return_dict_of_page_reach_probabilities(),
+                'path_length_probabilities': self.return_dict_of_path_length_probabilities(),
+                'end_reason_counts': {str(reason): count for reason, count in sorted(self.end_reason_counts.items())}}
+
+
+# simulation of the current worker process, set by _initialize_worker
+_worker_simulation = None
+
+
+def _initialize_worker(simulation):
+    global _worker_simulation
+    _worker_simulation = simulation
+
+
+def _simulate_chunk_in_worker(seed_sequence, respondent_count):
+    return _worker_simulation.simulate_chunk(seed_sequence, respondent_count)
+
+
+class RoutingSimulation:
+    def __init__(self, questionnaire_object, answer_option_values=None, start_page=None, end_page=DEFAULT_END_PAGE,
+                 max_steps=None):
+        """
+        :param questionnaire_object: questionnaire.Questionnaire
+        :param answer_option_values: {varname: list of answer option values}, see read_answer_option_values; used for
+            the default distributions of singleChoiceAnswerOption variables
+        :param start_page: uid of the first page; None: "index" if present, else the first page
+        :param end_page: uid of the last page
+        :param max_steps: maximum number of transitions per respondent; None: number of pages
+        """
+        self.logger = logging.getLogger('debug')
+        self.questionnaire = questionnaire_object
+        if start_page is None:
+            start_page = DEFAULT_START_PAGE if DEFAULT_START_PAGE in self.questionnaire.pages.pages else \
+                next(iter(self.questionnaire.pages.pages))
+        self.start_page = start_page
+        self.end_page = end_page
+        self.max_steps = max_steps
+        if answer_option_values is None:
+            answer_option_values = {}
+
+        self.variable_simulation = VariableSimulation()
+        for varname, variable in self.questionnaire.variables.variables.items():
+            self.variable_simulation.add_variable(VariableObject(varname, variable.vartype))
+            self.variable_simulation.set_distribution_by_name(
+                varname, return_default_distribution(variable.vartype, answer_option_values.get(varname)))
+
+    def set_distribution(self, varname, distribution):
+        """
+        :param distribution: ChoiceDistribution, BooleanDistribution, NumberDistribution or any object with a method
+            draw(rng, size) that returns a batchRouting.FactorizedColumn or a list of values
+        """
+        self.variable_simulation.set_distribution_by_name(varname, distribution)
+
+    def simulate_chunk(self, seed_sequence, respondent_count) -> SimulationResult:
+        """
+        :param seed_sequence: numpy.random.SeedSequence of the chunk
+        :param respondent_count: number of simulated respondents
+        :return: SimulationResult of the chunk
+        """
+        tmp_rng = np.random.default_rng(seed_sequence)
+        tmp_router = batchRouting.BatchRouter(self.questionnaire,
+                                              self.variable_simulation.draw_values(tmp_rng, respondent_count))
+        tmp_result = SimulationResult(self.questionnaire.pages.pages.keys(), end_page=self.end_page)
+        tmp_result.add_routed_paths(tmp_router.return_routed_paths(start_page=self.start_page,
+                                                                   max_steps=self.max_steps))
+        return tmp_result
+
+    @instrumentation.timed('simulation')
+    def run(self, respondent_count, seed=0, workers=1, chunk_size=DEFAULT_CHUNK_SIZE) -> SimulationResult:
+        """
+        :param respondent_count: number of simulated respondents
+        :param seed: seed of the numpy.random.SeedSequence; the chunks get independent child streams
+        :param workers: number of worker processes; None: os.cpu_count(); 1: simulate in this process
+        :param chunk_size: number of respondents per chunk; the result depends on seed and chunk_size only
+        :return: merged SimulationResult
+        """
+        assert isinstance(respondent_count, int) and respondent_count >= 0
+        assert isinstance(chunk_size, int) and chunk_size > 0
+        if workers is None:
+            workers = os.cpu_count() or 1
+        assert isinstance(workers, int) and workers > 0
+
+        tmp_chunk_count = math.ceil(respondent_count / chunk_size)
+        tmp_list_of_chunks = [(seed_sequence, min(chunk_size, respondent_count - i * chunk_size)) for i, seed_sequence
+                              in enumerate(np.random.SeedSequence(seed).spawn(tmp_chunk_count))]
+        workers = min(workers, max(tmp_chunk_count, 1))
+        if workers <= 1:
+            tmp_list_of_results = [self.simulate_chunk(seed_sequence, count) for seed_sequence, count in
+                                   tmp_list_of_chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                     initargs=(self,)) as executor:
+                tmp_list_of_futures = [executor.submit(_simulate_chunk_in_worker, seed_sequence, count) for
+                                       seed_sequence, count in tmp_list_of_chunks]
+                tmp_list_of_results = [future.result() for future in tmp_list_of_futures]
+
+        # merged in chunk order
+        tmp_result = SimulationResult(self.questionnaire.pages.pages.keys(), end_page=self.end_page)
+        for result in tmp_list_of_results:
+            tmp_result.merge(result)
+        self.logger.info('simulation: ' + str(respondent_count) + ' respondents in ' + str(tmp_chunk_count) +
+                         ' chunk(s) with ' + str(workers) + ' worker(s)')
+        return tmp_result
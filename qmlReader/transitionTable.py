@@ -0,0 +1,130 @@
+__author__ = "Christian Friedrich"
+__maintainer__ = "Christian Friedrich"
+__license__ = "MIT"
+__version__ = "0.1.0"
+__status__ = "Prototype"
+
+import numpy as np
+
+# sort keys that can be sorted on the columns; any other key is sorted on the Transition objects
+NUMERIC_SORT_KEYS = ['distance', 'index']
+UID_SORT_KEYS = ['source', 'target']
+
+
+class TransitionTable:
+    """
+    Column store of all transitions of a questionnaire, in page order and transition order (the order of
+    Questionnaire.return_list_of_all_transitions()). Row i of every column belongs to self.transitions[i].
+
+    Columns (numpy int64 arrays): source_ordinal, target_ordinal, index, distance, condition_id; condition_id is the
+    position of the condition string in self.conditions or -1 for transitions without condition.
+    """
+
+    def __init__(self, list_of_transitions, page_ordinals, version=None):
+        """
+        :param list_of_transitions: list of questionnaire.Transition objects
+        :param page_ordinals: {page uid: ordinal}, see QmlPages.page_ordinals
+        :param version: structure version the table has been built for
+        """
+        self.version = version
+        self.transitions = list(list_of_transitions)
+        self.conditions = []
+        tmp_condition_ids = {}
+        tmp_list_of_condition_ids = []
+        for transition in self.transitions:
+            if transition.condition is None:
+                tmp_list_of_condition_ids.append(-1)
+            else:
+                if transition.condition not in tmp_condition_ids:
+                    tmp_condition_ids[transition.condition] = len(self.conditions)
+                    self.conditions.append(transition.condition)
+                tmp_list_of_condition_ids.append(tmp_condition_ids[transition.condition])
+
+        self.source_ordinal = np.array([page_ordinals[transition.source] for transition in self.transitions],
+                                       dtype=np.int64)
+        self.target_ordinal = np.array([page_ordinals[transition.target] for transition in self.transitions],
+                                       dtype=np.int64)
+        self.index = np.array([transition.index for transition in self.transitions], dtype=np.int64)
+        self.distance = np.array([transition.distance for transition in self.transitions], dtype=np.int64)
+        self.condition_id = np.array(tmp_list_of_condition_ids, dtype=np.int64)
+        # {'source' / 'target': rank of the uid in lexicographic order}, built on first use
+        self.__uid_ranks = {}
+
+    def __len__(self):
+        return len(self.transitions)
+
+    def return_column(self, sort_key) -> np.ndarray:
+        """
+        :param sort_key: one of NUMERIC_SORT_KEYS or UID_SORT_KEYS
+        :return: numpy array whose order equals the order of the attribute sort_key of the transitions
+        """
+        if sort_key in NUMERIC_SORT_KEYS:
+            return getattr(self, sort_key)
+        if sort_key in UID_SORT_KEYS:
+            if sort_key not in self.__uid_ranks:
+                tmp_uids = np.array([getattr(transition, sort_key) for transition in self.transitions], dtype=str)
+                if len(tmp_uids) > 0:
+                    self.__uid_ranks[sort_key] = np.unique(tmp_uids, return_inverse=True)[1].astype(np.int64)
+                else:
+                    self.__uid_ranks[sort_key] = np.zeros(0, dtype=np.int64)
+            return self.__uid_ranks[sort_key]
+        raise KeyError('sort key "' + str(sort_key) + '" is not a column of the transition table')
+
+    def return_distance_mask(self, min_distance=None, max_distance=None) -> np.ndarray:
+        """
+        :return: boolean array, True where min_distance < distance < max_distance (None: no bound)
+        """
+        tmp_mask = np.ones(len(self), dtype=bool)
+        if min_distance is not None:
+            tmp_mask &= self.distance > min_distance
+        if max_distance is not None:
+            tmp_mask &= self.distance < max_distance
+        return tmp_mask
+
+    def return_list_of_transitions(self, min_distance=None, max_distance=0, max_count=None, sort=True,
+                                   sort_key='distance') -> list:
+        """
+        Same result as the former list implementation of Questionnaire.return_list_of_transitions: the transitions
+        are sorted (stable) by sort_key, cut to the first max_count, and only then filtered by distance.
+        """
+        if sort and sort_key is not None:
+            tmp_order = np.argsort(self.return_column(sort_key), kind='stable')
+        else:
+            tmp_order = np.arange(len(self))
+        if max_count is not None:
+            tmp_order = tmp_order[:max_count]
+        tmp_order = tmp_order[self.return_distance_mask(min_distance, max_distance)[tmp_order]]
+        return [self.transitions[i] for i in tmp_order.tolist()]
+
+    def return_list_of_top_k_transitions(self, k, sort_key='distance', largest=True) -> list:
+        """
+        :param k: number of transitions
+        :param sort_key: one of NUMERIC_SORT_KEYS or UID_SORT_KEYS
+        :param largest: True: the k largest values, False: the k smallest values
+        :return: list of the first k transitions of a stable sort by sort_key (descending if largest), in O(n + k log k)
+        """
+        assert isinstance(k, int) and k >= 0
+        tmp_values = self.return_column(sort_key)
+        if largest:
+            tmp_values = -tmp_values
+        if k >= len(self):
+            tmp_candidates = np.arange(len(self))
+        elif k == 0:
+            return []
+        else:
+            tmp_kth_value = np.partition(tmp_values, k - 1)[k - 1]
+            tmp_better = np.flatnonzero(tmp_values < tmp_kth_value)
+            # ties at the boundary are taken in table order, as a stable sort would do
+            tmp_ties = np.flatnonzero(tmp_values == tmp_kth_value)[:k - len(tmp_better)]
+            tmp_candidates = np.concatenate([tmp_better, tmp_ties])
+        tmp_order = tmp_candidates[np.lexsort((tmp_candidates, tmp_values[tmp_candidates]))]
+        return [self.transitions[i] for i in tmp_order.tolist()]
+
+    def return_distance_histogram(self, min_distance=None, max_distance=None) -> dict:
+        """
+        :return: {distance: number of transitions}, sorted by distance; only distances with
+            min_distance < distance < max_distance (None: no bound)
+        """
+        tmp_values, tmp_counts = np.unique(self.distance[self.return_distance_mask(min_distance, max_distance)],
+                                           return_counts=True)
+        return dict(zip(tmp_values.tolist(), tmp_counts.tolist()))
@@ -1,8 +1,7 @@
 import networkx as nx
 import pygraphviz
 import pathlib
-from collections import defaultdict
-import qmlReader.new_questionnaire_classes
+import qmlReader.routingGraph
 
 di_graph2 = nx.read_gml('/flowcharts/2021-01-30_10-40-51_questionnaire_nacaps.gml')
 
@@ -45,26 +44,11 @@ print(nx.is_strongly_connected(di_graph2))
 def look_for_bottleneck_nodes(di_graph_object, list_of_nodes_to_exclude=None):
     assert isinstance(di_graph_object, nx.DiGraph)
     assert isinstance(list_of_nodes_to_exclude, list) or list_of_nodes_to_exclude is None
-
-    di_graph_object_copy = di_graph_object.copy()
     assert nx.is_weakly_connected(di_graph_object)
 
-    tmp_list_of_bottleneck_nodes = []
-    if list_of_nodes_to_exclude is not None:
-        di_graph_object_copy = remove_list_of_nodes(di_graph_object_copy, list_of_nodes_to_exclude)
-    assert nx.is_weakly_connected(di_graph_object_copy)
-    for node in di_graph_object_copy.nodes:
-        tmp_di_graph_object_copy = di_graph_object_copy.copy()
-        tmp_di_graph_object_copy.remove_node(node)
-        if not nx.is_weakly_connected(tmp_di_graph_object_copy):
-            tmp_list_of_bottleneck_nodes.append(node)
-            # print(node)
-            # print(nx.is_strongly_connected(tmp_di_graph_object_copy))
-            # nx.is_strongly_connected(di_graph_object)
-            # tmp_list_connected_components = list(nx.connected_components(nx.to_undirected(di_graph_object)))
-            # print(len(tmp_list_connected_components))
-            # print(tmp_list_connected_components)
-    return tmp_list_of_bottleneck_nodes
+    # articulation points in route order, O(V+E) instead of one copy and connectivity check per node
+    return list(qmlReader.routingGraph.return_articulation_points(di_graph_object,
+                                                                  excluded_pages=list_of_nodes_to_exclude))
 
 
 # list_of_bottleneck_nodes = look_for_bottleneck_nodes(di_graph2, list_of_nodes_to_exclude=['cancel1', 'cancel2'])
@@ -72,49 +56,20 @@ def look_for_bottleneck_nodes(di_graph_object, list_of_nodes_to_exclude=None):
 
 def find_all_nodes_inbetween(di_graph_object, source, target):
     assert isinstance(di_graph_object, nx.DiGraph)
-    di_graph_object_copy = di_graph_object.copy()
-
     assert isinstance(source, str)
     assert isinstance(target, str)
-    assert source in di_graph_object_copy.nodes
-    assert target in di_graph_object_copy.nodes
-    tmp_list_of_nodes = []
-    counter = 0
-    for path in nx.all_simple_paths(G=di_graph_object_copy, source=source,
-                                    target=target):
-        for node in path:
-            if node not in tmp_list_of_nodes:
-                tmp_list_of_nodes.append(node)
-        counter += 1
-        if counter % 10000 == 0:
-            print(f'[{source}]-[{target}], path nr. {counter}')
-    return tmp_list_of_nodes
+    assert source in di_graph_object.nodes
+    assert target in di_graph_object.nodes
+    # forward reachability from source intersected with backward reachability from target, instead of all simple paths
+    return list(qmlReader.routingGraph.return_pages_between(di_graph_object, source=source, target=target))
 
 
 def find_all_subgraphs(di_graph_object, list_of_nodes_to_exclude=None):
     assert isinstance(di_graph_object, nx.DiGraph)
-    di_graph_object_copy = di_graph_object.copy()
-    tmp_di_graph_object = remove_list_of_nodes(di_graph_object_copy, list_of_nodes_to_exclude)
-    tmp_list_of_bottleneck_nodes = look_for_bottleneck_nodes(tmp_di_graph_object)
-
-    tmp_list_of_subgraph_node_pairs = []
-
-    tmp_subgraph_dict = {}
-    tmp_subgraph_dict['graph'] = nx.DiGraph()
-    tmp_subgraph_dict['condition'] = qmlReader.new_questionnaire_classes.ConditionObject(condition_string=True)
-    subgraph_dict = defaultdict(tmp_subgraph_dict)
-
-    for i in range(len(tmp_list_of_bottleneck_nodes) - 1):
-        tmp_list_of_subgraph_node_pairs.append((tmp_list_of_bottleneck_nodes[i], tmp_list_of_bottleneck_nodes[i + 1]))
-        subgraph_dict.append()
+    # sections between the pages every route passes, see qmlReader.routingGraph.return_sections
     tmp_subgraph_nodes_dict = {}
-    for node in tmp_list_of_bottleneck_nodes:
-        di_graph_object_copy = remove_all_edges_connecting_to_node(di_graph_object_copy, node=node)
-    for node_pair in tmp_list_of_subgraph_node_pairs:
-        tmp_di_graph_object_copy = di_graph_object_copy.copy()
-        # tmp_subgraph_nodes_dict[node_pair] = find_all_nodes_inbetween(di_graph_object=tmp_di_graph_object, source=node_pair[0], target=node_pair[1])
-        tmp_subgraph_nodes_dict[node_pair] = nx.node_connected_component(nx.to_undirected(tmp_di_graph_object_copy),
-                                                                         node_pair[0])
+    for section in qmlReader.routingGraph.return_sections(di_graph_object, excluded_pages=list_of_nodes_to_exclude):
+        tmp_subgraph_nodes_dict[(section.entry, section.exit)] = set(section.pages)
     return tmp_subgraph_nodes_dict
 
 
@@ -3,7 +3,8 @@ from setuptools import setup
 setup(
     name='QmlReaderTools',
     version='1.0.14',
-    packages=['gui', 'tests', 'codebook', 'pdfOutput', 'qmlReader', 'screenshotter', 'advancedFlowchart'],
+    packages=['gui', 'tests', 'codebook', 'pdfOutput', 'qmlReader', 'screenshotter', 'advancedFlowchart',
+              'benchmark'],
     url='',
     license='',
     author='christian-fr',
@@ -13,6 +14,7 @@ setup(
         'lxmL>=4.5.0',
         'Pillow>=7.0.0',
         'networkx>=2.6.3',
+        'numpy>=1.20',
         'pygraphviz>=1.7'
     ]
 )
@@ -8,3 +8,5 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # # from .context import sample
 
+
+DATA_QML_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data_qml'))
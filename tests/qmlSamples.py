@@ -0,0 +1,57 @@
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+from .context import DATA_QML_DIR
+from qmlReader import qmlReader
+
+ZOFAR_NAMESPACE = 'http://www.his.de/zofar/xml/questionnaire'
+
+
+def return_qml_string(list_of_pages, dict_of_variables=None, title='Test questionnaire') -> str:
+    """
+    :param list_of_pages: list of tuples (page uid, list of tuples (target uid, condition or None)[, list of the
+        varnames that are asked on the page])
+    :param dict_of_variables: {varname: vartype} of the declared variables
+    :param title: title of the questionnaire
+    :return: QML document
+    """
+    tmp_list = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+                '<zofar:questionnaire xmlns:zofar="' + ZOFAR_NAMESPACE + '" language="de">\n',
+                '<zofar:name>' + escape(title) + '</zofar:name>\n', '<zofar:variables>\n']
+    for varname, vartype in (dict_of_variables or {}).items():
+        tmp_list.append('<zofar:variable name=' + quoteattr(varname) + ' type=' + quoteattr(vartype) + '/>\n')
+    tmp_list.append('</zofar:variables>\n')
+    for page in list_of_pages:
+        tmp_uid, tmp_list_of_transitions = page[0], page[1]
+        tmp_list_of_varnames = page[2] if len(page) > 2 else []
+        tmp_list.append('<zofar:page uid=' + quoteattr(tmp_uid) + '><zofar:header><zofar:title uid="t">' +
+                        escape(tmp_uid) + '</zofar:title></zofar:header><zofar:body uid="b">')
+        for index, varname in enumerate(tmp_list_of_varnames):
+            tmp_list.append('<zofar:questionOpen uid=' + quoteattr('q' + str(index)) + ' variable=' +
+                            quoteattr(varname) + '/>')
+        tmp_list.append('</zofar:body>')
+        if tmp_list_of_transitions:
+            tmp_list.append('<zofar:transitions>')
+            for target, condition in tmp_list_of_transitions:
+                tmp_list.append('<zofar:transition target=' + quoteattr(target) + (
+                    '' if condition is None else ' condition=' + quoteattr(condition)) + '/>')
+            tmp_list.append('</zofar:transitions>')
+        tmp_list.append('</zofar:page>\n')
+    tmp_list.append('</zofar:questionnaire>\n')
+    return ''.join(tmp_list)
+
+
+def read_questionnaire(directory, filename, list_of_pages, dict_of_variables=None, title='Test questionnaire'):
+    """
+    writes the QML document (see return_qml_string) to directory/filename and reads it
+    :return: questionnaire.Questionnaire
+    """
+    tmp_file = os.path.join(directory, filename)
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(return_qml_string(list_of_pages, dict_of_variables, title))
+    return qmlReader.QmlReader(tmp_file).questionnaire
+
+
+def return_list_of_data_qml_files() -> list:
+    return [os.path.join(DATA_QML_DIR, filename) for filename in sorted(os.listdir(DATA_QML_DIR)) if
+            filename.endswith('.xml')]
@@ -0,0 +1,183 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from . import qmlSamples
+from qmlReader import batchRouting, qmlReader, questionnaire
+from qmlReader.conditionCompiler import compile_condition
+from benchmark import qmlGenerator
+
+ROW_COUNT = 300
+
+# values per vartype, including missing (None), empty and non-numeric values
+VALUE_POOLS = {'boolean': ['true', 'false', None, ''],
+               'number': ['1', '2', '3', '10', '2.5', 'x', None, ''],
+               'singleChoiceAnswerOption': ['1', '2', '3', '4', '5', '-97', None, ''],
+               'string': ['a', '3', 'true', None, '']}
+
+
+def return_dict_of_random_columns(questionnaire_object, seed, row_count=ROW_COUNT) -> dict:
+    tmp_random = random.Random(seed)
+    return {varname: [tmp_random.choice(VALUE_POOLS[variable.vartype]) for i in range(row_count)] for
+            varname, variable in questionnaire_object.variables.variables.items()}
+
+
+def return_row(columns, row) -> dict:
+    # factorize() treats empty strings as missing
+    return {varname: (None if values[row] == '' else values[row]) for varname, values in columns.items()}
+
+
+def return_first_matching_transition(page, values) -> int:
+    """
+    scalar reference: position of the first transition of the page whose compiled condition is True for values
+    """
+    for position, transition in enumerate(page.transitions.transitions.values()):
+        if transition.condition is None or compile_condition(transition.condition)(values):
+            return position
+    return batchRouting.NO_MATCH
+
+
+def return_routed_path(questionnaire_object, values, start_page, max_steps) -> tuple:
+    """
+    scalar reference of BatchRouter.return_routed_paths for one row
+    :return: tuple (path as tuple of page uids, end reason)
+    """
+    tmp_pages = questionnaire_object.pages.pages
+    tmp_path = [start_page]
+    for step in range(max_steps + 1):
+        tmp_page = tmp_pages[tmp_path[-1]]
+        if not tmp_page.transitions.transitions:
+            return tuple(tmp_path), batchRouting.END_NO_TRANSITIONS
+        tmp_position = return_first_matching_transition(tmp_page, values)
+        if tmp_position == batchRouting.NO_MATCH:
+            return tuple(tmp_path), batchRouting.END_NO_MATCH
+        if step == max_steps:
+            break
+        tmp_path.append(list(tmp_page.transitions.transitions.values())[tmp_position].target)
+    return tuple(tmp_path), batchRouting.END_STEP_LIMIT
+
+
+class TestBatchRouter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assert_equals_scalar_evaluation(self, questionnaire_object, columns, start_page=None, max_steps=None):
+        tmp_router = batchRouting.BatchRouter(questionnaire_object, columns)
+        tmp_list_of_rows = [return_row(columns, row) for row in range(ROW_COUNT)]
+
+        tmp_first_matches = tmp_router.return_dict_of_first_matching_transitions()
+        for page_uid, page in questionnaire_object.pages.pages.items():
+            self.assertEqual(tmp_first_matches[page_uid].tolist(),
+                             [return_first_matching_transition(page, values) for values in tmp_list_of_rows],
+                             page_uid)
+
+        if start_page is None:
+            start_page = next(iter(questionnaire_object.pages.pages))
+        if max_steps is None:
+            max_steps = len(questionnaire_object.pages.pages)
+        tmp_routed_paths = tmp_router.return_routed_paths(start_page=start_page, max_steps=max_steps)
+        tmp_dict_of_frequencies = {}
+        for row, values in enumerate(tmp_list_of_rows):
+            tmp_path, tmp_end_reason = return_routed_path(questionnaire_object, values, start_page, max_steps)
+            self.assertEqual(tmp_routed_paths['paths'][tmp_routed_paths['path_ids'][row]], tmp_path, row)
+            self.assertEqual(tmp_routed_paths['end_reasons'][row], tmp_end_reason, row)
+            for edge in zip(tmp_path[:-1], tmp_path[1:]):
+                tmp_dict_of_frequencies[edge] = tmp_dict_of_frequencies.get(edge, 0) + 1
+        self.assertEqual(len(set(tmp_routed_paths['paths'])), len(tmp_routed_paths['paths']))
+        self.assertEqual(batchRouting.return_dict_of_transition_frequencies(tmp_routed_paths),
+                         tmp_dict_of_frequencies)
+        return tmp_routed_paths
+
+    def test_data_qml(self):
+        for file in qmlSamples.return_list_of_data_qml_files():
+            tmp_questionnaire = qmlReader.QmlReader(file).questionnaire
+            with self.subTest(file=file):
+                self.assert_equals_scalar_evaluation(tmp_questionnaire,
+                                                     return_dict_of_random_columns(tmp_questionnaire, seed=1))
+
+    def test_generated(self):
+        for condition_complexity in [1, 2, 3]:
+            tmp_generator = qmlGenerator.QmlGenerator(page_count=80, branching_factor=3,
+                                                      condition_complexity=condition_complexity,
+                                                      back_jump_rate=0.2, seed=condition_complexity)
+            tmp_file = os.path.join(self.tmp_dir, 'generated.xml')
+            tmp_generator.write(tmp_file)
+            tmp_questionnaire = qmlReader.QmlReader(tmp_file).questionnaire
+            with self.subTest(condition_complexity=condition_complexity):
+                self.assert_equals_scalar_evaluation(
+                    tmp_questionnaire, return_dict_of_random_columns(tmp_questionnaire, seed=condition_complexity))
+
+    def test_end_reasons(self):
+        # A: loop A -> B -> A while x is 1; B: no match if x is 2 or missing; C: no transitions
+        tmp_questionnaire = qmlSamples.read_questionnaire(
+            self.tmp_dir, 'end_reasons.xml',
+            [('A', [('B', None)]),
+             ('B', [('A', 'zofar.asNumber(x) == 1'), ('C', 'zofar.asNumber(x) gt 2')]),
+             ('C', [])],
+            {'x': 'number'})
+        tmp_routed_paths = self.assert_equals_scalar_evaluation(tmp_questionnaire,
+                                                                return_dict_of_random_columns(tmp_questionnaire, 5),
+                                                                max_steps=7)
+        self.assertEqual(set(tmp_routed_paths['end_reasons'].tolist()),
+                         {batchRouting.END_NO_TRANSITIONS, batchRouting.END_NO_MATCH, batchRouting.END_STEP_LIMIT})
+
+    def test_missing_column(self):
+        tmp_questionnaire = qmlSamples.read_questionnaire(
+            self.tmp_dir, 'missing_column.xml',
+            [('A', [('B', 'zofar.isMissing(x)'), ('C', None)]), ('B', []), ('C', [])], {'x': 'string'})
+        tmp_routed_paths = batchRouting.BatchRouter(tmp_questionnaire, {'y': ['a'] * 4}).return_routed_paths()
+        self.assertEqual([tmp_routed_paths['paths'][path_id] for path_id in tmp_routed_paths['path_ids']],
+                         [('A', 'B')] * 4)
+
+    def test_columns_of_different_length(self):
+        with self.assertRaises(ValueError):
+            batchRouting.BatchRouter(qmlReader.QmlReader(qmlSamples.return_list_of_data_qml_files()[0]).questionnaire,
+                                     {'a': [1, 2], 'b': [1]})
+
+    def test_empty_questionnaire(self):
+        tmp_routed_paths = batchRouting.BatchRouter(questionnaire.Questionnaire(), {'x': [1, 2]}).return_routed_paths()
+        self.assertEqual(tmp_routed_paths['paths'], [()])
+        self.assertEqual(tmp_routed_paths['path_ids'].tolist(), [0, 0])
+        self.assertEqual(tmp_routed_paths['end_reasons'].tolist(), [batchRouting.END_NO_TRANSITIONS] * 2)
+        self.assertEqual(batchRouting.return_dict_of_transition_frequencies(tmp_routed_paths), {})
+        self.assertEqual(batchRouting.BatchRouter(questionnaire.Questionnaire(), {}).return_routed_paths()['paths'],
+                         [()])
+
+
+class TestFactorize(unittest.TestCase):
+    def test_missing_values_share_code_0(self):
+        tmp_values = [None, float('nan'), 'a', '', np.float64('nan'), 1, float('nan'), 'a', None, 1.0, np.nan]
+        tmp_column = batchRouting.factorize(tmp_values)
+        self.assertEqual(tmp_column.uniques, [None, 'a', 1])
+        self.assertEqual(tmp_column.codes.tolist(), [0, 0, 1, 0, 0, 2, 0, 1, 0, 2, 0])
+        self.assertEqual(tmp_column.return_list_of_values(), [None, None, 'a', None, None, 1, None, 'a', None, 1,
+                                                              None])
+
+    def test_iterables(self):
+        tmp_values = ['1', '', '2', None, '1']
+        tmp_column = batchRouting.factorize(tmp_values)
+        for values in [iter(tmp_values), (value for value in tmp_values), tuple(tmp_values)]:
+            with self.subTest(values=type(values).__name__):
+                tmp_other_column = batchRouting.factorize(values)
+                self.assertEqual(tmp_other_column.codes.tolist(), tmp_column.codes.tolist())
+                self.assertEqual(tmp_other_column.uniques, tmp_column.uniques)
+        self.assertEqual(len(batchRouting.factorize(iter([]))), 0)
+
+    def test_router_with_iterators(self):
+        tmp_questionnaire = qmlReader.QmlReader(qmlSamples.return_list_of_data_qml_files()[0]).questionnaire
+        tmp_columns = return_dict_of_random_columns(tmp_questionnaire, seed=3)
+        tmp_expected = batchRouting.BatchRouter(tmp_questionnaire, tmp_columns).return_routed_paths()
+        tmp_routed_paths = batchRouting.BatchRouter(
+            tmp_questionnaire, {varname: iter(values) for varname, values in tmp_columns.items()}).return_routed_paths()
+        self.assertEqual(tmp_routed_paths['paths'], tmp_expected['paths'])
+        self.assertEqual(tmp_routed_paths['path_ids'].tolist(), tmp_expected['path_ids'].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
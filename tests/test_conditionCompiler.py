@@ -0,0 +1,154 @@
+import pickle
+import unittest
+
+from . import context
+from qmlReader import conditionCompiler
+from qmlReader.conditionCompiler import ConditionNode, ConditionSyntaxError, compile_condition, parse_condition
+
+
+def evaluate(condition_string, **values) -> bool:
+    return compile_condition(condition_string)(values)
+
+
+class TestOperators(unittest.TestCase):
+    def test_variable_value(self):
+        self.assertTrue(evaluate('var01.value', var01='true'))
+        self.assertTrue(evaluate('var01.value', var01=True))
+        self.assertFalse(evaluate('var01.value', var01='false'))
+        self.assertFalse(evaluate('var01.value', var01=None))
+        # the bare varname is the same as varname.value
+        self.assertTrue(evaluate('var01', var01=' TRUE '))
+
+    def test_as_number(self):
+        self.assertTrue(evaluate('zofar.asNumber(var02) == 3', var02='3'))
+        self.assertTrue(evaluate('zofar.asNumber(var02) == 3', var02='3.0'))
+        self.assertTrue(evaluate('zofar.asNumber(var02) == 2.5', var02=2.5))
+        self.assertFalse(evaluate('zofar.asNumber(var02) == 3', var02='4'))
+        self.assertEqual(conditionCompiler.to_number('abc'), None)
+        self.assertEqual(conditionCompiler.to_number(True), 1)
+
+    def test_is_missing(self):
+        self.assertTrue(evaluate('zofar.isMissing(var02)'))
+        self.assertTrue(evaluate('zofar.isMissing(var02)', var02=None))
+        self.assertTrue(evaluate('zofar.isMissing(var02)', var02='  '))
+        self.assertFalse(evaluate('zofar.isMissing(var02)', var02='0'))
+        self.assertFalse(evaluate('zofar.isMissing(var02)', var02=0))
+
+    def test_logical_operators(self):
+        for and_operator, or_operator, not_operator in [('and', 'or', '!'), ('&&', '||', 'not ')]:
+            tmp_condition = 'a.value ' + and_operator + ' (b.value ' + or_operator + ' ' + not_operator + 'c.value)'
+            for a in [True, False]:
+                for b in [True, False]:
+                    for c in [True, False]:
+                        with self.subTest(condition=tmp_condition, a=a, b=b, c=c):
+                            self.assertEqual(evaluate(tmp_condition, a=a, b=b, c=c), a and (b or not c))
+
+    def test_and_binds_tighter_than_or(self):
+        self.assertTrue(evaluate('a.value or b.value and c.value', a=True, b=False, c=False))
+        self.assertFalse(evaluate('(a.value or b.value) and c.value', a=True, b=False, c=False))
+
+    def test_order_operators(self):
+        for operators, function in [(['lt', '<'], lambda x: x < 3), (['gt', '>'], lambda x: x > 3),
+                                    (['le', '<='], lambda x: x <= 3), (['ge', '>='], lambda x: x >= 3)]:
+            for operator in operators:
+                for value in [2, 3, 4, '2', '3.5']:
+                    with self.subTest(operator=operator, value=value):
+                        self.assertEqual(evaluate('zofar.asNumber(x) ' + operator + ' 3', x=value),
+                                         function(float(value)))
+
+    def test_equality_operators(self):
+        for operator, expected in [('==', True), ('eq', True), ('!=', False), ('ne', False)]:
+            with self.subTest(operator=operator):
+                self.assertEqual(evaluate('x.value ' + operator + ' 1', x='1'), expected)
+                self.assertEqual(evaluate('x.value ' + operator + " 'abc'", x='abc'), expected)
+                self.assertEqual(evaluate('x.value ' + operator + ' true', x='true'), expected)
+                self.assertEqual(evaluate('x.value ' + operator + ' null', x=None), expected)
+                self.assertEqual(evaluate('x.value ' + operator + ' 2', x='1'), not expected)
+
+    def test_not_binds_tighter_than_comparisons(self):
+        tmp_variable = ConditionNode('variable', 'a', ())
+        tmp_constant = ConditionNode('constant', 1, ())
+        self.assertEqual(parse_condition('!a.value == 1'),
+                         ConditionNode('compare', 'eq', (ConditionNode('not', None, (tmp_variable,)), tmp_constant)))
+        self.assertEqual(parse_condition('!(a.value == 1)'),
+                         ConditionNode('not', None, (ConditionNode('compare', 'eq', (tmp_variable, tmp_constant)),)))
+        # "1" is no boolean true, so (!a.value) is True, which equals 1; the negated comparison is False
+        self.assertTrue(evaluate('!a.value == 1', a='1'))
+        self.assertFalse(evaluate('!(a.value == 1)', a='1'))
+        self.assertTrue(evaluate('!zofar.isMissing(a) and !b.value', a='x', b='false'))
+
+
+class TestMissingValues(unittest.TestCase):
+    def test_order_comparison_with_missing_value_is_false(self):
+        for operator in ['<', '>', '<=', '>=']:
+            with self.subTest(operator=operator):
+                self.assertFalse(evaluate('zofar.asNumber(x) ' + operator + ' 3'))
+                self.assertFalse(evaluate('zofar.asNumber(x) ' + operator + ' 3', x='abc'))
+
+    def test_equality_with_missing_value(self):
+        self.assertFalse(evaluate('zofar.asNumber(x) == 3'))
+        self.assertTrue(evaluate('zofar.asNumber(x) != 3'))
+        self.assertTrue(evaluate('x.value == null'))
+        self.assertFalse(evaluate("x.value == ''"))
+
+    def test_missing_variable_is_false(self):
+        self.assertFalse(evaluate('x.value'))
+        self.assertTrue(evaluate('!x.value'))
+
+
+class TestSyntaxErrors(unittest.TestCase):
+    def test_syntax_errors(self):
+        for condition_string in ['', '   ', 'a.value ==', '(a.value', 'a.value)', 'a.value and', 'and a.value',
+                                 'a.value $ b.value', 'zofar.unknown(a)', 'zofar.asNumber(a', 'a.label',
+                                 'a.value b.value', '== 1']:
+            with self.subTest(condition=condition_string):
+                with self.assertRaises(ConditionSyntaxError):
+                    compile_condition(condition_string)
+
+    def test_syntax_error_is_value_error(self):
+        with self.assertRaises(ValueError):
+            parse_condition('a.value ==')
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        conditionCompiler.clear_cache()
+
+    def tearDown(self):
+        conditionCompiler.clear_cache()
+
+    def test_normalized_strings_share_one_compiled_condition(self):
+        tmp_compiled_condition = compile_condition('zofar.asNumber(var02)==3 and !var01.value')
+        self.assertEqual(tmp_compiled_condition.condition, 'zofar . asNumber ( var02 ) == 3 and ! var01 . value')
+        self.assertIs(compile_condition('  zofar.asNumber( var02 ) == 3  and ! var01.value'), tmp_compiled_condition)
+        self.assertIs(compile_condition(tmp_compiled_condition.condition), tmp_compiled_condition)
+        self.assertEqual(len(conditionCompiler._compiled_conditions), 1)
+        self.assertEqual(len(conditionCompiler._compiled_conditions_by_raw_string), 3)
+        self.assertEqual(tmp_compiled_condition.varnames, frozenset(['var01', 'var02']))
+
+    def test_clear_cache(self):
+        tmp_compiled_condition = compile_condition('a.value')
+        conditionCompiler.clear_cache()
+        self.assertIsNot(compile_condition('a.value'), tmp_compiled_condition)
+
+
+class TestPickle(unittest.TestCase):
+    def test_reduce(self):
+        tmp_compiled_condition = compile_condition('zofar.asNumber(x) >= 2 or zofar.isMissing(y)')
+        self.assertEqual(tmp_compiled_condition.__reduce__(),
+                         (compile_condition, (tmp_compiled_condition.condition,)))
+        # within the same process the unpickled condition is the cached object
+        self.assertIs(pickle.loads(pickle.dumps(tmp_compiled_condition)), tmp_compiled_condition)
+
+    def test_unpickle_compiles_again(self):
+        tmp_pickle = pickle.dumps(compile_condition('zofar.asNumber(x) >= 2 or zofar.isMissing(y)'))
+        conditionCompiler.clear_cache()
+        tmp_compiled_condition = pickle.loads(tmp_pickle)
+        self.assertIs(tmp_compiled_condition, compile_condition('zofar.asNumber(x)>=2 or zofar.isMissing(y)'))
+        self.assertTrue(tmp_compiled_condition({'x': '3', 'y': 'a'}))
+        self.assertFalse(tmp_compiled_condition({'x': '1', 'y': 'a'}))
+        self.assertTrue(tmp_compiled_condition({'x': '1'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
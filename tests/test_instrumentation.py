@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from lxml import etree
+
+from . import qmlSamples
+from qmlReader import instrumentation, qmlReader
+
+
+class FakeClock:
+    """
+    replacement of time.perf_counter that advances by one second per call
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        tmp_patcher = mock.patch.object(instrumentation.time, 'perf_counter', self.clock)
+        tmp_patcher.start()
+        self.addCleanup(tmp_patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_disabled_is_a_no_op(self):
+        tmp_instrumentation = instrumentation.Instrumentation()
+        tmp_now = self.clock.now
+        with tmp_instrumentation.phase('parse') as tmp_phase:
+            tmp_instrumentation.count('pages')
+        self.assertIs(tmp_phase, instrumentation._NULL_PHASE)
+        # the clock is not read
+        self.assertEqual(self.clock.now, tmp_now)
+        self.assertEqual(tmp_instrumentation.return_dict_of_results(), {'phases': {}, 'counters': {}})
+
+    def test_phases_and_counters(self):
+        tmp_instrumentation = instrumentation.Instrumentation(enabled=True)
+        # clock: outer phase 1 -> 6, inner phases 2 -> 3 and 4 -> 5
+        with tmp_instrumentation.phase('outer'):
+            for i in range(2):
+                with tmp_instrumentation.phase('inner'):
+                    tmp_instrumentation.count('pages')
+        tmp_instrumentation.count('transitions', 5)
+        self.assertEqual(tmp_instrumentation.return_dict_of_results(),
+                         {'phases': {'inner': {'seconds': 2.0, 'calls': 2}, 'outer': {'seconds': 5.0, 'calls': 1}},
+                          'counters': {'pages': 2, 'transitions': 5}})
+        # the phase is measured even if it raises
+        with self.assertRaises(ValueError):
+            with tmp_instrumentation.phase('failing'):
+                raise ValueError()
+        self.assertEqual(tmp_instrumentation.return_dict_of_results()['phases']['failing'], {'seconds': 1.0,
+                                                                                             'calls': 1})
+        tmp_instrumentation.reset()
+        self.assertEqual(tmp_instrumentation.return_dict_of_results(), {'phases': {}, 'counters': {}})
+
+    def test_json(self):
+        tmp_instrumentation = instrumentation.Instrumentation(enabled=True)
+        with tmp_instrumentation.phase('parse'):
+            tmp_instrumentation.count('pages', 3)
+        tmp_file = os.path.join(self.tmp_dir, 'instrumentation.json')
+        tmp_instrumentation.write_json(tmp_file)
+        with open(tmp_file) as f:
+            self.assertEqual(json.load(f), {'phases': {'parse': {'seconds': 1.0, 'calls': 1}},
+                                            'counters': {'pages': 3}})
+
+    def test_trace_events(self):
+        tmp_file = os.path.join(self.tmp_dir, 'trace.json')
+        for trace in [True, False]:
+            with self.subTest(trace=trace):
+                self.clock.now = 0.0
+                # start time 1
+                tmp_instrumentation = instrumentation.Instrumentation(enabled=True, trace=trace)
+                # parse 2 -> 3, draw 4 -> 6 (with the inner count), parse 7 -> 8
+                with tmp_instrumentation.phase('parse'):
+                    pass
+                with tmp_instrumentation.phase('draw'):
+                    self.clock()
+                with tmp_instrumentation.phase('parse'):
+                    tmp_instrumentation.count('pages', 2)
+                tmp_instrumentation.write_trace_events(tmp_file)
+                with open(tmp_file) as f:
+                    tmp_list_of_events = json.load(f)['traceEvents']
+                tmp_list_of_phase_events = [(event['name'], event['ts'], event['dur']) for event in
+                                            tmp_list_of_events if event['ph'] == 'X']
+                if trace:
+                    self.assertEqual(tmp_list_of_phase_events, [('parse', 1e6, 1e6), ('draw', 3e6, 2e6),
+                                                                ('parse', 6e6, 1e6)])
+                else:
+                    # one event per phase with its cumulative duration, one after the other
+                    self.assertEqual(tmp_list_of_phase_events, [('parse', 0.0, 2e6), ('draw', 2e6, 2e6)])
+                self.assertEqual([(event['name'], event['args']) for event in tmp_list_of_events if
+                                  event['ph'] == 'C'], [('pages', {'pages': 2})])
+
+    def test_timed(self):
+        instrumentation.reset()
+        instrumentation.enable()
+        self.addCleanup(instrumentation.disable)
+        self.addCleanup(instrumentation.reset)
+
+        @instrumentation.timed('draw')
+        def draw(value):
+            return value * 2
+
+        self.assertEqual(draw(2), 4)
+        self.assertEqual(draw.__name__, 'draw')
+        self.assertEqual(instrumentation.return_dict_of_results()['phases'], {'draw': {'seconds': 1.0, 'calls': 1}})
+
+    def test_reader_counters(self):
+        instrumentation.reset()
+        instrumentation.enable()
+        self.addCleanup(instrumentation.disable)
+        self.addCleanup(instrumentation.reset)
+        for file in qmlSamples.return_list_of_data_qml_files():
+            with self.subTest(file=file):
+                instrumentation.reset()
+                qmlReader.QmlReader(file)
+                tmp_root = etree.parse(file).getroot()
+                tmp_results = instrumentation.return_dict_of_results()
+                self.assertEqual(tmp_results['counters'], {
+                    'declared variables': len(tmp_root.findall('{*}variables/{*}variable')),
+                    'pages visited': len(tmp_root.findall('{*}page')),
+                    'transitions': len(tmp_root.findall('{*}page/{*}transitions/{*}transition'))})
+                self.assertLessEqual({'read file', 'parse', 'extract pages', 'extract transitions',
+                                      'extract variables'}, set(tmp_results['phases']))
+                self.assertEqual(tmp_results['phases']['parse']['calls'], 1)
+                self.assertEqual(tmp_results['phases']['extract pages']['calls'],
+                                 len(tmp_root.findall('{*}page')))
+
+    def test_debug_logger_gets_one_handler_per_file(self):
+        tmp_logger_name = 'test_instrumentation'
+        tmp_logger = logging.getLogger(tmp_logger_name)
+        tmp_log_file = os.path.join(self.tmp_dir, 'test.log')
+        try:
+            for i in range(3):
+                self.assertIs(instrumentation.setup_debug_logger(tmp_log_file, logger_name=tmp_logger_name),
+                              tmp_logger)
+            # the same file by a relative path
+            tmp_cwd = os.getcwd()
+            os.chdir(self.tmp_dir)
+            try:
+                instrumentation.setup_debug_logger('test.log', logger_name=tmp_logger_name)
+            finally:
+                os.chdir(tmp_cwd)
+            self.assertEqual(len(tmp_logger.handlers), 1)
+            instrumentation.setup_debug_logger(os.path.join(self.tmp_dir, 'other.log'), logger_name=tmp_logger_name)
+            self.assertEqual(len(tmp_logger.handlers), 2)
+        finally:
+            for handler in list(tmp_logger.handlers):
+                handler.close()
+                tmp_logger.removeHandler(handler)
+            for key in [key for key in instrumentation._dict_of_log_file_handlers if key[0] == tmp_logger_name]:
+                del instrumentation._dict_of_log_file_handlers[key]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from . import qmlSamples
+from .test_qmlReader import return_snapshot_of_questionnaire
+from qmlReader import parseCache, qmlReader
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = parseCache.ParseCache(cache_dir=os.path.join(self.tmp_dir, 'cache'))
+        self.file = qmlSamples.return_list_of_data_qml_files()[0]
+        with open(self.file, 'rb') as f:
+            self.file_bytes = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_with_cache(self, file):
+        return qmlReader.QmlReader(file, cache=self.cache)
+
+    def test_key(self):
+        tmp_key = self.cache.return_key(self.file_bytes, reader_version='1.0', options={'a': 1, 'b': True})
+        self.assertEqual(tmp_key, self.cache.return_key(self.file_bytes, reader_version='1.0',
+                                                        options={'b': True, 'a': 1}))
+        for other_key in [self.cache.return_key(self.file_bytes + b' ', reader_version='1.0',
+                                                options={'a': 1, 'b': True}),
+                          self.cache.return_key(self.file_bytes, reader_version='1.1', options={'a': 1, 'b': True}),
+                          self.cache.return_key(self.file_bytes, reader_version='1.0', options={'a': 1, 'b': False}),
+                          self.cache.return_key(self.file_bytes, reader_version='1.0')]:
+            self.assertNotEqual(tmp_key, other_key)
+
+    def test_round_trip(self):
+        tmp_parsed = self.read_with_cache(self.file)
+        self.assertIsNotNone(tmp_parsed.data)
+        self.assertEqual(len(self.cache.return_list_of_entries()), 1)
+        # the same content at another path: loaded from the cache, not parsed
+        tmp_copy = os.path.join(self.tmp_dir, 'copy.xml')
+        shutil.copyfile(self.file, tmp_copy)
+        tmp_cached = self.read_with_cache(tmp_copy)
+        self.assertIsNone(tmp_cached.data)
+        self.assertEqual(tmp_cached.questionnaire.file, tmp_copy)
+        self.assertEqual(return_snapshot_of_questionnaire(tmp_cached.questionnaire),
+                         return_snapshot_of_questionnaire(tmp_parsed.questionnaire))
+        self.assertEqual(len(self.cache.return_list_of_entries()), 1)
+        # the unpickled variable registries are notified of varplace changes
+        tmp_variables = tmp_cached.questionnaire.variables
+        tmp_varname = next(iter(tmp_variables.variables))
+        tmp_variables.variables[tmp_varname].set_varplace(varplace='shown', varname=tmp_varname)
+        self.assertIn(tmp_varname, tmp_variables.list_all_shown_vars())
+
+    def test_edited_file_is_parsed(self):
+        tmp_file = os.path.join(self.tmp_dir, 'questionnaire.xml')
+        shutil.copyfile(self.file, tmp_file)
+        self.read_with_cache(tmp_file)
+        with open(tmp_file, 'ab') as f:
+            f.write(b'\n')
+        self.assertIsNotNone(self.read_with_cache(tmp_file).data)
+        self.assertEqual(len(self.cache.return_list_of_entries()), 2)
+
+    def test_unreadable_entries_are_removed_and_reparsed(self):
+        tmp_parsed = self.read_with_cache(self.file)
+        tmp_path = self.cache.return_list_of_entries()[0][2]
+        with open(tmp_path, 'rb') as f:
+            tmp_pickle = f.read()
+        for content in [b'not a pickle', tmp_pickle[:len(tmp_pickle) // 2], pickle.dumps(['not a questionnaire'])]:
+            with self.subTest(content=content[:20]):
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                tmp_key = os.path.basename(tmp_path)[:-len(parseCache.CACHE_FILE_EXTENSION)]
+                self.assertIsNone(self.cache.load(tmp_key))
+                self.assertFalse(os.path.exists(tmp_path))
+                # the reader parses the file again and stores a new entry
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                tmp_reparsed = self.read_with_cache(self.file)
+                self.assertIsNotNone(tmp_reparsed.data)
+                self.assertEqual(return_snapshot_of_questionnaire(tmp_reparsed.questionnaire),
+                                 return_snapshot_of_questionnaire(tmp_parsed.questionnaire))
+                self.assertIsNotNone(self.cache.load(tmp_key))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        tmp_questionnaire = qmlReader.QmlReader(self.file).questionnaire
+        self.cache.store('a', tmp_questionnaire)
+        tmp_size = os.path.getsize(self.cache.return_path('a'))
+        self.cache.max_size_bytes = 2 * tmp_size + tmp_size // 2
+        self.cache.store('b', tmp_questionnaire)
+        os.utime(self.cache.return_path('a'), (1000, 1000))
+        os.utime(self.cache.return_path('b'), (2000, 2000))
+        # loading refreshes the access time of 'a', so 'b' is the least recently used entry
+        self.assertIsNotNone(self.cache.load('a'))
+        self.cache.store('c', tmp_questionnaire)
+        self.assertEqual(sorted(os.path.basename(path) for mtime, size, path in self.cache.return_list_of_entries()),
+                         ['a.pickle', 'c.pickle'])
+        self.assertIsNone(self.cache.load('b'))
+        # no temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.cache.cache_dir)), ['a.pickle', 'c.pickle'])
+        self.cache.clear()
+        self.assertEqual(self.cache.return_list_of_entries(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,290 @@
+import functools
+import os
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree
+
+from .context import DATA_QML_DIR
+from qmlReader import qmlReader
+from benchmark import qmlGenerator
+
+
+def return_snapshot_of_questionnaire(questionnaire_object, with_sources=True) -> dict:
+    """
+    :param questionnaire_object: Questionnaire
+    :param with_sources: if True, the xml string of every page is part of the snapshot
+    :return: dict of plain python objects that can be compared with ==, including the order of all dicts
+    """
+    def return_list_of_variables(variables_object):
+        return [(varname, variable.vartype, variable.varplace) for varname, variable in
+                variables_object.variables.items()]
+
+    tmp_list_of_pages = []
+    for page_uid, page in questionnaire_object.pages.pages.items():
+        tmp_dict = {'uid': page.uid, 'declared': page.declared,
+                    'variables': return_list_of_variables(page.variables),
+                    'duplicate_variables': return_list_of_variables(page.duplicate_variables),
+                    'transitions': [(key, transition.index, transition.source, transition.target,
+                                     transition.distance, transition.condition) for key, transition in
+                                    page.transitions.transitions.items()],
+                    'sources': [(source_uid, [(transition.index, transition.target, transition.distance,
+                                               transition.condition) for transition in list_of_transitions])
+                                for source_uid, list_of_transitions in page.sources.sources.items()],
+                    'header': [(key, header.uid, header.tag, header.text, header.index, header.visible_conditions)
+                               for key, header in page.header.dict_of_header_objects.items()],
+                    'questions': [(key, question.uid, question.tag, question.index,
+                                   return_list_of_variables(question.variables)) for key, question in
+                                  page.questions.dict_of_question_objects.items()]}
+        if with_sources:
+            tmp_dict['xml_source_str'] = page.xml_source_str
+        tmp_list_of_pages.append(tmp_dict)
+    return {'title': questionnaire_object.title,
+            'variables': return_list_of_variables(questionnaire_object.variables),
+            'pages': tmp_list_of_pages}
+
+
+class RecordingQmlReader(qmlReader.QmlReader):
+    """
+    QmlReader with an additional extractor for every page part that records its calls
+    """
+
+    def register_default_page_extractors(self):
+        super().register_default_page_extractors()
+        self.list_of_visits = []
+        self.list_of_finisher_calls = []
+        for part in qmlReader.PAGE_PARTS:
+            self.register_page_extractor(part, functools.partial(self.record_visit, part))
+        self.register_page_extractor('page', lambda qml_source_page, page_uid: None, finisher=self.record_finish)
+
+    def record_visit(self, part, part_source, page_uid):
+        # the default extractors are registered first, so the page object exists already
+        self.list_of_visits.append((part, page_uid, etree.QName(part_source).localname, part_source.sourceline,
+                                    page_uid in self.questionnaire.pages.pages))
+
+    def record_finish(self):
+        self.list_of_finisher_calls.append((len(self.list_of_visits),
+                                            self.questionnaire.return_list_of_all_transitions()))
+
+
+def return_list_of_visits_brute_force(file) -> list:
+    """
+    :return: list of tuples (part, page uid, tag, source line, True) for every page and its first child element of
+        every part, in document order and in the order of qmlReader.PAGE_PARTS
+    """
+    tmp_list_of_visits = []
+    for page in etree.parse(file).getroot().iterchildren('{' + qmlReader.ZOFAR_NAMESPACE + '}page'):
+        for part in qmlReader.PAGE_PARTS:
+            tmp_element = page if part == 'page' else page.find('{' + qmlReader.ZOFAR_NAMESPACE + '}' + part)
+            if tmp_element is not None:
+                tmp_list_of_visits.append((part, page.attrib['uid'], part, tmp_element.sourceline, True))
+    return tmp_list_of_visits
+
+
+class TestPageVisitor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.list_of_files = [os.path.join(DATA_QML_DIR, filename) for filename in sorted(os.listdir(DATA_QML_DIR))
+                              if filename.endswith('.xml')]
+        for seed in range(2):
+            tmp_file = os.path.join(self.tmp_dir, 'generated_' + str(seed) + '.xml')
+            qmlGenerator.QmlGenerator(page_count=50, branching_factor=3, back_jump_rate=0.2, seed=seed).write(tmp_file)
+            self.list_of_files.append(tmp_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_every_part_is_visited_once(self):
+        for file in self.list_of_files:
+            tmp_expected = return_list_of_visits_brute_force(file)
+            for streaming in [False, True]:
+                with self.subTest(file=file, streaming=streaming):
+                    tmp_reader = RecordingQmlReader(file, streaming=streaming)
+                    self.assertEqual(tmp_reader.list_of_visits, tmp_expected)
+                    # the finishers run once, after the last page and after the transitions have been resolved
+                    self.assertEqual(tmp_reader.list_of_finisher_calls,
+                                     [(len(tmp_expected), tmp_reader.questionnaire.return_list_of_all_transitions())])
+                    self.assertEqual(len(tmp_reader.list_of_finisher_calls[0][1]),
+                                     len(etree.parse(file).getroot().findall(
+                                         '{*}page/{*}transitions/{*}transition')))
+
+    def test_extractors_do_not_change_the_result(self):
+        for file in self.list_of_files:
+            with self.subTest(file=file):
+                self.assertEqual(return_snapshot_of_questionnaire(RecordingQmlReader(file).questionnaire),
+                                 return_snapshot_of_questionnaire(qmlReader.QmlReader(file).questionnaire))
+
+    def test_unknown_part(self):
+        tmp_reader = qmlReader.QmlReader(self.list_of_files[0])
+        with self.assertRaises(AssertionError):
+            tmp_reader.register_page_extractor('footer', lambda part_source, page_uid: None)
+
+
+class TestStreamingParse(unittest.TestCase):
+    def assert_streaming_equals_objectified(self, file):
+        tmp_objectified = qmlReader.QmlReader(file).questionnaire
+        tmp_streaming = qmlReader.QmlReader(file, streaming=True).questionnaire
+        self.assertEqual(return_snapshot_of_questionnaire(tmp_objectified),
+                         return_snapshot_of_questionnaire(tmp_streaming))
+
+    def test_data_qml(self):
+        for filename in sorted(os.listdir(DATA_QML_DIR)):
+            if filename.endswith('.xml'):
+                with self.subTest(filename=filename):
+                    self.assert_streaming_equals_objectified(os.path.join(DATA_QML_DIR, filename))
+
+    def test_generated(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for seed in range(3):
+                tmp_file = os.path.join(tmp_dir, 'generated_' + str(seed) + '.xml')
+                qmlGenerator.QmlGenerator(page_count=60, branching_factor=3, condition_complexity=2,
+                                          back_jump_rate=0.2, seed=seed).write(tmp_file)
+                with self.subTest(seed=seed):
+                    self.assert_streaming_equals_objectified(tmp_file)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_without_page_sources(self):
+        file = os.path.join(DATA_QML_DIR, 'questionnaire.xml')
+        tmp_streaming = qmlReader.QmlReader(file, streaming=True, keep_page_sources=False).questionnaire
+        self.assertEqual(return_snapshot_of_questionnaire(qmlReader.QmlReader(file).questionnaire,
+                                                          with_sources=False),
+                         return_snapshot_of_questionnaire(tmp_streaming, with_sources=False))
+        self.assertTrue(all(page.xml_source_str is None for page in tmp_streaming.pages.pages.values()))
+
+
+class TestIncrementalReparse(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.tmp_dir, 'questionnaire.xml')
+        self.qml_string = qmlGenerator.QmlGenerator(page_count=40, branching_factor=3, back_jump_rate=0.2,
+                                                    seed=7).return_qml_string()
+        self.write(self.qml_string)
+        self.reader = qmlReader.QmlReader(self.file, incremental=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, qml_string):
+        with open(self.file, 'w', encoding='utf-8') as f:
+            f.write(qml_string)
+
+    def replace_and_reparse(self, old, new) -> list:
+        self.assertIn(old, self.qml_string)
+        self.qml_string = self.qml_string.replace(old, new, 1)
+        self.write(self.qml_string)
+        return self.reader.reparse_changed_pages()
+
+    def assert_equals_fresh_parse(self):
+        self.assertEqual(return_snapshot_of_questionnaire(qmlReader.QmlReader(self.file).questionnaire),
+                         return_snapshot_of_questionnaire(self.reader.questionnaire))
+
+    def test_unchanged_file(self):
+        self.assertEqual(self.reader.reparse_changed_pages(), [])
+        self.assert_equals_fresh_parse()
+
+    def test_changed_text(self):
+        tmp_questionnaire = self.reader.questionnaire
+        self.assertEqual(self.replace_and_reparse('Question 1 of page P000003', 'Changed question'), ['P000003'])
+        self.assertIs(self.reader.questionnaire, tmp_questionnaire)
+        self.assert_equals_fresh_parse()
+
+    def test_changed_transition_target(self):
+        self.assertEqual(self.replace_and_reparse('<zofar:transition target="P000005"/>',
+                                                  '<zofar:transition target="P000012"/>'), ['P000004'])
+        self.assert_equals_fresh_parse()
+
+    def test_changed_variable_references(self):
+        # the page asks a variable of another page in its body and drops its trigger, so v000010_0 is no longer
+        #  referenced anywhere and v000002_0 is referenced on two pages
+        tmp_page_string = self.qml_string[self.qml_string.index('<zofar:page uid="P000010">'):]
+        tmp_page_string = tmp_page_string[:tmp_page_string.index('</zofar:page>')]
+        tmp_triggers_string = tmp_page_string[tmp_page_string.index('<zofar:triggers>'):
+                                              tmp_page_string.index('</zofar:triggers>') + len('</zofar:triggers>')]
+        tmp_new_page_string = tmp_page_string.replace(tmp_triggers_string, '').replace(
+            'variable="v000010_0"', 'variable="v000002_0"')
+        self.assertEqual(self.replace_and_reparse(tmp_page_string, tmp_new_page_string), ['P000010'])
+        self.assert_equals_fresh_parse()
+
+    def test_several_changes(self):
+        self.replace_and_reparse('Question 0 of page P000001', 'Changed question')
+        self.replace_and_reparse('<zofar:transition target="P000021"/>', '<zofar:transition target="P000002"/>')
+        self.assertEqual(self.replace_and_reparse('Question 0 of page P000030', 'Changed question'), ['P000030'])
+        self.assert_equals_fresh_parse()
+
+    def test_full_reparse_after_changed_declarations(self):
+        tmp_questionnaire = self.reader.questionnaire
+        tmp_list_of_pages = self.replace_and_reparse('<zofar:variables>\n',
+                                                     '<zofar:variables>\n<zofar:variable name="new" type="string"/>\n')
+        self.assertIsNot(self.reader.questionnaire, tmp_questionnaire)
+        self.assertEqual(tmp_list_of_pages, list(self.reader.questionnaire.pages.pages))
+        self.assert_equals_fresh_parse()
+
+    def test_full_reparse_after_removed_page(self):
+        tmp_page_string = self.qml_string[self.qml_string.index('<zofar:page uid="P000039">'):]
+        tmp_page_string = tmp_page_string[:tmp_page_string.index('</zofar:page>') + len('</zofar:page>')]
+        # the last page has no transitions, so no other page depends on it being declared
+        tmp_list_of_pages = self.replace_and_reparse(tmp_page_string, '')
+        self.assertNotIn('P000039', tmp_list_of_pages)
+        self.assertEqual(len(tmp_list_of_pages), 39)
+        self.assert_equals_fresh_parse()
+
+    def test_full_reparse_after_transition_to_undeclared_page(self):
+        tmp_questionnaire = self.reader.questionnaire
+        self.replace_and_reparse('<zofar:transition target="P000007"/>', '<zofar:transition target="undeclared"/>')
+        self.assertIsNot(self.reader.questionnaire, tmp_questionnaire)
+        self.assertFalse(self.reader.questionnaire.pages.pages['undeclared'].declared)
+        self.assert_equals_fresh_parse()
+
+    def test_incremental_state_after_full_reparse(self):
+        self.replace_and_reparse('<zofar:variables>\n',
+                                 '<zofar:variables>\n<zofar:variable name="new" type="string"/>\n')
+        self.assertEqual(self.replace_and_reparse('Question 2 of page P000015', 'Changed question'), ['P000015'])
+        self.assert_equals_fresh_parse()
+
+
+class TestLoadMany(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.list_of_files = [os.path.join(DATA_QML_DIR, filename) for filename in sorted(os.listdir(DATA_QML_DIR))
+                              if filename.endswith('.xml')]
+        # generated files of different sizes, so that the workers finish in another order than submitted
+        for seed, page_count in enumerate([120, 10, 60]):
+            tmp_file = os.path.join(self.tmp_dir, 'generated_' + str(seed) + '.xml')
+            qmlGenerator.QmlGenerator(page_count=page_count, branching_factor=3, back_jump_rate=0.2,
+                                      seed=seed).write(tmp_file)
+            self.list_of_files.insert(seed, tmp_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parallel_equals_sequential(self):
+        tmp_list_of_results = qmlReader.load_many(self.list_of_files, jobs=2)
+        self.assertEqual([result.file for result in tmp_list_of_results], self.list_of_files)
+        for file, result in zip(self.list_of_files, tmp_list_of_results):
+            with self.subTest(file=file):
+                self.assertEqual(return_snapshot_of_questionnaire(result.questionnaire),
+                                 return_snapshot_of_questionnaire(qmlReader.QmlReader(file).questionnaire))
+                # the lxml element is reconnected lazily
+                tmp_page = next(iter(result.questionnaire.pages.pages.values()))
+                self.assertIsNotNone(tmp_page.xml_source)
+
+    def test_failing_file(self):
+        tmp_file = os.path.join(self.tmp_dir, 'broken.xml')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('<zofar:questionnaire')
+        for jobs in [1, 2]:
+            with self.subTest(jobs=jobs):
+                with self.assertRaises(qmlReader.QmlLoadError) as context_manager:
+                    qmlReader.load_many([self.list_of_files[0], tmp_file, self.list_of_files[1]], jobs=jobs)
+                self.assertEqual(context_manager.exception.file, tmp_file)
+                self.assertTrue(context_manager.exception.message.startswith('XMLSyntaxError'))
+
+    def test_no_files(self):
+        self.assertEqual(qmlReader.load_many([], jobs=4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,378 @@
+import html
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree, objectify
+
+from . import qmlSamples
+from qmlReader import questionnaire, questionnaireMerge, qmlReader
+from benchmark import qmlGenerator
+
+
+class TestStructureVersion(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        tmp_list_of_pages = [('index', [('A', 'zofar.isMissing(x)'), ('B', None)], ['x']),
+                             ('A', [('B', None)]),
+                             ('B', [('end', None)], ['y']),
+                             ('end', [])]
+        tmp_dict_of_variables = {'x': 'string', 'y': 'string'}
+        self.questionnaire_1 = qmlSamples.read_questionnaire(self.tmp_dir, 'questionnaire_1.xml', tmp_list_of_pages,
+                                                             tmp_dict_of_variables)
+        self.questionnaire_2 = qmlSamples.read_questionnaire(self.tmp_dir, 'questionnaire_2.xml', tmp_list_of_pages,
+                                                             tmp_dict_of_variables)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_changes_are_counted(self):
+        tmp_version = self.questionnaire_1.return_structure_version()
+        self.questionnaire_1.pages.add_page(questionnaire.QmlPage('C'))
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version + 1)
+        self.questionnaire_1.pages.pages['C'].add_transition(
+            questionnaire.Transition(index=0, target='end', condition=None, source='C', distance=1))
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version + 2)
+        self.questionnaire_1.pages.pages['C'].add_variable(questionnaire.Variable('x', 'string'))
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version + 3)
+        self.questionnaire_1.variables.add_variable(questionnaire.Variable('z', 'string'))
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version + 4)
+        self.questionnaire_1.variables.delete_variable('z')
+        self.questionnaire_1.pages.drop_page('C')
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version + 6)
+
+    def test_caches_of_other_questionnaires_are_kept(self):
+        tmp_routing_graph_1 = self.questionnaire_1.return_routing_graph()
+        tmp_routing_graph_2 = self.questionnaire_2.return_routing_graph()
+        tmp_transition_table_2 = self.questionnaire_2.return_transition_table()
+        tmp_version_2 = self.questionnaire_2.return_structure_version()
+
+        self.questionnaire_1.pages.pages['A'].add_transition(
+            questionnaire.Transition(index=1, target='end', condition=None, source='A', distance=2))
+        self.assertEqual(self.questionnaire_2.return_structure_version(), tmp_version_2)
+        self.assertIs(self.questionnaire_2.return_routing_graph(), tmp_routing_graph_2)
+        self.assertIs(self.questionnaire_2.return_transition_table(), tmp_transition_table_2)
+        self.assertIsNot(self.questionnaire_1.return_routing_graph(), tmp_routing_graph_1)
+        self.assertTrue(self.questionnaire_1.return_routing_graph().has_edge('A', 'end'))
+        self.assertFalse(self.questionnaire_2.return_routing_graph().has_edge('A', 'end'))
+
+    def test_new_questionnaire_does_not_invalidate_caches(self):
+        tmp_routing_graph = self.questionnaire_1.return_routing_graph()
+        qmlSamples.read_questionnaire(self.tmp_dir, 'questionnaire_3.xml', [('index', [])], {'x': 'string'})
+        self.assertIs(self.questionnaire_1.return_routing_graph(), tmp_routing_graph)
+
+    def test_pickle(self):
+        tmp_questionnaire = pickle.loads(pickle.dumps(self.questionnaire_1))
+        tmp_version = tmp_questionnaire.return_structure_version()
+        self.assertEqual(tmp_version, self.questionnaire_1.return_structure_version())
+        tmp_routing_graph = tmp_questionnaire.return_routing_graph()
+        # the unpickled pages still share the counter of the unpickled questionnaire
+        tmp_questionnaire.pages.pages['B'].add_transition(
+            questionnaire.Transition(index=1, target='A', condition=None, source='B', distance=-1))
+        self.assertEqual(tmp_questionnaire.return_structure_version(), tmp_version + 1)
+        self.assertIsNot(tmp_questionnaire.return_routing_graph(), tmp_routing_graph)
+        self.assertTrue(tmp_questionnaire.return_routing_graph().has_edge('B', 'A'))
+
+    def test_merge_keeps_the_counters_of_the_merged_questionnaires(self):
+        tmp_merged = questionnaireMerge.merge_questionnaires([self.questionnaire_1, self.questionnaire_2]).questionnaire
+        tmp_routing_graph_1 = self.questionnaire_1.return_routing_graph()
+        tmp_version_1 = self.questionnaire_1.return_structure_version()
+        tmp_version_merged = tmp_merged.return_structure_version()
+        tmp_merged.pages.pages['B'].add_variable(questionnaire.Variable('x', 'string'))
+        self.assertEqual(tmp_merged.return_structure_version(), tmp_version_merged + 1)
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version_1)
+        self.assertIs(self.questionnaire_1.return_routing_graph(), tmp_routing_graph_1)
+        self.assertEqual(list(self.questionnaire_1.pages.pages['B'].variables.variables), ['y'])
+
+    def test_append_keeps_the_counter_of_the_appended_questionnaire(self):
+        self.assertEqual(self.questionnaire_2.return_number_of_paths(), 2)
+        self.questionnaire_1.append_other_questionnaire(self.questionnaire_2)
+        tmp_routing_graph_1 = self.questionnaire_1.return_routing_graph()
+        tmp_version_1 = self.questionnaire_1.return_structure_version()
+        # a change of the appended questionnaire invalidates its own caches, not those of questionnaire_1
+        self.questionnaire_2.pages.pages['index'].add_transition(
+            questionnaire.Transition(index=2, target='end', condition=None, source='index', distance=3))
+        self.assertEqual(self.questionnaire_2.return_number_of_paths(), 3)
+        self.assertTrue(self.questionnaire_2.return_routing_graph().has_edge('index', 'end'))
+        self.assertEqual(self.questionnaire_1.return_structure_version(), tmp_version_1)
+        self.assertIs(self.questionnaire_1.return_routing_graph(), tmp_routing_graph_1)
+        self.assertFalse(tmp_routing_graph_1.has_edge('index', 'end'))
+        # and a change of an appended page invalidates the caches of questionnaire_1 only
+        tmp_version_2 = self.questionnaire_2.return_structure_version()
+        self.questionnaire_1.pages.pages['A'].add_transition(
+            questionnaire.Transition(index=1, target='end', condition=None, source='A', distance=2))
+        self.assertTrue(self.questionnaire_1.return_routing_graph().has_edge('A', 'end'))
+        self.assertEqual(self.questionnaire_2.return_structure_version(), tmp_version_2)
+        self.assertFalse(self.questionnaire_2.return_routing_graph().has_edge('A', 'end'))
+
+    def test_expected_length_is_cached(self):
+        tmp_frequencies = {('index', 'A'): 3, ('index', 'B'): 1}
+        tmp_expected_length = self.questionnaire_1.return_expected_length(dict_of_edge_frequencies=tmp_frequencies)
+        self.assertAlmostEqual(tmp_expected_length.pages, 3.75)
+        self.assertEqual(tmp_expected_length.expected_visits, {'index': 1.0, 'A': 0.75, 'B': 1.0, 'end': 1.0})
+        # equal frequencies in another dict are a cache hit
+        self.assertIs(self.questionnaire_1.return_expected_length(dict_of_edge_frequencies=dict(tmp_frequencies)),
+                      tmp_expected_length)
+        for kwargs in [{}, {'dict_of_edge_frequencies': {('index', 'A'): 1, ('index', 'B'): 1}},
+                       {'dict_of_edge_frequencies': tmp_frequencies, 'max_loop_steps': 10},
+                       {'dict_of_edge_frequencies': tmp_frequencies, 'start_page': 'A'}]:
+            with self.subTest(**kwargs):
+                self.assertIsNot(self.questionnaire_1.return_expected_length(**kwargs), tmp_expected_length)
+        self.assertAlmostEqual(self.questionnaire_1.return_expected_length().pages, 3.5)
+        # a change of the routing invalidates the cached value
+        self.questionnaire_1.pages.pages['index'].add_transition(
+            questionnaire.Transition(index=2, target='end', condition=None, source='index', distance=3))
+        tmp_new_expected_length = self.questionnaire_1.return_expected_length(dict_of_edge_frequencies=tmp_frequencies)
+        self.assertIsNot(tmp_new_expected_length, tmp_expected_length)
+        self.assertAlmostEqual(tmp_new_expected_length.pages, 3.75)
+        self.assertAlmostEqual(self.questionnaire_1.return_expected_length().pages, 1 + 1 / 3 + 2 / 3 + 1)
+
+
+class TestPageOrdinals(unittest.TestCase):
+    def assert_ordinals(self, pages_object):
+        # brute force: the position within the list of all page uids
+        tmp_list_of_uids = list(pages_object.pages)
+        self.assertEqual(pages_object.page_ordinals, {uid: tmp_list_of_uids.index(uid) for uid in tmp_list_of_uids})
+        for uid in tmp_list_of_uids:
+            self.assertEqual(pages_object.return_page_ordinal(uid), tmp_list_of_uids.index(uid))
+
+    def test_random_changes(self):
+        tmp_random = random.Random(5)
+        tmp_pages = questionnaire.QmlPages()
+        for step in range(300):
+            tmp_list_of_uids = list(tmp_pages.pages)
+            tmp_action = tmp_random.random()
+            if tmp_action < 0.5 or not tmp_list_of_uids:
+                tmp_pages.add_page(questionnaire.QmlPage('P' + str(step), declared=tmp_random.random() < 0.8))
+            elif tmp_action < 0.75:
+                tmp_pages.drop_page(tmp_random.choice(tmp_list_of_uids))
+            else:
+                tmp_uid = tmp_random.choice(tmp_list_of_uids)
+                tmp_pages.add_page(questionnaire.QmlPage(tmp_uid), replace=True)
+                # a replaced page keeps its position
+                self.assertEqual(list(tmp_pages.pages), tmp_list_of_uids)
+            self.assert_ordinals(tmp_pages)
+        with self.assertRaises(KeyError):
+            tmp_pages.add_page(questionnaire.QmlPage(next(iter(tmp_pages.pages))))
+        with self.assertRaises(ValueError):
+            tmp_pages.return_page_ordinal('unknown')
+
+    def test_transition_distances(self):
+        # undeclared target pages are appended while the transitions are extracted
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            tmp_list_of_files = qmlSamples.return_list_of_data_qml_files()
+            tmp_file = qmlSamples.read_questionnaire(
+                tmp_dir, 'undeclared.xml', [('index', [('A', None), ('missing_1', 'zofar.isMissing(x)')], ['x']),
+                                            ('A', [('missing_2', None), ('index', None)])], {'x': 'string'}).file
+            tmp_list_of_files.append(tmp_file)
+            tmp_file = os.path.join(tmp_dir, 'generated.xml')
+            qmlGenerator.QmlGenerator(page_count=80, branching_factor=3, back_jump_rate=0.2, seed=2).write(tmp_file)
+            tmp_list_of_files.append(tmp_file)
+            for file in tmp_list_of_files:
+                tmp_questionnaire = qmlReader.QmlReader(file).questionnaire
+                tmp_list_of_uids = list(tmp_questionnaire.pages.pages)
+                with self.subTest(file=file):
+                    self.assert_ordinals(tmp_questionnaire.pages)
+                    for transition in tmp_questionnaire.return_list_of_all_transitions():
+                        self.assertEqual(transition.distance, tmp_list_of_uids.index(transition.target) -
+                                         tmp_list_of_uids.index(transition.source))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+def return_xml_source_str_eagerly(qml_source_page) -> str:
+    """
+    the string that was rendered for every page at load time before QmlPage.xml_source_str became lazy
+    """
+    tmp_xml_source_str = html.unescape(etree.tostring(qml_source_page).decode('utf-8'))
+    tmp_xml_source_str = tmp_xml_source_str.replace(
+        ' xmlns:zofar="http://www.his.de/zofar/xml/questionnaire" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+        ' xmlns:display="http://www.dzhw.eu/zofar/xml/display"', '')
+    for entry in ['<zofar:transition', '<zofar:transitions>', '<zofar:body>', '<zofar:header>', '<zofar:trigger',
+                  '<zofar:triggers>']:
+        tmp_xml_source_str = tmp_xml_source_str.replace(entry, '\n\t\t' + entry)
+    return tmp_xml_source_str
+
+
+class TestPageSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.list_of_files = qmlSamples.return_list_of_data_qml_files()
+        self.generated_file = os.path.join(self.tmp_dir, 'generated.xml')
+        qmlGenerator.QmlGenerator(page_count=questionnaire.XML_SOURCE_STR_CACHE_SIZE + 40, branching_factor=2,
+                                  seed=4).write(self.generated_file)
+        self.list_of_files.append(self.generated_file)
+        questionnaire.render_xml_source_str.cache_clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        questionnaire.render_xml_source_str.cache_clear()
+
+    @staticmethod
+    def return_dict_of_page_elements(file) -> dict:
+        with open(file, 'rb') as f:
+            tmp_root = objectify.fromstring(f.read())
+        return {page.attrib['uid']: page for page in
+                tmp_root.iterchildren(tag='{' + qmlReader.ZOFAR_NAMESPACE + '}page')}
+
+    def test_lazy_source_equals_eager_source(self):
+        for file in self.list_of_files:
+            tmp_dict_of_page_elements = self.return_dict_of_page_elements(file)
+            for streaming in [False, True]:
+                tmp_questionnaire = qmlReader.QmlReader(file, streaming=streaming).questionnaire
+                # nothing has been rendered while reading
+                self.assertEqual(questionnaire.render_xml_source_str.cache_info().currsize, 0)
+                tmp_unpickled = pickle.loads(pickle.dumps(tmp_questionnaire))
+                for uid, page_element in tmp_dict_of_page_elements.items():
+                    with self.subTest(file=file, streaming=streaming, uid=uid):
+                        tmp_expected = return_xml_source_str_eagerly(page_element)
+                        self.assertEqual(tmp_questionnaire.pages.pages[uid].xml_source_str, tmp_expected)
+                        # after unpickling, the element is parsed again from the kept serialization on first access
+                        tmp_page = tmp_unpickled.pages.pages[uid]
+                        self.assertIsNone(tmp_page._QmlPage__xml_source)
+                        self.assertEqual(tmp_page.xml_source_str, tmp_expected)
+                        self.assertEqual(etree.tostring(tmp_page.xml_source), etree.tostring(page_element))
+                questionnaire.render_xml_source_str.cache_clear()
+
+    def test_cache_is_bounded(self):
+        tmp_questionnaire = qmlReader.QmlReader(self.generated_file).questionnaire
+        tmp_list_of_pages = list(tmp_questionnaire.pages.pages.values())
+        tmp_first_source = tmp_list_of_pages[0].xml_source_str
+        self.assertIs(tmp_list_of_pages[0].xml_source_str, tmp_first_source)
+        self.assertEqual(questionnaire.render_xml_source_str.cache_info().hits, 1)
+        for page in tmp_list_of_pages:
+            page.xml_source_str
+        tmp_cache_info = questionnaire.render_xml_source_str.cache_info()
+        self.assertGreater(len(tmp_list_of_pages), questionnaire.XML_SOURCE_STR_CACHE_SIZE)
+        self.assertEqual(tmp_cache_info.currsize, questionnaire.XML_SOURCE_STR_CACHE_SIZE)
+        # the least recently used string has been evicted, it is rendered again
+        self.assertEqual(tmp_list_of_pages[0].xml_source_str, tmp_first_source)
+        self.assertEqual(questionnaire.render_xml_source_str.cache_info().misses, tmp_cache_info.misses + 1)
+
+    def test_explicit_source(self):
+        tmp_page = qmlReader.QmlReader(self.list_of_files[0]).questionnaire.pages.pages['index']
+        tmp_page.set_xml_source_str('<zofar:page/>')
+        self.assertEqual(tmp_page.xml_source_str, '<zofar:page/>')
+        self.assertEqual(questionnaire.render_xml_source_str.cache_info().currsize, 0)
+        self.assertIsNone(questionnaire.QmlPage('new').xml_source_str)
+
+    def test_without_page_sources(self):
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming):
+                tmp_questionnaire = qmlReader.QmlReader(self.list_of_files[0], streaming=streaming,
+                                                        keep_page_sources=False).questionnaire
+                for page in tmp_questionnaire.pages.pages.values():
+                    self.assertIsNone(page.xml_source)
+                    self.assertIsNone(page.xml_source_bytes)
+                    self.assertIsNone(page.xml_source_str)
+
+
+VARNAMES = ['v' + str(i) for i in range(12)]
+VARTYPES = ['boolean', 'singleChoiceAnswerOption', 'string', 'number']
+VARPLACES = ['body', 'triggers', 'shown', None]
+
+
+class TestVariableRegistries(unittest.TestCase):
+    def test_variable_has_no_per_instance_containers(self):
+        tmp_variable = questionnaire.Variable('x', 'string')
+        self.assertEqual(questionnaire.Variable.__slots__, ('varname', 'vartype', 'varplace'))
+        self.assertFalse(hasattr(tmp_variable, '__dict__'))
+
+    def test_varplace_change_updates_all_registries(self):
+        tmp_variable = questionnaire.Variable('x', 'string')
+        tmp_registry_1 = questionnaire.Variables()
+        tmp_registry_2 = questionnaire.Variables()
+        # another Variable of the same name in a third registry is not affected
+        tmp_registry_3 = questionnaire.Variables()
+        tmp_registry_3.add_variable(questionnaire.Variable('x', 'string'))
+        for registry in (tmp_registry_1, tmp_registry_2):
+            registry.add_variable(tmp_variable)
+        tmp_variable.set_varplace(varplace='shown', varname='x')
+        for registry in (tmp_registry_1, tmp_registry_2):
+            self.assertEqual(registry.list_all_shown_vars(), ['x'])
+            self.assertEqual(registry.list_all_vars(), [])
+        self.assertEqual(tmp_registry_3.list_all_shown_vars(), [])
+        # a deleted variable is not indexed any more
+        tmp_registry_2.delete_variable('x')
+        tmp_variable.set_varplace(varplace='body', varname='x')
+        self.assertEqual(tmp_registry_1.return_list_of_varnames_of_varplace('body'), ['x'])
+        self.assertEqual(tmp_registry_2.return_list_of_varnames_of_varplace('body'), [])
+
+    def assert_indexes_equal_linear_filters(self, variables_object):
+        tmp_items = list(variables_object.variables.items())
+        self.assertEqual(variables_object.list_all_vars(),
+                         [varname for varname, variable in tmp_items if variable.varplace != 'shown'])
+        self.assertEqual(variables_object.list_all_shown_vars(),
+                         [varname for varname, variable in tmp_items if variable.varplace == 'shown'])
+        self.assertEqual(variables_object.list_all_vars_types(),
+                         [(varname, variable.vartype) for varname, variable in tmp_items if
+                          variable.varplace != 'shown'])
+        self.assertEqual(variables_object.list_all_vartypes(), [variable.vartype for varname, variable in tmp_items])
+        for varplace in VARPLACES:
+            self.assertEqual(variables_object.return_list_of_varnames_of_varplace(varplace),
+                             [varname for varname, variable in tmp_items if variable.varplace == varplace])
+        for vartype in VARTYPES:
+            self.assertEqual(variables_object.return_list_of_varnames_of_vartype(vartype),
+                             [varname for varname, variable in tmp_items if variable.vartype == vartype])
+        for varname in VARNAMES:
+            tmp_variable = variables_object.variables.get(varname)
+            self.assertEqual(variables_object.check_if_var(varname),
+                             tmp_variable is not None and tmp_variable.varplace != 'shown')
+            self.assertEqual(variables_object.check_if_shown_var(varname),
+                             tmp_variable is not None and tmp_variable.varplace == 'shown')
+            if tmp_variable is not None:
+                for vartype in VARTYPES:
+                    self.assertEqual(variables_object.check_if_vartype(varname, vartype),
+                                     tmp_variable.vartype == vartype)
+            else:
+                with self.assertRaises(ValueError):
+                    variables_object.check_if_vartype(varname, 'string')
+
+    def test_indexes_against_linear_filters(self):
+        for seed in range(10):
+            tmp_random = random.Random(seed)
+            # the questionnaire registry and two page registries share the Variable objects
+            tmp_list_of_registries = [questionnaire.Variables(), questionnaire.Variables(),
+                                      questionnaire.DuplicateVariables()]
+            for step in range(200):
+                tmp_registry = tmp_random.choice(tmp_list_of_registries)
+                tmp_varname = tmp_random.choice(VARNAMES)
+                tmp_action = tmp_random.random()
+                if tmp_action < 0.4:
+                    tmp_variable = next((registry.variables[tmp_varname] for registry in tmp_list_of_registries if
+                                         tmp_varname in registry.variables and tmp_random.random() < 0.7), None)
+                    if tmp_variable is None:
+                        tmp_variable = questionnaire.Variable(tmp_varname, tmp_random.choice(VARTYPES),
+                                                              varplace=tmp_random.choice(VARPLACES))
+                    tmp_registry.add_variable(tmp_variable, replace=True)
+                elif tmp_action < 0.6:
+                    if tmp_varname in tmp_registry.variables:
+                        tmp_registry.delete_variable(tmp_varname)
+                    else:
+                        with self.assertRaises(ValueError):
+                            tmp_registry.delete_variable(tmp_varname)
+                elif tmp_varname in tmp_registry.variables:
+                    tmp_registry.variables[tmp_varname].set_varplace(varplace=tmp_random.choice(VARPLACES),
+                                                                     varname=tmp_varname)
+                if step % 20 == 0:
+                    tmp_list_of_registries = pickle.loads(pickle.dumps(tmp_list_of_registries))
+                with self.subTest(seed=seed, step=step):
+                    for registry in tmp_list_of_registries:
+                        self.assert_indexes_equal_linear_filters(registry)
+
+    def test_unpickled_registries_are_notified(self):
+        tmp_registry = questionnaire.Variables()
+        tmp_registry.add_variable(questionnaire.Variable('x', 'string'))
+        tmp_registry.add_variable(questionnaire.Variable('y', 'number'))
+        tmp_registry = pickle.loads(pickle.dumps(tmp_registry))
+        tmp_registry.variables['x'].set_varplace(varplace='triggers', varname='x')
+        self.assertEqual(tmp_registry.return_list_of_varnames_of_varplace('triggers'), ['x'])
+        self.assertEqual(tmp_registry.return_list_of_varnames_of_varplace(None), ['y'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+import unittest
+
+from . import qmlSamples
+from qmlReader import questionnaireMerge
+from qmlReader.questionnaireMerge import DanglingTarget, DuplicatePage, TypeConflictingVariable
+
+
+def return_list_of_transitions(questionnaire_object, page_uid) -> list:
+    return [(transition.target, transition.condition, transition.distance) for transition in
+            questionnaire_object.pages.pages[page_uid].transitions.transitions.values()]
+
+
+class TestMergeQuestionnaires(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # module 1 refers to page C of module 2; page B is declared in module 1 and module 2
+        self.module_1 = qmlSamples.read_questionnaire(
+            self.tmp_dir, 'module_1.xml',
+            [('index', [('A', None)], ['x']),
+             ('A', [('C', 'zofar.asNumber(y) == 1'), ('B', None)], ['y']),
+             ('B', [('C', None)], ['x'])],
+            {'x': 'string', 'y': 'number'}, title='Module 1')
+        # y has another type, page D refers to page "missing", which is declared in no module
+        self.module_2 = qmlSamples.read_questionnaire(
+            self.tmp_dir, 'module_2.xml',
+            [('B', [('D', None)], ['z']),
+             ('C', [('D', None)]),
+             ('D', [('missing', 'zofar.isMissing(z)'), ('end', None)], ['y']),
+             ('end', [])],
+            {'y': 'string', 'z': 'string'}, title='Module 2')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_page_order_and_transitions(self):
+        tmp_merged = questionnaireMerge.merge_questionnaires([self.module_1, self.module_2]).questionnaire
+        self.assertEqual(tmp_merged.title, 'Module 1')
+        # C and "end" are declared in module 2; "missing" is not declared anywhere and comes last
+        self.assertEqual(list(tmp_merged.pages.pages), ['index', 'A', 'B', 'C', 'D', 'end', 'missing'])
+        self.assertEqual([page.declared for page in tmp_merged.pages.pages.values()],
+                         [True, True, True, True, True, True, False])
+        self.assertEqual(return_list_of_transitions(tmp_merged, 'A'),
+                         [('C', 'zofar.asNumber(y) == 1', 2), ('B', None, 1)])
+        self.assertEqual(return_list_of_transitions(tmp_merged, 'D'),
+                         [('missing', 'zofar.isMissing(z)', 2), ('end', None, 1)])
+        # the sources are in the order of the source pages
+        self.assertEqual(list(tmp_merged.pages.pages['D'].sources.sources), ['B', 'C'])
+        self.assertEqual(list(tmp_merged.pages.pages['C'].sources.sources), ['A'])
+        # the merged questionnaires are not changed
+        self.assertEqual(list(self.module_1.pages.pages), ['index', 'A', 'B', 'C'])
+        self.assertFalse(self.module_1.pages.pages['C'].declared)
+        self.assertEqual(list(self.module_1.pages.pages['B'].transitions.transitions.values())[0].target, 'C')
+
+    def test_duplicate_policy_last(self):
+        tmp_merge_result = questionnaireMerge.merge_questionnaires([self.module_1, self.module_2],
+                                                                   duplicate_policy='last')
+        tmp_merged = tmp_merge_result.questionnaire
+        # page B of module 2 at the position of its first declaration
+        self.assertEqual(list(tmp_merged.pages.pages)[2], 'B')
+        self.assertEqual(return_list_of_transitions(tmp_merged, 'B'), [('D', None, 2)])
+        self.assertEqual(list(tmp_merged.pages.pages['B'].variables.variables), ['z'])
+        self.assertEqual(list(tmp_merged.pages.pages['C'].sources.sources), ['A'])
+        self.assertEqual(tmp_merge_result.conflicts.duplicate_pages,
+                         [DuplicatePage(uid='B', first_file=self.module_1.file, duplicate_file=self.module_2.file,
+                                        kept_file=self.module_2.file)])
+
+    def test_duplicate_policy_first(self):
+        tmp_merge_result = questionnaireMerge.merge_questionnaires([self.module_1, self.module_2],
+                                                                   duplicate_policy='first')
+        tmp_merged = tmp_merge_result.questionnaire
+        self.assertEqual(return_list_of_transitions(tmp_merged, 'B'), [('C', None, 1)])
+        self.assertEqual(list(tmp_merged.pages.pages['B'].variables.variables), ['x'])
+        self.assertEqual(list(tmp_merged.pages.pages['C'].sources.sources), ['A', 'B'])
+        self.assertEqual(list(tmp_merged.pages.pages['D'].sources.sources), ['C'])
+        self.assertEqual(tmp_merge_result.conflicts.duplicate_pages,
+                         [DuplicatePage(uid='B', first_file=self.module_1.file, duplicate_file=self.module_2.file,
+                                        kept_file=self.module_1.file)])
+
+    def test_duplicate_policy_unknown(self):
+        with self.assertRaises(AssertionError):
+            questionnaireMerge.merge_questionnaires([self.module_1, self.module_2], duplicate_policy='both')
+
+    def test_duplicate_within_three_modules(self):
+        tmp_module_3 = qmlSamples.read_questionnaire(self.tmp_dir, 'module_3.xml', [('B', [('end', None)])],
+                                                     {'x': 'string'}, title='Module 3')
+        for duplicate_policy, kept_file in [('first', self.module_1.file), ('last', tmp_module_3.file)]:
+            with self.subTest(duplicate_policy=duplicate_policy):
+                tmp_merge_result = questionnaireMerge.merge_questionnaires(
+                    [self.module_1, self.module_2, tmp_module_3], duplicate_policy=duplicate_policy)
+                self.assertEqual([(entry.first_file, entry.duplicate_file) for entry in
+                                  tmp_merge_result.conflicts.duplicate_pages],
+                                 [(self.module_1.file, self.module_2.file), (self.module_1.file, tmp_module_3.file)])
+                self.assertEqual(tmp_merge_result.conflicts.duplicate_pages[-1].kept_file, kept_file)
+
+    def test_type_conflicts(self):
+        tmp_merge_result = questionnaireMerge.merge_questionnaires([self.module_1, self.module_2])
+        self.assertEqual(tmp_merge_result.conflicts.type_conflicting_variables,
+                         [TypeConflictingVariable(varname='y', first_vartype='number', first_file=self.module_1.file,
+                                                  other_vartype='string', other_file=self.module_2.file)])
+        # the first type is kept
+        self.assertEqual([(varname, variable.vartype) for varname, variable in
+                          tmp_merge_result.questionnaire.variables.variables.items()],
+                         [('x', 'string'), ('y', 'number'), ('z', 'string')])
+
+    def test_dangling_targets(self):
+        tmp_merge_result = questionnaireMerge.merge_questionnaires([self.module_1, self.module_2])
+        self.assertEqual(tmp_merge_result.conflicts.dangling_targets,
+                         [DanglingTarget(source='D', target='missing', index=0, file=self.module_2.file)])
+        self.assertEqual(list(tmp_merge_result.questionnaire.pages.pages['missing'].sources.sources), ['D'])
+
+    def test_conflict_report(self):
+        tmp_conflicts = questionnaireMerge.merge_questionnaires([self.module_1, self.module_2]).conflicts
+        self.assertTrue(tmp_conflicts.has_conflicts())
+        self.assertEqual({key: len(value) for key, value in tmp_conflicts.return_dict_of_conflicts().items()},
+                         {'duplicate_pages': 1, 'type_conflicting_variables': 1, 'dangling_targets': 1})
+        self.assertTrue(str(tmp_conflicts).startswith('1 duplicate page(s), 1 type conflicting variable(s), '
+                                                      '1 dangling target(s)'))
+
+    def test_without_conflicts(self):
+        tmp_module_3 = qmlSamples.read_questionnaire(self.tmp_dir, 'module_3.xml', [('C', [], ['x'])],
+                                                     {'x': 'string'}, title='Module 3')
+        tmp_merge_result = questionnaireMerge.merge_questionnaires([self.module_1, tmp_module_3])
+        self.assertFalse(tmp_merge_result.conflicts.has_conflicts())
+        self.assertEqual(list(tmp_merge_result.questionnaire.pages.pages), ['index', 'A', 'B', 'C'])
+        self.assertTrue(tmp_merge_result.questionnaire.pages.pages['C'].declared)
+        # x keeps the varplace 'body'
+        self.assertEqual(tmp_merge_result.questionnaire.variables.variables['x'].varplace, 'body')
+
+    def test_undeclared_target_of_single_module(self):
+        tmp_merge_result = questionnaireMerge.merge_questionnaires([self.module_1])
+        self.assertEqual([entry.target for entry in tmp_merge_result.conflicts.dangling_targets], ['C', 'C'])
+        self.assertEqual(list(tmp_merge_result.questionnaire.pages.pages), ['index', 'A', 'B', 'C'])
+        self.assertFalse(tmp_merge_result.questionnaire.pages.pages['C'].declared)
+
+if __name__ == '__main__':
+    unittest.main()
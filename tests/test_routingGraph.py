@@ -0,0 +1,630 @@
+import itertools
+import random
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from . import context, qmlSamples
+from qmlReader import qmlReader, routingGraph
+
+RANDOM_GRAPH_SEEDS = range(40)
+
+
+def return_graph(list_of_nodes, list_of_edges) -> nx.DiGraph:
+    """
+    :return: nx.DiGraph with the nodes in the given (declaration) order
+    """
+    tmp_graph = nx.DiGraph()
+    tmp_graph.add_nodes_from(list_of_nodes)
+    tmp_graph.add_edges_from(list_of_edges)
+    return tmp_graph
+
+
+def return_sample_graph() -> nx.DiGraph:
+    """
+    index -> A/B -> C <-> D -> E (self-loop) -> end; B -> dead (dead end); A -> cancel (no transitions);
+    orphan -> end and the loop X <-> Y cannot be reached from index
+    """
+    return return_graph(['index', 'A', 'B', 'C', 'D', 'E', 'dead', 'cancel', 'orphan', 'X', 'Y', 'end'],
+                        [('index', 'A'), ('index', 'B'), ('A', 'C'), ('B', 'C'), ('C', 'D'), ('D', 'C'), ('D', 'E'),
+                         ('E', 'E'), ('E', 'end'), ('B', 'dead'), ('A', 'cancel'), ('orphan', 'end'), ('X', 'Y'),
+                         ('Y', 'X'), ('X', 'end')])
+
+
+def return_random_graph(seed, page_count=9, edge_probability=0.25, back_edge_probability=0.08) -> nx.DiGraph:
+    """
+    :return: random routing graph with the pages 'index', 'p1', ..., 'end' (in declaration order); mostly forward
+        edges, some back edges (loops) and self-loops; pages may be unreachable or dead ends
+    """
+    tmp_random = random.Random(seed)
+    tmp_list_of_nodes = ['index'] + ['p' + str(i) for i in range(1, page_count - 1)] + ['end']
+    tmp_list_of_edges = []
+    for i, j in itertools.product(range(page_count), repeat=2):
+        if i < j and tmp_random.random() < edge_probability or i >= j and tmp_random.random() < back_edge_probability:
+            tmp_list_of_edges.append((tmp_list_of_nodes[i], tmp_list_of_nodes[j]))
+    return return_graph(tmp_list_of_nodes, tmp_list_of_edges)
+
+
+def return_random_dag(seed, page_count=9, edge_probability=0.3) -> nx.DiGraph:
+    return return_random_graph(seed, page_count=page_count, edge_probability=edge_probability,
+                               back_edge_probability=0.0)
+
+
+def return_list_of_test_graphs() -> list:
+    return [return_sample_graph()] + [return_random_graph(seed) for seed in RANDOM_GRAPH_SEEDS]
+
+
+def return_copy_without_node(graph, node) -> nx.DiGraph:
+    tmp_graph = graph.copy()
+    tmp_graph.remove_node(node)
+    return tmp_graph
+
+
+def is_reachable_in_at_least_one_step(graph, source, target) -> bool:
+    return any(successor == target or nx.has_path(graph, successor, target) for successor in graph.successors(source))
+
+
+def return_component_path_sets(graph, source, target) -> list:
+    """
+    :return: list of the simple paths from the loop (strongly connected component) of source to the one of target,
+        every path as a list of frozensets of the pages of its components
+    """
+    tmp_list_of_components = [frozenset(component) for component in nx.strongly_connected_components(graph)]
+    tmp_component_graph = nx.DiGraph()
+    tmp_component_graph.add_nodes_from(tmp_list_of_components)
+    tmp_dict_of_components = {node: component for component in tmp_list_of_components for node in component}
+    tmp_component_graph.add_edges_from((tmp_dict_of_components[u], tmp_dict_of_components[v]) for u, v in
+                                       graph.edges() if tmp_dict_of_components[u] != tmp_dict_of_components[v])
+    if tmp_dict_of_components[source] == tmp_dict_of_components[target]:
+        return [[tmp_dict_of_components[source]]]
+    return list(nx.all_simple_paths(tmp_component_graph, tmp_dict_of_components[source],
+                                    tmp_dict_of_components[target]))
+
+
+class TestPageOrder(unittest.TestCase):
+    def assert_valid_page_order(self, graph):
+        tmp_page_order = routingGraph.return_page_order(graph)
+        self.assertEqual(sorted(tmp_page_order.pages), sorted(graph))
+        tmp_positions = {node: position for position, node in enumerate(tmp_page_order.pages)}
+        tmp_declaration_positions = {node: position for position, node in enumerate(graph)}
+        # brute force: two pages are in one loop if each can be reached from the other
+        tmp_list_of_loops = []
+        for node in tmp_page_order.pages:
+            tmp_loop = [other for other in graph if other == node or
+                        (nx.has_path(graph, node, other) and nx.has_path(graph, other, node))]
+            if len(tmp_loop) > 1 and tmp_loop not in tmp_list_of_loops:
+                tmp_list_of_loops.append(tmp_loop)
+        # the loops in route order, the pages of a loop in declaration order and next to each other
+        self.assertEqual(tmp_page_order.loops, tuple(tuple(loop) for loop in tmp_list_of_loops))
+        for loop in tmp_list_of_loops:
+            self.assertEqual(list(tmp_page_order.pages[tmp_positions[loop[0]]:tmp_positions[loop[0]] + len(loop)]),
+                             sorted(loop, key=tmp_declaration_positions.__getitem__))
+        # every transition that leaves a loop (or page) goes forward
+        tmp_dict_of_loops = {node: loop[0] for loop in tmp_list_of_loops for node in loop}
+        for u, v in graph.edges():
+            if tmp_dict_of_loops.get(u, u) != tmp_dict_of_loops.get(v, v):
+                self.assertLess(tmp_positions[u], tmp_positions[v], (u, v))
+        return tmp_page_order
+
+    def test_sample_graph(self):
+        tmp_page_order = self.assert_valid_page_order(return_sample_graph())
+        self.assertEqual(tmp_page_order.pages,
+                         ('index', 'A', 'B', 'C', 'D', 'E', 'dead', 'cancel', 'orphan', 'X', 'Y', 'end'))
+        self.assertEqual(tmp_page_order.loops, (('C', 'D'), ('X', 'Y')))
+
+    def test_random_graphs(self):
+        for graph in return_list_of_test_graphs():
+            with self.subTest(edges=list(graph.edges())):
+                self.assert_valid_page_order(graph)
+
+    def test_random_dags(self):
+        # without loops: the topological sort that prefers the first declared page
+        for seed in RANDOM_GRAPH_SEEDS:
+            tmp_graph = return_random_dag(seed)
+            tmp_declaration_positions = {node: position for position, node in enumerate(tmp_graph)}
+            with self.subTest(seed=seed):
+                self.assertEqual(routingGraph.return_page_order(tmp_graph),
+                                 routingGraph.PageOrder(pages=tuple(nx.lexicographical_topological_sort(
+                                     tmp_graph, key=tmp_declaration_positions.__getitem__)), loops=()))
+
+    def test_pages_declared_out_of_route_order(self):
+        # components that become ready before the first declared page not yet placed: the former heap-based sort
+        for graph in return_list_of_test_graphs() + [return_random_dag(seed, page_count=30) for seed in range(10)]:
+            tmp_list_of_nodes = list(graph)
+            random.Random(len(graph.edges())).shuffle(tmp_list_of_nodes)
+            tmp_graph = return_graph(tmp_list_of_nodes, graph.edges())
+            tmp_condensation = routingGraph.build_condensed_graph(tmp_graph)
+            tmp_declaration_positions = {node: position for position, node in enumerate(tmp_graph)}
+            tmp_list_of_components = list(nx.lexicographical_topological_sort(
+                tmp_condensation,
+                key=lambda component: tmp_declaration_positions[tmp_condensation.nodes[component]['members'][0]]))
+            with self.subTest(nodes=tmp_list_of_nodes, edges=list(graph.edges())):
+                self.assertEqual(routingGraph.return_page_order(tmp_graph, condensation=tmp_condensation).pages,
+                                 tuple(node for component in tmp_list_of_components
+                                       for node in tmp_condensation.nodes[component]['members']))
+                self.assert_valid_page_order(tmp_graph)
+
+    def test_empty_graph(self):
+        self.assertEqual(routingGraph.return_page_order(nx.DiGraph()), routingGraph.PageOrder(pages=(), loops=()))
+
+    def test_condensation(self):
+        for graph in return_list_of_test_graphs():
+            tmp_condensation = routingGraph.build_condensed_graph(graph)
+            tmp_mapping = tmp_condensation.graph['mapping']
+            with self.subTest(edges=list(graph.edges())):
+                self.assertTrue(nx.is_directed_acyclic_graph(tmp_condensation))
+                for component in tmp_condensation:
+                    tmp_members = tmp_condensation.nodes[component]['members']
+                    self.assertEqual(list(tmp_members), [node for node in graph if tmp_mapping[node] == component])
+                for u, v in graph.edges():
+                    self.assertEqual(tmp_mapping[u] == tmp_mapping[v],
+                                     nx.has_path(graph, v, u), (u, v))
+
+
+class TestBottleneckPages(unittest.TestCase):
+    def return_dominators_brute_force(self, graph, start_page, end_page) -> tuple:
+        """
+        :return: start_page, end_page and every page whose removal (from a copy) disconnects end_page from
+            start_page, in the order of a shortest route
+        """
+        if not nx.has_path(graph, start_page, end_page):
+            return ()
+        tmp_set_of_dominators = {start_page, end_page} | {
+            node for node in graph if node not in (start_page, end_page) and
+            not nx.has_path(return_copy_without_node(graph, node), start_page, end_page)}
+        return tuple(node for node in nx.shortest_path(graph, start_page, end_page) if node in tmp_set_of_dominators)
+
+    def return_articulation_points_brute_force(self, graph, excluded_pages=()) -> set:
+        """
+        :return: set of the pages whose removal (from a copy) increases the number of weakly connected components
+        """
+        tmp_graph = graph.copy()
+        tmp_graph.remove_nodes_from(excluded_pages)
+        tmp_component_count = nx.number_weakly_connected_components(tmp_graph)
+        return {node for node in tmp_graph if
+                nx.number_weakly_connected_components(return_copy_without_node(tmp_graph, node)) >
+                tmp_component_count}
+
+    def test_sample_graph(self):
+        tmp_bottleneck_pages = routingGraph.return_bottleneck_pages(return_sample_graph(), excluded_pages=['orphan'])
+        self.assertEqual(tmp_bottleneck_pages.dominators, ('index', 'C', 'D', 'E', 'end'))
+        self.assertEqual(tmp_bottleneck_pages.articulation_points, ('A', 'B', 'C', 'D', 'E', 'X', 'end'))
+
+    def test_dominators(self):
+        for graph in return_list_of_test_graphs():
+            for end_page in graph:
+                with self.subTest(edges=list(graph.edges()), end_page=end_page):
+                    self.assertEqual(routingGraph.return_dominators(graph, 'index', end_page),
+                                     self.return_dominators_brute_force(graph, 'index', end_page))
+
+    def test_articulation_points(self):
+        for graph in return_list_of_test_graphs():
+            tmp_page_order = routingGraph.return_page_order(graph)
+            for excluded_pages in [(), ('end',), tuple(graph)[1:3]]:
+                with self.subTest(edges=list(graph.edges()), excluded_pages=excluded_pages):
+                    tmp_articulation_points = routingGraph.return_articulation_points(
+                        graph, excluded_pages=excluded_pages, page_order=tmp_page_order)
+                    self.assertEqual(set(tmp_articulation_points),
+                                     self.return_articulation_points_brute_force(graph, excluded_pages))
+                    self.assertEqual(list(tmp_articulation_points),
+                                     [node for node in tmp_page_order.pages if node in tmp_articulation_points])
+
+    def test_unknown_pages(self):
+        self.assertEqual(routingGraph.return_dominators(return_sample_graph(), 'index', 'unknown'), ())
+        self.assertEqual(routingGraph.return_dominators(return_sample_graph(), 'index', 'index'), ('index',))
+
+
+class TestPathsBetweenPages(unittest.TestCase):
+    def test_number_of_paths_in_dags(self):
+        for seed in RANDOM_GRAPH_SEEDS:
+            tmp_graph = return_random_dag(seed)
+            for source, target in itertools.permutations(tmp_graph, 2):
+                with self.subTest(seed=seed, source=source, target=target):
+                    self.assertEqual(routingGraph.return_number_of_paths(tmp_graph, source, target),
+                                     len(list(nx.all_simple_paths(tmp_graph, source, target))))
+
+    def test_number_of_paths_with_loops(self):
+        # every loop counts as one step
+        for graph in return_list_of_test_graphs():
+            tmp_condensation = routingGraph.build_condensed_graph(graph)
+            for source, target in itertools.product(graph, repeat=2):
+                tmp_expected = len(return_component_path_sets(graph, source, target)) if \
+                    nx.has_path(graph, source, target) else 0
+                with self.subTest(edges=list(graph.edges()), source=source, target=target):
+                    self.assertEqual(routingGraph.return_number_of_paths(graph, source, target,
+                                                                         condensation=tmp_condensation), tmp_expected)
+
+    def test_number_of_paths_of_sample_graph(self):
+        tmp_graph = return_sample_graph()
+        self.assertEqual(routingGraph.return_number_of_paths(tmp_graph, 'index', 'end'), 2)
+        self.assertEqual(routingGraph.return_number_of_paths(tmp_graph, 'C', 'D'), 1)
+        self.assertEqual(routingGraph.return_number_of_paths(tmp_graph, 'index', 'orphan'), 0)
+        self.assertEqual(routingGraph.return_number_of_paths(tmp_graph, 'index', 'unknown'), 0)
+        # no overflow
+        tmp_ladder = return_graph(range(201), [(i, j) for i in range(0, 200, 2) for j in (i + 1, i + 2)] +
+                                  [(i, i + 1) for i in range(1, 200, 2)])
+        self.assertEqual(routingGraph.return_number_of_paths(tmp_ladder, 0, 200), 2 ** 100)
+
+    def test_pages_between_in_dags(self):
+        for seed in RANDOM_GRAPH_SEEDS:
+            tmp_graph = return_random_dag(seed)
+            tmp_page_order = routingGraph.return_page_order(tmp_graph)
+            for source, target in itertools.product(tmp_graph, repeat=2):
+                tmp_set_of_pages = {node for path in nx.all_simple_paths(tmp_graph, source, target) for node in path}
+                if source == target:
+                    tmp_set_of_pages = {source}
+                with self.subTest(seed=seed, source=source, target=target):
+                    self.assertEqual(routingGraph.return_pages_between(tmp_graph, source, target,
+                                                                       page_order=tmp_page_order),
+                                     tuple(node for node in tmp_page_order.pages if node in tmp_set_of_pages))
+
+    def test_pages_between_with_loops(self):
+        # the pages of all loops on a route between the loops of source and target
+        for graph in return_list_of_test_graphs():
+            tmp_page_order = routingGraph.return_page_order(graph)
+            for source, target in itertools.product(graph, repeat=2):
+                tmp_set_of_pages = set()
+                if nx.has_path(graph, source, target):
+                    tmp_set_of_pages = {node for path in return_component_path_sets(graph, source, target)
+                                        for component in path for node in component}
+                with self.subTest(edges=list(graph.edges()), source=source, target=target):
+                    self.assertEqual(routingGraph.return_pages_between(graph, source, target,
+                                                                       page_order=tmp_page_order),
+                                     tuple(node for node in tmp_page_order.pages if node in tmp_set_of_pages))
+
+
+class TestReachabilityIndex(unittest.TestCase):
+    def test_is_reachable(self):
+        for graph in return_list_of_test_graphs():
+            tmp_reachability_index = routingGraph.ReachabilityIndex(graph)
+            for source, target in itertools.product(graph, repeat=2):
+                with self.subTest(edges=list(graph.edges()), source=source, target=target):
+                    self.assertEqual(tmp_reachability_index.is_reachable(source, target),
+                                     is_reachable_in_at_least_one_step(graph, source, target))
+
+    def test_lists_of_pages(self):
+        for graph in return_list_of_test_graphs():
+            tmp_reachability_index = routingGraph.ReachabilityIndex(graph)
+            tmp_page_order = routingGraph.return_page_order(graph).pages
+            with self.subTest(edges=list(graph.edges())):
+                for node in graph:
+                    self.assertEqual(tmp_reachability_index.return_list_of_reachable_pages(node),
+                                     [other for other in tmp_page_order if
+                                      is_reachable_in_at_least_one_step(graph, node, other)])
+                self.assertEqual(tmp_reachability_index.return_list_of_unreachable_pages('index'),
+                                 [node for node in tmp_page_order if not nx.has_path(graph, 'index', node)])
+                self.assertEqual(tmp_reachability_index.return_list_of_pages_not_reaching('end'),
+                                 [node for node in tmp_page_order if not nx.has_path(graph, node, 'end')])
+                self.assertEqual(tmp_reachability_index.return_list_of_dead_end_pages('end'),
+                                 [node for node in tmp_page_order if node != 'end' and
+                                  set(graph.successors(node)) <= {node}])
+
+    def test_sample_graph(self):
+        tmp_reachability_index = routingGraph.ReachabilityIndex(return_sample_graph())
+        self.assertTrue(tmp_reachability_index.is_reachable('C', 'C'))
+        self.assertTrue(tmp_reachability_index.is_reachable('E', 'E'))
+        self.assertFalse(tmp_reachability_index.is_reachable('A', 'A'))
+        self.assertFalse(tmp_reachability_index.is_reachable('index', 'unknown'))
+        self.assertEqual(tmp_reachability_index.return_list_of_unreachable_pages('index'), ['orphan', 'X', 'Y'])
+        self.assertEqual(tmp_reachability_index.return_list_of_pages_not_reaching('end'), ['dead', 'cancel'])
+        self.assertEqual(tmp_reachability_index.return_list_of_dead_end_pages('end'), ['dead', 'cancel'])
+        self.assertEqual(tmp_reachability_index.return_list_of_unreachable_pages('unknown'),
+                         list(routingGraph.return_page_order(return_sample_graph()).pages))
+
+
+class TestSections(unittest.TestCase):
+    def return_sections_brute_force(self, graph, start_page, end_page, excluded_pages, dict_of_page_variables):
+        """
+        Virtual exit behind end_page and behind every page without transitions to other pages; a page is a cut page
+        if its removal (from a copy) disconnects the exit from start_page; every reachable page belongs to the last
+        cut page (in route order) whose removal disconnects the page from start_page.
+        """
+        tmp_graph = graph.copy()
+        tmp_graph.remove_nodes_from(excluded_pages)
+        tmp_set_of_reachable_pages = nx.descendants(tmp_graph, start_page) | {start_page}
+        tmp_graph.remove_nodes_from([node for node in graph if node not in tmp_set_of_reachable_pages])
+        tmp_exit = 'virtual exit'
+        for node in list(tmp_graph):
+            if node == end_page or set(tmp_graph.successors(node)) <= {node}:
+                tmp_graph.add_edge(node, tmp_exit)
+
+        def return_set_of_dominators(target):
+            return {node for node in tmp_graph if node == target or node == start_page or
+                    (node != tmp_exit and not nx.has_path(return_copy_without_node(tmp_graph, node), start_page,
+                                                          target))}
+
+        tmp_set_of_exit_dominators = return_set_of_dominators(tmp_exit) - {tmp_exit} if tmp_exit in tmp_graph else {
+            start_page}
+        # a cut page comes after all cut pages that dominate it
+        tmp_list_of_cut_pages = sorted(tmp_set_of_exit_dominators,
+                                       key=lambda node: len(return_set_of_dominators(node)))
+        tmp_page_order = routingGraph.return_page_order(graph).pages
+        tmp_list_of_sections = []
+        for index, cut_page in enumerate(tmp_list_of_cut_pages):
+            tmp_list_of_pages = [cut_page] + [
+                node for node in tmp_page_order if node in tmp_set_of_reachable_pages and node != cut_page and
+                max((other for other in return_set_of_dominators(node) if other in tmp_set_of_exit_dominators),
+                    key=tmp_list_of_cut_pages.index) == cut_page]
+            tmp_list_of_sections.append(routingGraph.Section(
+                entry=cut_page,
+                exit=tmp_list_of_cut_pages[index + 1] if index + 1 < len(tmp_list_of_cut_pages) else None,
+                pages=tuple(tmp_list_of_pages),
+                variables=tuple(dict.fromkeys(varname for node in tmp_list_of_pages
+                                              for varname in dict_of_page_variables.get(node, [])))))
+        return tuple(tmp_list_of_sections)
+
+    def test_sample_graph(self):
+        tmp_dict_of_page_variables = {'index': ['v1'], 'A': ['v2', 'v1'], 'C': ['v3'], 'E': ['v4'], 'dead': ['v5']}
+        # the route into the dead end skips C, D, E and end
+        self.assertEqual(routingGraph.return_sections(return_sample_graph(), excluded_pages=['cancel'],
+                                                      dict_of_page_variables=tmp_dict_of_page_variables),
+                         (routingGraph.Section(entry='index', exit=None,
+                                               pages=('index', 'A', 'B', 'C', 'D', 'E', 'dead', 'end'),
+                                               variables=('v1', 'v2', 'v3', 'v4', 'v5')),))
+        # the loop C <-> D and the self-loop of E are cut; the unreachable pages belong to no section
+        tmp_sections = routingGraph.return_sections(return_sample_graph(), excluded_pages=['cancel', 'dead'],
+                                                    dict_of_page_variables=tmp_dict_of_page_variables)
+        self.assertEqual(tmp_sections, (
+            routingGraph.Section(entry='index', exit='C', pages=('index', 'A', 'B'), variables=('v1', 'v2')),
+            routingGraph.Section(entry='C', exit='D', pages=('C',), variables=('v3',)),
+            routingGraph.Section(entry='D', exit='E', pages=('D',), variables=()),
+            routingGraph.Section(entry='E', exit='end', pages=('E',), variables=('v4',)),
+            routingGraph.Section(entry='end', exit=None, pages=('end',), variables=())))
+
+    def test_random_graphs(self):
+        for graph in return_list_of_test_graphs():
+            tmp_dict_of_page_variables = {node: ['v_' + str(node), 'shared'] for node in list(graph)[::2]}
+            for excluded_pages in [(), tuple(graph)[2:4]]:
+                with self.subTest(edges=list(graph.edges()), excluded_pages=excluded_pages):
+                    tmp_sections = routingGraph.return_sections(graph, excluded_pages=excluded_pages,
+                                                                dict_of_page_variables=tmp_dict_of_page_variables)
+                    self.assertEqual(tmp_sections, self.return_sections_brute_force(
+                        graph, 'index', 'end', excluded_pages, tmp_dict_of_page_variables))
+                    # every reachable page is in exactly one section
+                    tmp_list_of_pages = [node for section in tmp_sections for node in section.pages]
+                    self.assertEqual(len(tmp_list_of_pages), len(set(tmp_list_of_pages)))
+
+    def test_graph_is_not_changed(self):
+        tmp_graph = nx.freeze(return_sample_graph())
+        routingGraph.return_sections(tmp_graph, excluded_pages=['cancel'])
+        self.assertEqual(list(tmp_graph.edges()), list(return_sample_graph().edges()))
+
+    def test_unknown_or_excluded_start_page(self):
+        self.assertEqual(routingGraph.return_sections(return_sample_graph(), start_page='unknown'), ())
+        self.assertEqual(routingGraph.return_sections(return_sample_graph(), excluded_pages=['index']), ())
+
+
+class TestInterviewLength(unittest.TestCase):
+    def test_path_metrics_in_dags(self):
+        for seed in RANDOM_GRAPH_SEEDS:
+            tmp_graph = return_random_dag(seed)
+            tmp_dict_of_page_variables = {node: ['v'] * (position % 3) for position, node in enumerate(tmp_graph)}
+            tmp_list_of_paths = list(nx.all_simple_paths(tmp_graph, 'index', 'end'))
+            with self.subTest(seed=seed):
+                tmp_path_metrics = routingGraph.return_path_metrics(
+                    tmp_graph, dict_of_page_variables=tmp_dict_of_page_variables)
+                if not tmp_list_of_paths:
+                    self.assertEqual(tmp_path_metrics, routingGraph.PathMetrics(None, None, None, None))
+                    continue
+                tmp_list_of_variable_counts = [sum(len(tmp_dict_of_page_variables[node]) for node in path) for
+                                               path in tmp_list_of_paths]
+                self.assertEqual(tmp_path_metrics, routingGraph.PathMetrics(
+                    min_pages=min(len(path) for path in tmp_list_of_paths),
+                    max_pages=max(len(path) for path in tmp_list_of_paths),
+                    min_variables=min(tmp_list_of_variable_counts), max_variables=max(tmp_list_of_variable_counts)))
+
+    def test_path_metrics_with_loops(self):
+        # the shortest routes are exact, the longest count every loop once with all its pages
+        for graph in return_list_of_test_graphs():
+            tmp_dict_of_page_variables = {node: ['v'] * (position % 3) for position, node in enumerate(graph)}
+            with self.subTest(edges=list(graph.edges())):
+                tmp_path_metrics = routingGraph.return_path_metrics(
+                    graph, dict_of_page_variables=tmp_dict_of_page_variables)
+                if not nx.has_path(graph, 'index', 'end'):
+                    self.assertEqual(tmp_path_metrics, routingGraph.PathMetrics(None, None, None, None))
+                    continue
+                tmp_list_of_paths = list(nx.all_simple_paths(graph, 'index', 'end'))
+                tmp_list_of_component_paths = return_component_path_sets(graph, 'index', 'end')
+                self.assertEqual(tmp_path_metrics.min_pages, min(len(path) for path in tmp_list_of_paths))
+                self.assertEqual(tmp_path_metrics.min_variables,
+                                 min(sum(len(tmp_dict_of_page_variables[node]) for node in path)
+                                     for path in tmp_list_of_paths))
+                self.assertEqual(tmp_path_metrics.max_pages,
+                                 max(sum(len(component) for component in path)
+                                     for path in tmp_list_of_component_paths))
+                self.assertEqual(tmp_path_metrics.max_variables,
+                                 max(sum(len(tmp_dict_of_page_variables[node]) for component in path
+                                         for node in component) for path in tmp_list_of_component_paths))
+                self.assertGreaterEqual(tmp_path_metrics.max_pages, max(len(path) for path in tmp_list_of_paths))
+
+    def return_expected_visits_brute_force(self, graph, start_page, dict_of_edge_frequencies=None) -> dict:
+        """
+        expected number of visits of an absorbing Markov chain: visits = e_start + P^T visits, solved directly
+        """
+        tmp_list_of_nodes = list(graph)
+        tmp_positions = {node: position for position, node in enumerate(tmp_list_of_nodes)}
+        tmp_matrix = np.zeros((len(tmp_list_of_nodes), len(tmp_list_of_nodes)))
+        for node, list_of_probabilities in routingGraph.return_dict_of_edge_probabilities(
+                graph, dict_of_edge_frequencies).items():
+            for target, probability in list_of_probabilities:
+                tmp_matrix[tmp_positions[node], tmp_positions[target]] = probability
+        tmp_start = np.zeros(len(tmp_list_of_nodes))
+        tmp_start[tmp_positions[start_page]] = 1.0
+        tmp_visits = np.linalg.solve(np.eye(len(tmp_list_of_nodes)) - tmp_matrix.T, tmp_start)
+        return {node: tmp_visits[tmp_positions[node]] for node in tmp_list_of_nodes if
+                nx.has_path(graph, start_page, node)}
+
+    def assert_expected_length(self, graph, dict_of_page_variables, dict_of_edge_frequencies=None):
+        tmp_expected_length = routingGraph.return_expected_length(
+            graph, dict_of_edge_frequencies=dict_of_edge_frequencies, dict_of_page_variables=dict_of_page_variables)
+        tmp_expected_visits = self.return_expected_visits_brute_force(graph, 'index', dict_of_edge_frequencies)
+        self.assertEqual(list(tmp_expected_length.expected_visits), [node for node in routingGraph.return_page_order(
+            graph).pages if node in tmp_expected_visits and tmp_expected_visits[node] > 0])
+        for node, visits in tmp_expected_length.expected_visits.items():
+            self.assertAlmostEqual(visits, tmp_expected_visits[node], places=9, msg=node)
+        self.assertAlmostEqual(tmp_expected_length.pages, sum(tmp_expected_visits.values()), places=9)
+        self.assertAlmostEqual(tmp_expected_length.variables,
+                               sum(visits * len(dict_of_page_variables.get(node, [])) for node, visits in
+                                   tmp_expected_visits.items()), places=9)
+        self.assertLess(tmp_expected_length.truncated_probability, 1e-9)
+
+    def return_graph_with_exits(self, graph) -> nx.DiGraph:
+        # every page may end the interview, so that no loop is closed and the linear system can be solved
+        tmp_graph = graph.copy()
+        tmp_graph.add_node('quit')
+        tmp_graph.add_edges_from((node, 'quit') for node in graph)
+        return tmp_graph
+
+    def test_expected_length(self):
+        for graph in return_list_of_test_graphs():
+            tmp_graph = self.return_graph_with_exits(graph)
+            tmp_dict_of_page_variables = {node: ['v'] * (position % 3) for position, node in enumerate(tmp_graph)}
+            with self.subTest(edges=list(graph.edges())):
+                self.assert_expected_length(tmp_graph, tmp_dict_of_page_variables)
+
+    def test_expected_length_with_frequencies(self):
+        for seed, graph in enumerate(return_list_of_test_graphs()):
+            tmp_graph = self.return_graph_with_exits(graph)
+            tmp_random = random.Random(seed)
+            # some observed edges, others without observations
+            tmp_dict_of_edge_frequencies = {edge: tmp_random.choice([0, 1, 5, 20]) for edge in graph.edges()
+                                            if tmp_random.random() < 0.7}
+            # every page keeps a way out
+            tmp_dict_of_edge_frequencies.update({(node, 'quit'): tmp_random.choice([1, 5]) for node in graph})
+            with self.subTest(edges=list(graph.edges())):
+                self.assert_expected_length(tmp_graph, {}, tmp_dict_of_edge_frequencies)
+
+    def test_edge_probabilities(self):
+        tmp_graph = return_sample_graph()
+        tmp_dict_of_probabilities = routingGraph.return_dict_of_edge_probabilities(
+            tmp_graph, {('index', 'A'): 3, ('index', 'B'): 1, ('B', 'C'): 0, ('B', 'dead'): 0})
+        self.assertEqual(tmp_dict_of_probabilities['index'], [('A', 0.75), ('B', 0.25)])
+        self.assertEqual(tmp_dict_of_probabilities['B'], [('C', 0.5), ('dead', 0.5)])
+        self.assertEqual(tmp_dict_of_probabilities['end'], [])
+        self.assertEqual(tmp_dict_of_probabilities['E'], [('E', 0.5), ('end', 0.5)])
+
+    def test_closed_loop_is_truncated(self):
+        tmp_graph = return_graph(['index', 'A', 'B', 'end'],
+                                 [('index', 'A'), ('index', 'end'), ('A', 'B'), ('B', 'A')])
+        tmp_expected_length = routingGraph.return_expected_length(tmp_graph, max_loop_steps=20)
+        self.assertAlmostEqual(tmp_expected_length.truncated_probability, 0.5)
+        self.assertAlmostEqual(tmp_expected_length.expected_visits['A'], 0.5 * 10)
+        self.assertAlmostEqual(tmp_expected_length.expected_visits['end'], 0.5)
+
+    def test_unknown_start_page(self):
+        self.assertEqual(routingGraph.return_expected_length(return_sample_graph(), start_page='unknown'),
+                         routingGraph.ExpectedLength(pages=0.0, variables=0.0, expected_visits={},
+                                                      truncated_probability=0.0))
+        self.assertEqual(routingGraph.return_path_metrics(return_sample_graph(), start_page='unknown'),
+                         routingGraph.PathMetrics(None, None, None, None))
+
+
+def return_chain_graph(seed, page_count=30) -> nx.DiGraph:
+    """
+    :return: random routing graph with long chains: mostly edges to the next page, some branches, back edges and
+        self-loops, and a closed loop of three pages that consists of chain edges only
+    """
+    tmp_random = random.Random(seed)
+    tmp_list_of_nodes = ['index'] + ['p' + str(i) for i in range(1, page_count - 1)] + ['end']
+    tmp_list_of_edges = [(u, v) for u, v in zip(tmp_list_of_nodes, tmp_list_of_nodes[1:]) if
+                         tmp_random.random() < 0.9]
+    for i in range(page_count // 5):
+        tmp_list_of_edges.append((tmp_random.choice(tmp_list_of_nodes), tmp_random.choice(tmp_list_of_nodes)))
+    tmp_list_of_edges += [('L2', 'L1'), ('L1', 'L3'), ('L3', 'L2')]
+    return return_graph(tmp_list_of_nodes + ['L1', 'L2', 'L3'], tmp_list_of_edges)
+
+
+class TestChains(unittest.TestCase):
+    def setUp(self):
+        self.list_of_graphs = return_list_of_test_graphs() + [return_chain_graph(seed) for seed in range(20)]
+        self.list_of_graphs += [routingGraph.build_routing_graph(qmlReader.QmlReader(file).questionnaire) for file in
+                                qmlSamples.return_list_of_data_qml_files()]
+        self.list_of_graphs += [return_graph(['index'], []), return_graph(['index', 'end'], [('index', 'end')]),
+                                return_graph(['a', 'b'], [('a', 'b'), ('b', 'a')])]
+
+    def return_list_of_chains_brute_force(self, graph) -> list:
+        """
+        :return: the weakly connected components of the graph of the chain edges (the only edge leaving its source and
+            the only edge entering its target, no self-loops), each walked from the page without a chain edge entering
+            it or, for closed loops, from its first declared page; in declaration order of their first pages
+        """
+        tmp_declaration_positions = {node: position for position, node in enumerate(graph)}
+        tmp_chain_graph = nx.DiGraph()
+        tmp_chain_graph.add_nodes_from(graph)
+        tmp_chain_graph.add_edges_from((u, v) for u, v in graph.edges() if
+                                       u != v and graph.out_degree(u) == 1 and graph.in_degree(v) == 1)
+        tmp_list_of_chains = []
+        for component in nx.weakly_connected_components(tmp_chain_graph):
+            tmp_list_of_first_nodes = [node for node in component if tmp_chain_graph.in_degree(node) == 0]
+            self.assertLessEqual(len(tmp_list_of_first_nodes), 1)
+            tmp_chain = [tmp_list_of_first_nodes[0] if tmp_list_of_first_nodes else
+                         min(component, key=tmp_declaration_positions.__getitem__)]
+            while len(tmp_chain) < len(component):
+                tmp_chain.append(next(iter(tmp_chain_graph.successors(tmp_chain[-1]))))
+            self.assertEqual(set(tmp_chain), component)
+            tmp_list_of_chains.append(tuple(tmp_chain))
+        return sorted(tmp_list_of_chains, key=lambda chain: tmp_declaration_positions[chain[0]])
+
+    def test_list_of_chains(self):
+        for graph in self.list_of_graphs:
+            with self.subTest(edges=list(graph.edges())):
+                tmp_list_of_chains = routingGraph.return_list_of_chains(graph)
+                self.assertEqual(tmp_list_of_chains, self.return_list_of_chains_brute_force(graph))
+                self.assertEqual(sorted(node for chain in tmp_list_of_chains for node in chain), sorted(graph))
+
+    def test_closed_loop_is_cut_before_its_first_declared_page(self):
+        tmp_graph = return_graph(['index', 'L1', 'L2', 'L3'], [('L2', 'L1'), ('L1', 'L3'), ('L3', 'L2')])
+        self.assertEqual(routingGraph.return_list_of_chains(tmp_graph), [('index',), ('L1', 'L3', 'L2')])
+
+    def test_compressed_graph(self):
+        tmp_random = random.Random(0)
+        for graph in self.list_of_graphs:
+            tmp_graph = graph.copy()
+            for u, v in tmp_graph.edges():
+                tmp_graph.edges[u, v]['label'] = u + ' -> ' + v
+            tmp_dict_of_page_variables = {node: tmp_random.sample(['v1', 'v2', 'v3', 'v4'], tmp_random.randint(0, 2))
+                                          for node in tmp_graph}
+            tmp_snapshot = (list(tmp_graph), [(u, v, dict(data)) for u, v, data in tmp_graph.edges(data=True)])
+            with self.subTest(edges=list(graph.edges())):
+                tmp_compressed_graph = routingGraph.build_compressed_graph(
+                    tmp_graph, dict_of_page_variables=tmp_dict_of_page_variables)
+                # the graph is not changed
+                self.assertEqual((list(tmp_graph), list(tmp_graph.edges(data=True))), tmp_snapshot)
+                tmp_list_of_chains = self.return_list_of_chains_brute_force(graph)
+                self.assertEqual(list(tmp_compressed_graph), [chain[0] for chain in tmp_list_of_chains])
+                tmp_dict_of_chain_nodes = {node: chain[0] for chain in tmp_list_of_chains for node in chain}
+                for chain in tmp_list_of_chains:
+                    tmp_list_of_varnames = []
+                    for node in chain:
+                        tmp_list_of_varnames += [varname for varname in tmp_dict_of_page_variables[node] if
+                                                 varname not in tmp_list_of_varnames]
+                    self.assertEqual(tmp_compressed_graph.nodes[chain[0]]['pages'], list(chain))
+                    self.assertEqual(tmp_compressed_graph.nodes[chain[0]]['variables'], tmp_list_of_varnames)
+                # every edge that is not between two consecutive pages of a chain, between the first pages of the
+                #  chains and with its attributes (at most one edge leaves the last page of a chain for another chain)
+                tmp_set_of_chain_edges = set((u, v) for chain in tmp_list_of_chains for u, v in zip(chain, chain[1:]))
+                tmp_dict_of_edges = {}
+                for u, v, data in tmp_graph.edges(data=True):
+                    if (u, v) not in tmp_set_of_chain_edges:
+                        tmp_edge = (tmp_dict_of_chain_nodes[u], tmp_dict_of_chain_nodes[v])
+                        self.assertNotIn(tmp_edge, tmp_dict_of_edges)
+                        tmp_dict_of_edges[tmp_edge] = data
+                self.assertEqual({(u, v): data for u, v, data in tmp_compressed_graph.edges(data=True)},
+                                 tmp_dict_of_edges)
+                # the compressed graph has no chain edges left, apart from closed loops collapsed into self-loops
+                self.assertEqual(routingGraph.return_list_of_chains(tmp_compressed_graph),
+                                 [(node,) for node in tmp_compressed_graph])
+
+    def test_compressed_graph_without_variables(self):
+        tmp_graph = return_graph(['index', 'A', 'B', 'end'], [('index', 'A'), ('A', 'B'), ('A', 'end'), ('B', 'end')])
+        tmp_compressed_graph = routingGraph.build_compressed_graph(tmp_graph)
+        self.assertEqual(dict(tmp_compressed_graph.nodes(data=True)),
+                         {'index': {'pages': ['index', 'A'], 'variables': [], 'label': 'index - A\n(2 pages)'},
+                          'B': {'pages': ['B'], 'variables': [], 'label': 'B'},
+                          'end': {'pages': ['end'], 'variables': [], 'label': 'end'}})
+        self.assertEqual(list(tmp_compressed_graph.edges()), [('index', 'B'), ('index', 'end'), ('B', 'end')])
+
+
+if __name__ == '__main__':
+    unittest.main()
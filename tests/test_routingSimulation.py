@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from . import qmlSamples
+from qmlReader import qmlReader, routingSimulation
+from benchmark import qmlGenerator
+
+
+class TestRoutingSimulation(unittest.TestCase):
+    def setUp(self):
+        self.file = qmlSamples.return_list_of_data_qml_files()[0]
+        self.questionnaire = qmlReader.QmlReader(self.file).questionnaire
+        self.simulation = routingSimulation.RoutingSimulation(
+            self.questionnaire, answer_option_values=routingSimulation.read_answer_option_values(self.file))
+
+    def assert_results_equal(self, result_a, result_b):
+        self.assertEqual(result_a.return_dict_of_results(), result_b.return_dict_of_results())
+        self.assertEqual(result_a.page_reach_counts.tolist(), result_b.page_reach_counts.tolist())
+        self.assertEqual(result_a.path_length_counts, result_b.path_length_counts)
+
+    def test_result_does_not_depend_on_workers(self):
+        # var02 is used in the transition conditions of data_qml/questionnaire.xml
+        self.simulation.set_distribution('var02', routingSimulation.ChoiceDistribution(
+            ['1', '2', '3', '4'], weights=[1, 1, 1, 5], missing_rate=0.1))
+        tmp_result = self.simulation.run(5000, seed=7, workers=1, chunk_size=700)
+        self.assertEqual(tmp_result.respondent_count, 5000)
+        self.assert_results_equal(tmp_result, self.simulation.run(5000, seed=7, workers=3, chunk_size=700))
+
+    def test_result_of_generated_questionnaire_does_not_depend_on_workers(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            tmp_file = os.path.join(tmp_dir, 'generated.xml')
+            qmlGenerator.QmlGenerator(page_count=80, branching_factor=3, condition_complexity=2, back_jump_rate=0.2,
+                                      seed=3).write(tmp_file)
+            tmp_simulation = routingSimulation.RoutingSimulation(
+                qmlReader.QmlReader(tmp_file).questionnaire,
+                answer_option_values=routingSimulation.read_answer_option_values(tmp_file))
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assert_results_equal(tmp_simulation.run(3000, seed=11, workers=1, chunk_size=500),
+                                  tmp_simulation.run(3000, seed=11, workers=3, chunk_size=500))
+
+    def test_chunks_are_merged(self):
+        tmp_result = self.simulation.run(2500, seed=5, workers=1, chunk_size=1000)
+        tmp_list_of_seed_sequences = np.random.SeedSequence(5).spawn(3)
+        tmp_expected = routingSimulation.SimulationResult(self.questionnaire.pages.pages.keys())
+        for seed_sequence, count in zip(tmp_list_of_seed_sequences, [1000, 1000, 500]):
+            tmp_expected.merge(self.simulation.simulate_chunk(seed_sequence, count))
+        self.assert_results_equal(tmp_result, tmp_expected)
+        self.assertEqual(sum(tmp_result.path_length_counts.values()), 2500)
+        self.assertEqual(sum(tmp_result.end_reason_counts.values()), 2500)
+
+    def test_seed(self):
+        self.assert_results_equal(self.simulation.run(2000, seed=1, chunk_size=500),
+                                  self.simulation.run(2000, seed=1, chunk_size=500))
+        self.assertNotEqual(self.simulation.run(2000, seed=1, chunk_size=500).return_dict_of_results(),
+                            self.simulation.run(2000, seed=2, chunk_size=500).return_dict_of_results())
+
+    def test_no_respondents(self):
+        tmp_result = self.simulation.run(0, seed=1, workers=3)
+        self.assertEqual(tmp_result.respondent_count, 0)
+        self.assertEqual(tmp_result.return_mean_path_length(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import collections
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from . import qmlSamples
+from qmlReader import qmlReader, questionnaire, transitionTable
+from benchmark import qmlGenerator
+
+
+def return_list_of_transitions_by_list(questionnaire_object, min_distance=None, max_distance=0, max_count=None,
+                                       sort=True, sort_key='distance') -> list:
+    """
+    the former list implementation of Questionnaire.return_list_of_transitions
+    """
+    tmp_list_of_transitions = [transition for page in questionnaire_object.pages.pages.values() for transition in
+                               page.transitions.transitions.values()]
+    if sort and sort_key is not None:
+        tmp_list_of_transitions.sort(key=lambda transition: getattr(transition, sort_key))
+    if max_count is not None:
+        tmp_list_of_transitions = tmp_list_of_transitions[:max_count]
+    return [transition for transition in tmp_list_of_transitions if
+            (min_distance is None or min_distance < transition.distance) and
+            (max_distance is None or transition.distance < max_distance)]
+
+
+class TestTransitionTable(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.list_of_questionnaires = [qmlReader.QmlReader(file).questionnaire for file in
+                                       qmlSamples.return_list_of_data_qml_files()]
+        for seed in range(3):
+            tmp_file = os.path.join(self.tmp_dir, 'generated_' + str(seed) + '.xml')
+            qmlGenerator.QmlGenerator(page_count=60, branching_factor=4, back_jump_rate=0.3, seed=seed).write(tmp_file)
+            self.list_of_questionnaires.append(qmlReader.QmlReader(tmp_file).questionnaire)
+        self.list_of_questionnaires.append(questionnaire.Questionnaire())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_columns(self):
+        for questionnaire_object in self.list_of_questionnaires:
+            tmp_table = questionnaire_object.return_transition_table()
+            tmp_list_of_uids = list(questionnaire_object.pages.pages)
+            tmp_list_of_transitions = questionnaire_object.return_list_of_all_transitions()
+            with self.subTest(file=questionnaire_object.file):
+                self.assertEqual(tmp_table.transitions, tmp_list_of_transitions)
+                self.assertEqual(tmp_table.source_ordinal.tolist(),
+                                 [tmp_list_of_uids.index(transition.source) for transition in tmp_list_of_transitions])
+                self.assertEqual(tmp_table.target_ordinal.tolist(),
+                                 [tmp_list_of_uids.index(transition.target) for transition in tmp_list_of_transitions])
+                self.assertEqual(tmp_table.index.tolist(), [transition.index for transition in tmp_list_of_transitions])
+                self.assertEqual(tmp_table.distance.tolist(),
+                                 [transition.distance for transition in tmp_list_of_transitions])
+                self.assertEqual([tmp_table.conditions[condition_id] if condition_id >= 0 else None for condition_id in
+                                  tmp_table.condition_id.tolist()],
+                                 [transition.condition for transition in tmp_list_of_transitions])
+                self.assertEqual(len(tmp_table.conditions), len(set(tmp_table.conditions)))
+
+    def test_range_queries(self):
+        tmp_list_of_distances = [None, -5, -1, 0, 1, 3]
+        for questionnaire_object in self.list_of_questionnaires:
+            for min_distance, max_distance, max_count, sort, sort_key in itertools.product(
+                    tmp_list_of_distances, tmp_list_of_distances, [None, 0, 1, 7, 1000], [True, False],
+                    transitionTable.NUMERIC_SORT_KEYS + transitionTable.UID_SORT_KEYS + [None]):
+                tmp_kwargs = {'min_distance': min_distance, 'max_distance': max_distance, 'max_count': max_count,
+                              'sort': sort, 'sort_key': sort_key}
+                with self.subTest(file=questionnaire_object.file, **tmp_kwargs):
+                    self.assertEqual(questionnaire_object.return_list_of_transitions(**tmp_kwargs),
+                                     return_list_of_transitions_by_list(questionnaire_object, **tmp_kwargs))
+            with self.subTest(file=questionnaire_object.file):
+                self.assertEqual(questionnaire_object.print_backwards_jumps(max_count=10),
+                                 [str(transition) + '\n' for transition in
+                                  return_list_of_transitions_by_list(questionnaire_object, max_count=10)])
+
+    def test_top_k(self):
+        for questionnaire_object in self.list_of_questionnaires:
+            tmp_list_of_transitions = questionnaire_object.return_list_of_all_transitions()
+            for k, sort_key, largest in itertools.product([0, 1, 2, 5, 17, 10000],
+                                                          transitionTable.NUMERIC_SORT_KEYS +
+                                                          transitionTable.UID_SORT_KEYS, [True, False]):
+                with self.subTest(file=questionnaire_object.file, k=k, sort_key=sort_key, largest=largest):
+                    # sorted is stable with reverse=True as well
+                    self.assertEqual(questionnaire_object.return_list_of_top_k_transitions(k, sort_key=sort_key,
+                                                                                          largest=largest),
+                                     sorted(tmp_list_of_transitions,
+                                            key=lambda transition: getattr(transition, sort_key),
+                                            reverse=largest)[:k])
+
+    def test_distance_histogram(self):
+        for questionnaire_object in self.list_of_questionnaires:
+            tmp_list_of_distances = [transition.distance for transition in
+                                     questionnaire_object.return_list_of_all_transitions()]
+            for min_distance, max_distance in itertools.product([None, -3, 0], [None, 0, 2]):
+                tmp_counter = collections.Counter(distance for distance in tmp_list_of_distances if
+                                                  (min_distance is None or min_distance < distance) and
+                                                  (max_distance is None or distance < max_distance))
+                with self.subTest(file=questionnaire_object.file, min_distance=min_distance,
+                                  max_distance=max_distance):
+                    tmp_histogram = questionnaire_object.return_distance_histogram(min_distance=min_distance,
+                                                                                    max_distance=max_distance)
+                    self.assertEqual(list(tmp_histogram.items()), sorted(tmp_counter.items()))
+
+    def test_rebuilt_after_changes(self):
+        tmp_questionnaire = self.list_of_questionnaires[0]
+        tmp_table = tmp_questionnaire.return_transition_table()
+        self.assertIs(tmp_questionnaire.return_transition_table(), tmp_table)
+        tmp_page = tmp_questionnaire.pages.pages['index']
+        tmp_page.add_transition(questionnaire.Transition(index=len(tmp_page.transitions.transitions), target='index',
+                                                         condition='false', source='index', distance=0))
+        tmp_new_table = tmp_questionnaire.return_transition_table()
+        self.assertIsNot(tmp_new_table, tmp_table)
+        self.assertEqual(len(tmp_new_table), len(tmp_table) + 1)
+        self.assertEqual(tmp_questionnaire.return_list_of_transitions(max_distance=1),
+                         return_list_of_transitions_by_list(tmp_questionnaire, max_distance=1))
+
+    def test_unknown_sort_key(self):
+        with self.assertRaises(KeyError):
+            self.list_of_questionnaires[0].return_list_of_top_k_transitions(3, sort_key='condition')
+
+
+if __name__ == '__main__':
+    unittest.main()